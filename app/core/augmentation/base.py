@@ -95,11 +95,18 @@ class AugmentationEffect(ABC):
     2. Implement get_transform() to return Albumentations transform
     3. Implement get_param_specs() to return ParamSpec dict
     4. Implement set_params() to update parameters
+    
+    Effects that only change pixel values may also set pixel_only = True and
+    implement apply(); the pipeline then runs them directly, without Albumentations
+    or any bbox handling. Same-size geometric effects may set warp_only = True and
+    implement sample_matrix(), so adjacent ones are fused into a single warp.
     """
     
     # Class attributes (override in subclasses)
     category = FilterCategory.OTHER
     bbox_safe = True  # Whether this filter preserves bounding boxes
+    pixel_only = False  # Whether apply() is implemented (never moves pixels or boxes)
+    warp_only = False  # Whether sample_matrix() is implemented (a homography, same output size)
     
     def __init__(self, probability: float = 0.5, enabled: bool = True):
         """
@@ -111,6 +118,24 @@ class AugmentationEffect(ABC):
         self.enabled = enabled
         self.name = self.__class__.__name__
     
+    def __setattr__(self, name: str, value: Any):
+        super().__setattr__(name, value)
+        # Any public attribute change (set_params, probability, enabled) marks the effect dirty
+        if not name.startswith('_'):
+            self._touch()
+    
+    def _touch(self):
+        """Bump the change counter and notify the owning pipeline, if any."""
+        self.__dict__['_version'] = self.__dict__.get('_version', 0) + 1
+        owner = self.__dict__.get('_owner')
+        if owner is not None:
+            owner._touch()
+    
+    @property
+    def version(self) -> int:
+        """Change counter, incremented whenever a public attribute is assigned."""
+        return self.__dict__.get('_version', 0)
+    
     @abstractmethod
     def get_transform(self):
         """
@@ -121,6 +146,57 @@ class AugmentationEffect(ABC):
         """
         pass
     
+    def apply(self, image, rng):
+        """
+        Fast-path kernel for pixel_only effects.
+        
+        Called only when the effect fires (the pipeline handles probability), on a
+        contiguous uint8 RGB image that the caller owns and may be modified in place.
+        Must match what get_transform() does to the image.
+        
+        Args:
+            image: (H, W, 3) uint8 RGB array
+            rng: numpy.random.Generator to draw the random parameters from
+            
+        Returns:
+            np.ndarray: The augmented image (usually `image` itself)
+        """
+        raise NotImplementedError(f"{self.__class__.__name__} has no fast-path kernel")
+    
+    def sample_lut(self, rng):
+        """
+        Draw this effect's random parameters as a 256-entry lookup table.
+        
+        pixel_only effects that are per-channel value mappings override this, so
+        the pipeline can fuse consecutive ones into a single cv2.LUT pass. Must
+        draw from rng exactly like apply() does.
+        
+        Args:
+            rng: numpy.random.Generator to draw the random parameters from
+            
+        Returns:
+            np.ndarray: (256,) or (256, 3) uint8 LUT, or None if the effect isn't a LUT
+        """
+        return None
+    
+    def sample_matrix(self, rng, width: int, height: int):
+        """
+        Draw this effect's random parameters as a 3x3 homography, for warp_only effects.
+        
+        The matrix maps source to output coordinates in edge pixel space (the image
+        covers [0, width] x [0, height]) and must describe what get_transform() does
+        to the image and its boxes. Called only when the effect fires.
+        
+        Args:
+            rng: numpy.random.Generator to draw the random parameters from
+            width: Image width in pixels
+            height: Image height in pixels
+            
+        Returns:
+            np.ndarray: 3x3 float64 matrix
+        """
+        raise NotImplementedError(f"{self.__class__.__name__} has no warp matrix")
+    
     @abstractmethod
     def get_param_specs(self) -> Dict[str, ParamSpec]:
         """
@@ -0,0 +1,258 @@
+"""
+Throughput benchmark for augmentation effects and pipelines.
+
+Runs every effect in EFFECT_REGISTRY (or a saved pipeline config) over synthetic
+images at several resolutions and bbox densities, and reports images/sec,
+p50/p99 latency and peak memory. The JSON report is meant to be kept per version
+and compared over time.
+
+Usage:
+    python -m app.core.augmentation.benchmark
+    python -m app.core.augmentation.benchmark --effects ElasticTransformEffect RandomRainEffect
+    python -m app.core.augmentation.benchmark --pipeline project/augmentation_pipeline.json --output report.json
+"""
+
+import argparse
+import json
+import platform
+import random
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+from typing import Dict, List, Optional
+
+import albumentations as A
+import cv2
+import numpy as np
+
+from app.core.augmentation_engine import EFFECT_REGISTRY, AugmentationPipeline, create_effect_from_dict
+from app.core.augmentation.labels import clip_bboxes
+
+
+DEFAULT_RESOLUTIONS = [(640, 480), (1280, 720), (1920, 1080)]
+DEFAULT_BOX_COUNTS = [0, 10, 50]
+REPORT_VERSION = 1
+
+
+def make_synthetic_sample(width: int, height: int, num_boxes: int, seed: int = 0):
+    """
+    Build a deterministic synthetic RGB image with YOLO boxes.
+
+    The image mixes gradients and noise so compression and blur effects
+    see realistic, non-constant content.
+
+    Returns:
+        tuple: ((H, W, 3) uint8 image, (N, 4) float32 bboxes, (N,) int64 class ids)
+    """
+    rng = np.random.default_rng(seed)
+    xs = np.linspace(0, 255, width, dtype=np.float32)
+    ys = np.linspace(0, 255, height, dtype=np.float32)
+    gradient = (xs[None, :] + ys[:, None]) / 2.0
+    noise = rng.normal(0, 25, (height, width, 3)).astype(np.float32)
+    image = np.clip(gradient[:, :, None] + noise, 0, 255).astype(np.uint8)
+
+    w = rng.uniform(0.02, 0.3, num_boxes)
+    h = rng.uniform(0.02, 0.3, num_boxes)
+    cx = rng.uniform(w / 2, 1 - w / 2)
+    cy = rng.uniform(h / 2, 1 - h / 2)
+    bboxes = np.stack([cx, cy, w, h], axis=1).astype(np.float32).reshape(-1, 4)
+    class_ids = rng.integers(0, 5, num_boxes).astype(np.int64)
+    return image, bboxes, class_ids
+
+
+def _percentile_ms(latencies: List[float], q: float) -> float:
+    return float(np.percentile(latencies, q) * 1000.0) if latencies else 0.0
+
+
+def _probe(pipeline: AugmentationPipeline, image, bboxes, class_ids) -> Optional[str]:
+    """Run the compose once outside the timed loop; return the error message if it fails."""
+    sanitized, keep = clip_bboxes(bboxes)
+    try:
+        pipeline.get_compose()(image=image, bboxes=sanitized.tolist(), class_labels=class_ids[keep].tolist())
+    except Exception as e:
+        return f"{type(e).__name__}: {e}"
+    return None
+
+
+def benchmark_pipeline(pipeline: AugmentationPipeline, image, bboxes, class_ids,
+                       iterations: int = 50, warmup: int = 5, memory_iterations: int = 5) -> Dict:
+    """
+    Time a pipeline on one synthetic sample.
+
+    Latency is measured without tracing; peak memory comes from a separate,
+    shorter tracemalloc pass so the tracing overhead doesn't skew timings.
+
+    Returns:
+        dict: images_per_sec, p50_ms, p99_ms, mean_ms, peak_memory_mb (or error)
+    """
+    error = _probe(pipeline, image, bboxes, class_ids)
+    if error:
+        return {'error': error}
+
+    for _ in range(warmup):
+        pipeline.run_on_image(image, bboxes, class_ids)
+
+    latencies = []
+    start = time.perf_counter()
+    for _ in range(iterations):
+        t0 = time.perf_counter()
+        pipeline.run_on_image(image, bboxes, class_ids)
+        latencies.append(time.perf_counter() - t0)
+    total = time.perf_counter() - start
+
+    tracemalloc.start()
+    try:
+        tracemalloc.reset_peak()
+        baseline, _ = tracemalloc.get_traced_memory()
+        for _ in range(memory_iterations):
+            pipeline.run_on_image(image, bboxes, class_ids)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {
+        'images_per_sec': iterations / total if total > 0 else 0.0,
+        'p50_ms': _percentile_ms(latencies, 50),
+        'p99_ms': _percentile_ms(latencies, 99),
+        'mean_ms': float(np.mean(latencies) * 1000.0),
+        'peak_memory_mb': max(0, peak - baseline) / (1024 * 1024),
+    }
+
+
+def _single_effect_pipeline(effect_type: str) -> AugmentationPipeline:
+    # Probability 1 so every timed call actually pays for the effect
+    effect = create_effect_from_dict({'type': effect_type, 'probability': 1.0, 'enabled': True})
+    pipeline = AugmentationPipeline()
+    pipeline.add_effect(effect)
+    return pipeline
+
+
+def run_benchmarks(effect_types: Optional[List[str]] = None, pipeline_path: Optional[str] = None,
+                   resolutions=DEFAULT_RESOLUTIONS, box_counts=DEFAULT_BOX_COUNTS,
+                   iterations: int = 50, warmup: int = 5, seed: int = 0) -> Dict:
+    """
+    Benchmark effects and/or a saved pipeline across resolutions and bbox densities.
+
+    Args:
+        effect_types: Effect class names to benchmark; None means every registered effect,
+            an empty list skips the per-effect pass
+        pipeline_path: Optional saved pipeline config (augmentation_pipeline.json) to benchmark as a whole
+        resolutions: (width, height) pairs
+        box_counts: Number of boxes per synthetic image
+        iterations: Timed iterations per case
+        warmup: Untimed iterations per case
+        seed: Seed for the synthetic data and the augmentation RNG
+
+    Returns:
+        dict: Machine-readable report
+    """
+    random.seed(seed)
+    np.random.seed(seed)
+
+    if effect_types is None:
+        effect_types = sorted(EFFECT_REGISTRY.keys())
+
+    samples = {}
+    for width, height in resolutions:
+        for num_boxes in box_counts:
+            samples[(width, height, num_boxes)] = make_synthetic_sample(width, height, num_boxes, seed)
+
+    def run_cases(pipeline, label):
+        cases = []
+        for (width, height, num_boxes), (image, bboxes, class_ids) in samples.items():
+            result = benchmark_pipeline(pipeline, image, bboxes, class_ids, iterations=iterations, warmup=warmup)
+            result.update({'width': width, 'height': height, 'boxes': num_boxes})
+            cases.append(result)
+            print(_format_case(label, result))
+        return cases
+
+    report = {
+        'report_version': REPORT_VERSION,
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'environment': {
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'numpy': np.__version__,
+            'opencv': cv2.__version__,
+            'albumentations': A.__version__,
+        },
+        'settings': {
+            'resolutions': [list(r) for r in resolutions],
+            'box_counts': list(box_counts),
+            'iterations': iterations,
+            'warmup': warmup,
+            'seed': seed,
+        },
+        'effects': {},
+        'pipeline': None,
+    }
+
+    for effect_type in effect_types:
+        if effect_type not in EFFECT_REGISTRY:
+            print(f"[Benchmark] Unknown effect type: {effect_type}")
+            continue
+        report['effects'][effect_type] = run_cases(_single_effect_pipeline(effect_type), effect_type)
+
+    if pipeline_path:
+        pipeline = AugmentationPipeline()
+        pipeline.load(pipeline_path)
+        if not pipeline.enabled:
+            print("[Benchmark] Pipeline is disabled in its config; benchmarking it enabled")
+            pipeline.enabled = True
+        report['pipeline'] = {
+            'path': pipeline_path,
+            'config_hash': pipeline.config_hash(),
+            'effects': [e.name for e in pipeline.effects if e.enabled],
+            'cases': run_cases(pipeline, 'pipeline'),
+        }
+
+    return report
+
+
+def _format_case(label: str, result: Dict) -> str:
+    size = f"{result['width']}x{result['height']}"
+    if 'error' in result:
+        return f"{label:<32} {size:>10} {result['boxes']:>4} boxes  ERROR {result['error']}"
+    return (f"{label:<32} {size:>10} {result['boxes']:>4} boxes  "
+            f"{result['images_per_sec']:>8.1f} img/s  p50 {result['p50_ms']:>7.2f} ms  "
+            f"p99 {result['p99_ms']:>7.2f} ms  peak {result['peak_memory_mb']:>7.1f} MB")
+
+
+def _parse_resolution(value: str):
+    try:
+        width, height = value.lower().split('x')
+        return int(width), int(height)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected WIDTHxHEIGHT, got {value!r}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark augmentation effects and pipelines.")
+    parser.add_argument('--effects', nargs='*', default=None,
+                        help="Effect class names to benchmark (default: all registered effects)")
+    parser.add_argument('--no-effects', action='store_true', help="Skip the per-effect pass")
+    parser.add_argument('--pipeline', help="Saved pipeline config to benchmark as a whole")
+    parser.add_argument('--resolutions', nargs='+', type=_parse_resolution,
+                        default=DEFAULT_RESOLUTIONS, help="Image sizes as WIDTHxHEIGHT")
+    parser.add_argument('--boxes', nargs='+', type=int, default=DEFAULT_BOX_COUNTS,
+                        help="Bbox counts per image")
+    parser.add_argument('--iterations', type=int, default=50)
+    parser.add_argument('--warmup', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help="Write the JSON report to this file")
+    args = parser.parse_args(argv)
+
+    effect_types = [] if args.no_effects else args.effects
+    report = run_benchmarks(effect_types, args.pipeline, args.resolutions, args.boxes,
+                            iterations=args.iterations, warmup=args.warmup, seed=args.seed)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"[Benchmark] Report written to {args.output}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
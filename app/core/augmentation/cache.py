@@ -0,0 +1,281 @@
+"""
+Content-addressed cache for augmented samples.
+
+Every augmented sample is named after a key derived from
+(source image and label content hash, pipeline config hash, augmentation index, seed),
+so re-running an unchanged pipeline finds its outputs already on disk,
+interrupted runs resume where they stopped, and outputs produced by an
+older configuration can be recognised and removed.
+
+A manifest additionally records which sources (by mtime/size/hash) were fully
+augmented under which configuration, so incremental runs only stat unchanged
+sources and spend work on the delta.
+"""
+
+import hashlib
+import json
+import os
+import re
+import threading
+from typing import Optional, Tuple
+
+
+# aug_<config hash prefix>_<sample key prefix>_<source stem><ext>
+CACHED_NAME_PATTERN = re.compile(r'^aug_([0-9a-f]{8})_([0-9a-f]{12})_(.+)$')
+
+
+def file_signature(path: str) -> Optional[list]:
+    """Return [mtime_ns, size] of a file, or None if it doesn't exist."""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return [stat.st_mtime_ns, stat.st_size]
+
+
+def hash_file(path: str, chunk_size: int = 1 << 20) -> str:
+    """Return the hex content hash of a file."""
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class AugmentationCache:
+    """
+    Tracks source content hashes and names augmented outputs by content.
+
+    The index stores source hashes (keyed by path, mtime and size, so unchanged files
+    are never re-read) and the manifest of fully augmented sources. Whether a single
+    sample is cached is decided by the presence of its content-addressed output files,
+    which are written atomically.
+    """
+
+    INDEX_FILE = 'index.json'
+
+    def __init__(self, cache_dir: str):
+        """
+        Args:
+            cache_dir: Directory holding the cache index
+        """
+        self.cache_dir = cache_dir
+        os.makedirs(cache_dir, exist_ok=True)
+        self.index_path = os.path.join(cache_dir, self.INDEX_FILE)
+        self._lock = threading.Lock()
+        self._index = self._load_index()
+        self._dirty = False
+        # Manifest entries of this run, committed once their outputs exist
+        self._pending = {}
+
+    def _load_index(self):
+        if os.path.exists(self.index_path):
+            try:
+                with open(self.index_path, 'r') as f:
+                    index = json.load(f)
+                if isinstance(index, dict):
+                    index.setdefault('sources', {})
+                    index.setdefault('manifest', {})
+                    return index
+            except (OSError, ValueError):
+                print(f"[Augmentation Cache] Ignoring unreadable index at {self.index_path}")
+        return {'sources': {}, 'manifest': {}}
+
+    def save(self):
+        """Persist the index (atomically) if anything changed."""
+        with self._lock:
+            if not self._dirty:
+                return
+            tmp_path = self.index_path + '.tmp'
+            with open(tmp_path, 'w') as f:
+                json.dump(self._index, f)
+            os.replace(tmp_path, self.index_path)
+            self._dirty = False
+
+    def source_hash(self, path: str) -> str:
+        """
+        Content hash of a source file, memoized by (mtime, size).
+
+        Args:
+            path: Path of the source image or label file
+
+        Returns:
+            str: Hex digest of the file content, or 'none' if the file doesn't exist
+        """
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            return 'none'
+        key = os.path.abspath(path)
+        with self._lock:
+            entry = self._index['sources'].get(key)
+            if entry and entry.get('mtime') == stat.st_mtime_ns and entry.get('size') == stat.st_size:
+                return entry['hash']
+
+        digest = hash_file(path)
+        with self._lock:
+            self._index['sources'][key] = {'mtime': stat.st_mtime_ns, 'size': stat.st_size, 'hash': digest}
+            self._dirty = True
+        return digest
+
+    def is_current(self, img_path: str, label_path: str, config_hash: str, seed: Optional[int], count: int) -> bool:
+        """
+        Whether a source was already fully augmented with this configuration.
+
+        Only stats the image, the label and the recorded outputs; nothing is read or
+        hashed. A deleted output makes the source not current, so it gets rebuilt.
+        """
+        with self._lock:
+            entry = self._index['manifest'].get(os.path.abspath(img_path))
+        if not entry:
+            return False
+        return (entry['config'] == config_hash and entry['seed'] == seed
+                and len(entry['outputs']) >= count
+                and entry['image'] == file_signature(img_path)
+                and entry['label'] == file_signature(label_path)
+                and all(self.is_cached(img, label) for img, label in entry['outputs'][:count]))
+
+    def stage(self, img_path: str, label_path: str, content_hash: str, config_hash: str,
+              seed: Optional[int], outputs: list):
+        """
+        Record the planned outputs of a source. The entry reaches the manifest on commit(),
+        and only if every output file was actually written.
+
+        Args:
+            content_hash: Combined image/label content hash the outputs were keyed by
+            outputs: [image_path, label_path] of every augmentation index
+        """
+        entry = {
+            'image': file_signature(img_path),
+            'label': file_signature(label_path),
+            'content': content_hash,
+            'config': config_hash,
+            'seed': seed,
+            'outputs': outputs,
+        }
+        with self._lock:
+            self._pending[os.path.abspath(img_path)] = entry
+
+    def commit(self) -> int:
+        """Move staged entries whose outputs all exist into the manifest."""
+        committed = 0
+        with self._lock:
+            for key, entry in self._pending.items():
+                if all(self.is_cached(img, label) for img, label in entry['outputs']):
+                    self._index['manifest'][key] = entry
+                    committed += 1
+            self._pending = {}
+            if committed:
+                self._dirty = True
+        return committed
+
+    def purge_changed(self, img_path: str, content_hash: str, keep=()) -> int:
+        """
+        Delete the recorded outputs of a source whose image or label content changed.
+
+        Args:
+            img_path: Source image
+            content_hash: Current combined image/label content hash
+            keep: Output paths that are still valid and must not be removed
+
+        Returns:
+            int: Number of files removed
+        """
+        with self._lock:
+            entry = self._index['manifest'].get(os.path.abspath(img_path))
+        if not entry or entry.get('content') == content_hash:
+            return 0
+        return self._remove_outputs(entry['outputs'], keep)
+
+    def purge_missing(self, img_paths) -> int:
+        """
+        Delete the recorded outputs of sources that are no longer in the dataset.
+
+        Args:
+            img_paths: Image paths that still exist
+
+        Returns:
+            int: Number of files removed
+        """
+        existing = {os.path.abspath(path) for path in img_paths}
+        with self._lock:
+            gone = [key for key in self._index['manifest'] if key not in existing]
+            entries = [self._index['manifest'].pop(key) for key in gone]
+            if gone:
+                self._dirty = True
+        return sum(self._remove_outputs(entry['outputs']) for entry in entries)
+
+    def _remove_outputs(self, outputs, keep=()):
+        keep = set(keep)
+        removed = 0
+        for pair in outputs:
+            for path in pair:
+                if path in keep or not os.path.exists(path):
+                    continue
+                try:
+                    os.remove(path)
+                    removed += 1
+                except OSError as e:
+                    print(f"[Augmentation Cache] Could not remove {path}: {e}")
+        return removed
+
+    @staticmethod
+    def sample_key(source_hash: str, config_hash: str, aug_idx: int, seed: Optional[int] = None) -> str:
+        """Key of one augmented sample."""
+        raw = f"{source_hash}:{config_hash}:{aug_idx}:{seed}".encode('utf-8')
+        return hashlib.blake2b(raw, digest_size=16).hexdigest()
+
+    @staticmethod
+    def output_names(config_hash: str, sample_key: str, img_file: str, ext: str = None) -> Tuple[str, str]:
+        """Return the content-addressed (image_name, label_name) for a sample of img_file.
+
+        ext overrides the image extension (default: the source's).
+        """
+        base_name, source_ext = os.path.splitext(img_file)
+        ext = ext or source_ext
+        prefix = f"aug_{config_hash[:8]}_{sample_key[:12]}_{base_name}"
+        return prefix + ext, prefix + '.txt'
+
+    @staticmethod
+    def is_cached(image_path: str, label_path: str) -> bool:
+        """A sample is cached once both of its output files exist."""
+        return os.path.exists(image_path) and os.path.exists(label_path)
+
+    def collect_garbage(self, output_images_dir: str, output_labels_dir: str, config_hash: str) -> int:
+        """
+        Delete cached outputs that were produced by a different pipeline configuration.
+
+        Args:
+            output_images_dir: Directory holding augmented images
+            output_labels_dir: Directory holding augmented labels
+            config_hash: Hash of the configuration whose outputs should be kept
+
+        Returns:
+            int: Number of files removed
+        """
+        removed = 0
+        keep_prefix = config_hash[:8]
+        for directory in {output_images_dir, output_labels_dir}:
+            if not os.path.isdir(directory):
+                continue
+            for name in os.listdir(directory):
+                match = CACHED_NAME_PATTERN.match(name)
+                if match and match.group(1) != keep_prefix:
+                    try:
+                        os.remove(os.path.join(directory, name))
+                        removed += 1
+                    except OSError as e:
+                        print(f"[Augmentation Cache] Could not remove {name}: {e}")
+
+        # Forget sources that no longer exist, and manifest entries of other configurations
+        with self._lock:
+            stale = [path for path in self._index['sources'] if not os.path.exists(path)]
+            for path in stale:
+                del self._index['sources'][path]
+            outdated = [key for key, entry in self._index['manifest'].items() if entry['config'] != config_hash]
+            for key in outdated:
+                del self._index['manifest'][key]
+            if stale or outdated:
+                self._dirty = True
+
+        return removed
@@ -0,0 +1,160 @@
+"""
+Output encoding of augmented images.
+
+EncodeSettings picks the file format and encoder parameters of a run; EncodeStats
+counts the bytes written and the time spent encoding, since encoding is a large
+share of augmentation wall time (PNG in particular).
+"""
+
+import io
+import os
+import threading
+import time
+
+import cv2
+import numpy as np
+
+
+# 'source' keeps the extension of each source image
+OUTPUT_FORMATS = ('source', 'jpg', 'png', 'webp')
+ENCODERS = ('cv2', 'pil')
+
+_PIL_FORMATS = {'.jpg': 'JPEG', '.jpeg': 'JPEG', '.png': 'PNG', '.webp': 'WEBP', '.bmp': 'BMP'}
+
+
+class EncodeSettings:
+    """Format and encoder parameters for augmented images. Picklable, so it travels with the run context."""
+
+    def __init__(self, format='source', quality=95, png_compression=1, encoder='cv2'):
+        """
+        Args:
+            format: One of OUTPUT_FORMATS
+            quality: JPEG/WebP quality (1-100)
+            png_compression: PNG zlib level (0-9). Low levels are much faster and only slightly larger.
+            encoder: 'cv2', or 'pil' to encode with Pillow (its wheels ship libjpeg-turbo and
+                take RGB directly, saving the BGR conversion)
+        """
+        if format not in OUTPUT_FORMATS:
+            raise ValueError(f"Unknown output format '{format}'. Expected one of {OUTPUT_FORMATS}")
+        if encoder not in ENCODERS:
+            raise ValueError(f"Unknown encoder '{encoder}'. Expected one of {ENCODERS}")
+        self.format = format
+        self.quality = int(min(100, max(1, quality)))
+        self.png_compression = int(min(9, max(0, png_compression)))
+        self.encoder = encoder
+
+    def extension(self, img_file: str) -> str:
+        """Output extension (with dot) for a sample of img_file."""
+        if self.format == 'source':
+            return os.path.splitext(img_file)[1]
+        return '.' + self.format
+
+    def cache_token(self) -> str:
+        """Settings that change the written bytes, for the output cache key."""
+        return f"{self.format}:q{self.quality}:png{self.png_compression}:{self.encoder}"
+
+    def is_default(self) -> bool:
+        return self.cache_token() == EncodeSettings().cache_token()
+
+    def encode(self, image: np.ndarray, ext: str) -> bytes:
+        """
+        Encode an RGB uint8 image.
+
+        Args:
+            image: (H, W, 3) RGB image
+            ext: Target extension, e.g. '.jpg'
+
+        Returns:
+            bytes: The encoded file
+        """
+        ext = ext.lower()
+        if self.encoder == 'pil':
+            return self._encode_pil(image, ext)
+
+        params = []
+        if ext in ('.jpg', '.jpeg'):
+            params = [cv2.IMWRITE_JPEG_QUALITY, self.quality]
+        elif ext == '.webp':
+            params = [cv2.IMWRITE_WEBP_QUALITY, self.quality]
+        elif ext == '.png':
+            params = [cv2.IMWRITE_PNG_COMPRESSION, self.png_compression]
+        ok, encoded = cv2.imencode(ext, cv2.cvtColor(image, cv2.COLOR_RGB2BGR), params)
+        if not ok:
+            raise IOError(f"Could not encode image as {ext}")
+        return encoded.tobytes()
+
+    def _encode_pil(self, image, ext):
+        from PIL import Image
+
+        pil_format = _PIL_FORMATS.get(ext)
+        if pil_format is None:
+            raise IOError(f"Could not encode image as {ext}")
+        options = {}
+        if pil_format in ('JPEG', 'WEBP'):
+            options['quality'] = self.quality
+        elif pil_format == 'PNG':
+            options['compress_level'] = self.png_compression
+        buffer = io.BytesIO()
+        Image.fromarray(image).save(buffer, format=pil_format, **options)
+        return buffer.getvalue()
+
+    def to_dict(self) -> dict:
+        return {
+            'format': self.format,
+            'quality': self.quality,
+            'png_compression': self.png_compression,
+            'encoder': self.encoder,
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> 'EncodeSettings':
+        return cls(**{key: data[key] for key in ('format', 'quality', 'png_compression', 'encoder') if key in data})
+
+
+class EncodeStats:
+    """Thread-safe totals of encoded images, bytes written and seconds spent encoding."""
+
+    def __init__(self):
+        self.images = 0
+        self.bytes = 0
+        self.seconds = 0.0
+        self._lock = threading.Lock()
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state['_lock']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def add(self, num_bytes: int, seconds: float, images: int = 1):
+        with self._lock:
+            self.images += images
+            self.bytes += num_bytes
+            self.seconds += seconds
+
+    def merge(self, other: 'EncodeStats'):
+        self.add(other.bytes, other.seconds, other.images)
+
+    def encode(self, settings: EncodeSettings, image: np.ndarray, ext: str) -> bytes:
+        """Encode with `settings` and record the result."""
+        start = time.perf_counter()
+        data = settings.encode(image, ext)
+        self.add(len(data), time.perf_counter() - start)
+        return data
+
+    def to_dict(self) -> dict:
+        return {
+            'images': self.images,
+            'bytes': self.bytes,
+            'encode_seconds': self.seconds,
+            'mean_bytes': self.bytes / self.images if self.images else 0.0,
+            'mean_encode_ms': 1000.0 * self.seconds / self.images if self.images else 0.0,
+        }
+
+    def summary(self) -> str:
+        data = self.to_dict()
+        return (f"{data['images']} images, {data['bytes'] / 1e6:.1f} MB written, "
+                f"{data['encode_seconds']:.2f} s encoding ({data['mean_encode_ms']:.1f} ms/image)")
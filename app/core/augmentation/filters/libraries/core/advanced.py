@@ -2,6 +2,8 @@
 
 from app.core.augmentation.base import AugmentationEffect, ParamSpec, FilterCategory
 import albumentations as A
+import cv2
+import numpy as np
 
 
 class PerspectiveEffect(AugmentationEffect):
@@ -12,6 +14,7 @@ class PerspectiveEffect(AugmentationEffect):
     
     category = FilterCategory.ADVANCED
     bbox_safe = True
+    warp_only = True
     
     def __init__(self, scale=0.05, probability=0.5, enabled=True):
         super().__init__(probability, enabled)
@@ -24,6 +27,19 @@ class PerspectiveEffect(AugmentationEffect):
             p=self.probability
         )
     
+    def sample_matrix(self, rng, width, height):
+        # Same corner jitter as A.Perspective: each corner moves inwards by |N(0, scale)|
+        jitter = np.mod(np.abs(rng.normal(0, rng.uniform(0, self.scale), (4, 2))), 1)
+        src = np.array([
+            [jitter[0, 0], jitter[0, 1]],
+            [1.0 - jitter[1, 0], jitter[1, 1]],
+            [1.0 - jitter[2, 0], 1.0 - jitter[2, 1]],
+            [jitter[3, 0], 1.0 - jitter[3, 1]],
+        ]) * [width, height]
+        dst = np.array([[0, 0], [width, 0], [width, height], [0, height]], dtype=np.float64)
+        # keep_size: the warped quad is stretched back over the whole image
+        return cv2.getPerspectiveTransform(src.astype(np.float32), dst.astype(np.float32)).astype(np.float64)
+    
     def get_param_specs(self):
         return {
             'scale': ParamSpec(
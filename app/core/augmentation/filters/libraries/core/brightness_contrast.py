@@ -2,6 +2,14 @@
 
 from app.core.augmentation.base import AugmentationEffect, ParamSpec, FilterCategory
 import albumentations as A
+import numpy as np
+from app.core.augmentation.lut import apply_lut
+
+
+def _brightness_contrast_lut(alpha, beta):
+    """LUT of RandomBrightnessContrast for uint8 images (brightness relative to max value)."""
+    lut = np.arange(256, dtype=np.float32) * alpha + beta * 255.0
+    return np.clip(lut, 0, 255).astype(np.uint8)
 
 
 class BrightnessContrastEffect(AugmentationEffect):
@@ -9,6 +17,7 @@ class BrightnessContrastEffect(AugmentationEffect):
     
     category = FilterCategory.COLOR
     bbox_safe = True
+    pixel_only = True
     
     def __init__(self, brightness_limit=0.2, contrast_limit=0.2, probability=0.5, enabled=True):
         super().__init__(probability, enabled)
@@ -22,6 +31,14 @@ class BrightnessContrastEffect(AugmentationEffect):
             p=self.probability
         )
     
+    def apply(self, image, rng):
+        return apply_lut(image, self.sample_lut(rng), dst=image)
+    
+    def sample_lut(self, rng):
+        alpha = 1.0 + rng.uniform(-self.contrast_limit, self.contrast_limit)
+        beta = rng.uniform(-self.brightness_limit, self.brightness_limit)
+        return _brightness_contrast_lut(alpha, beta)
+    
     def get_param_specs(self):
         return {
             'brightness_limit': ParamSpec(
@@ -54,6 +71,7 @@ class BrightnessEffect(AugmentationEffect):
     
     category = FilterCategory.COLOR
     bbox_safe = True
+    pixel_only = True
     
     def __init__(self, limit=0.2, probability=0.5, enabled=True):
         super().__init__(probability, enabled)
@@ -66,6 +84,13 @@ class BrightnessEffect(AugmentationEffect):
             p=self.probability
         )
     
+    def apply(self, image, rng):
+        return apply_lut(image, self.sample_lut(rng), dst=image)
+    
+    def sample_lut(self, rng):
+        beta = rng.uniform(-self.limit, self.limit)
+        return _brightness_contrast_lut(1.0, beta)
+    
     def get_param_specs(self):
         return {
             'limit': ParamSpec(
@@ -88,6 +113,7 @@ class ContrastEffect(AugmentationEffect):
     
     category = FilterCategory.COLOR
     bbox_safe = True
+    pixel_only = True
     
     def __init__(self, limit=0.2, probability=0.5, enabled=True):
         super().__init__(probability, enabled)
@@ -100,6 +126,13 @@ class ContrastEffect(AugmentationEffect):
             p=self.probability
         )
     
+    def apply(self, image, rng):
+        return apply_lut(image, self.sample_lut(rng), dst=image)
+    
+    def sample_lut(self, rng):
+        alpha = 1.0 + rng.uniform(-self.limit, self.limit)
+        return _brightness_contrast_lut(alpha, 0.0)
+    
     def get_param_specs(self):
         return {
             'limit': ParamSpec(
@@ -2,6 +2,7 @@
 
 from app.core.augmentation.base import AugmentationEffect, ParamSpec, FilterCategory
 import albumentations as A
+from app.core.augmentation.warp import crop_matrix
 
 
 class RandomCropEffect(AugmentationEffect):
@@ -75,6 +76,7 @@ class CenterCropEffect(AugmentationEffect):
     
     category = FilterCategory.SPATIAL
     bbox_safe = False  # May crop out bboxes
+    warp_only = True
     
     def __init__(self, scale=0.8, probability=0.5, enabled=True):
         super().__init__(probability, enabled)
@@ -90,6 +92,12 @@ class CenterCropEffect(AugmentationEffect):
             p=self.probability
         )
     
+    def sample_matrix(self, rng, width, height):
+        # Whole pixels per side, truncated like CropAndPad does
+        margin = (1.0 - self.scale) / 2.0
+        dx, dy = int(margin * width), int(margin * height)
+        return crop_matrix(dx, dy, width - dx, height - dy, width, height)
+    
     def get_param_specs(self):
         return {
             'scale': ParamSpec(
@@ -2,6 +2,8 @@
 
 from app.core.augmentation.base import AugmentationEffect, ParamSpec, FilterCategory
 import albumentations as A
+import numpy as np
+from app.core.augmentation.lut import apply_lut
 
 
 class ExposureEffect(AugmentationEffect):
@@ -9,6 +11,7 @@ class ExposureEffect(AugmentationEffect):
     
     category = FilterCategory.COLOR
     bbox_safe = True
+    pixel_only = True
     
     def __init__(self, gamma_min=80, gamma_max=120, probability=0.5, enabled=True):
         super().__init__(probability, enabled)
@@ -21,6 +24,13 @@ class ExposureEffect(AugmentationEffect):
             p=self.probability
         )
     
+    def apply(self, image, rng):
+        return apply_lut(image, self.sample_lut(rng), dst=image)
+    
+    def sample_lut(self, rng):
+        gamma = rng.uniform(self.gamma_min, self.gamma_max) / 100.0
+        return ((np.arange(256, dtype=np.float64) / 255.0) ** gamma * 255.0).astype(np.uint8)
+    
     def get_param_specs(self):
         return {
             'gamma_min': ParamSpec(
@@ -2,6 +2,7 @@
 
 from app.core.augmentation.base import AugmentationEffect, ParamSpec, FilterCategory
 import albumentations as A
+from app.core.augmentation.warp import flip_matrix
 
 
 class HorizontalFlipEffect(AugmentationEffect):
@@ -9,10 +10,14 @@ class HorizontalFlipEffect(AugmentationEffect):
     
     category = FilterCategory.GEOMETRIC
     bbox_safe = True
+    warp_only = True
     
     def get_transform(self):
         return A.HorizontalFlip(p=self.probability)
     
+    def sample_matrix(self, rng, width, height):
+        return flip_matrix(True, width, height)
+    
     def get_param_specs(self):
         return {}  # No additional parameters
     
@@ -25,10 +30,14 @@ class VerticalFlipEffect(AugmentationEffect):
     
     category = FilterCategory.GEOMETRIC
     bbox_safe = True
+    warp_only = True
     
     def get_transform(self):
         return A.VerticalFlip(p=self.probability)
     
+    def sample_matrix(self, rng, width, height):
+        return flip_matrix(False, width, height)
+    
     def get_param_specs(self):
         return {}  # No additional parameters
     
@@ -2,6 +2,8 @@
 
 from app.core.augmentation.base import AugmentationEffect, ParamSpec, FilterCategory
 import albumentations as A
+import cv2
+import numpy as np
 
 
 class GaussianNoiseEffect(AugmentationEffect):
@@ -9,6 +11,7 @@ class GaussianNoiseEffect(AugmentationEffect):
     
     category = FilterCategory.NOISE
     bbox_safe = True
+    pixel_only = True
     
     def __init__(self, var_limit_min=10.0, var_limit_max=50.0, probability=0.5, enabled=True):
         super().__init__(probability, enabled)
@@ -21,6 +24,13 @@ class GaussianNoiseEffect(AugmentationEffect):
             p=self.probability
         )
     
+    def apply(self, image, rng):
+        sigma = rng.uniform(self.var_limit_min, self.var_limit_max) ** 0.5
+        noise = rng.standard_normal(image.shape, dtype=np.float32)
+        noise *= sigma
+        # Saturating add straight into the uint8 buffer, no float copy of the image
+        return cv2.add(image, noise.astype(np.int16), dst=image, dtype=cv2.CV_8U)
+    
     def get_param_specs(self):
         return {
             'var_limit_min': ParamSpec(
@@ -2,6 +2,9 @@
 
 from app.core.augmentation.base import AugmentationEffect, ParamSpec, FilterCategory
 import albumentations as A
+import cv2
+import numpy as np
+from app.core.augmentation.lut import apply_lut
 
 
 class RGBShiftEffect(AugmentationEffect):
@@ -9,6 +12,7 @@ class RGBShiftEffect(AugmentationEffect):
     
     category = FilterCategory.COLOR
     bbox_safe = True
+    pixel_only = True
     
     def __init__(self, r_shift=20, g_shift=20, b_shift=20, probability=0.5, enabled=True):
         super().__init__(probability, enabled)
@@ -24,6 +28,16 @@ class RGBShiftEffect(AugmentationEffect):
             p=self.probability
         )
     
+    def apply(self, image, rng):
+        return apply_lut(image, self.sample_lut(rng), dst=image)
+    
+    def sample_lut(self, rng):
+        limits = np.array([self.r_shift, self.g_shift, self.b_shift], dtype=np.float32)
+        shifts = rng.uniform(-limits, limits).astype(np.float32)
+        # One column per channel instead of three channel passes
+        lut = np.arange(256, dtype=np.float32)[:, None] + shifts[None, :]
+        return np.clip(lut, 0, 255).astype(np.uint8)
+    
     def get_param_specs(self):
         return {
             'r_shift': ParamSpec(
@@ -66,6 +80,7 @@ class HueSaturationEffect(AugmentationEffect):
     
     category = FilterCategory.COLOR
     bbox_safe = True
+    pixel_only = True
     
     def __init__(self, hue_shift=20, sat_shift=30, val_shift=20, probability=0.5, enabled=True):
         super().__init__(probability, enabled)
@@ -81,6 +96,21 @@ class HueSaturationEffect(AugmentationEffect):
             p=self.probability
         )
     
+    def apply(self, image, rng):
+        hue_shift = rng.uniform(-self.hue_shift, self.hue_shift)
+        sat_shift = rng.uniform(-self.sat_shift, self.sat_shift)
+        val_shift = rng.uniform(-self.val_shift, self.val_shift)
+        # Shift H, S and V with one 3-channel LUT on the HSV image (OpenCV hue wraps at 180)
+        levels = np.arange(256, dtype=np.float32)
+        lut = np.stack([
+            np.mod(levels + hue_shift, 180),
+            np.clip(levels + sat_shift, 0, 255),
+            np.clip(levels + val_shift, 0, 255),
+        ], axis=1).astype(np.uint8).reshape(1, 256, 3)
+        hsv = cv2.cvtColor(image, cv2.COLOR_RGB2HSV)
+        cv2.LUT(hsv, lut, dst=hsv)
+        return cv2.cvtColor(hsv, cv2.COLOR_HSV2RGB, dst=image)
+    
     def get_param_specs(self):
         return {
             'hue_shift': ParamSpec(
@@ -3,6 +3,7 @@
 from app.core.augmentation.base import AugmentationEffect, ParamSpec, FilterCategory
 import albumentations as A
 import cv2
+from app.core.augmentation.warp import rotation_matrix
 
 
 class RotateEffect(AugmentationEffect):
@@ -10,6 +11,7 @@ class RotateEffect(AugmentationEffect):
     
     category = FilterCategory.GEOMETRIC
     bbox_safe = True
+    warp_only = True
     
     def __init__(self, limit=15, border_value=0, probability=0.5, enabled=True):
         super().__init__(probability, enabled)
@@ -24,6 +26,9 @@ class RotateEffect(AugmentationEffect):
             p=self.probability
         )
     
+    def sample_matrix(self, rng, width, height):
+        return rotation_matrix(rng.uniform(-self.limit, self.limit), width, height)
+    
     def get_param_specs(self):
         return {
             'limit': ParamSpec(
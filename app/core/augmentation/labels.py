@@ -0,0 +1,135 @@
+"""
+Vectorized YOLO label I/O and bbox sanitization for the augmentation path.
+Labels are handled as NumPy arrays instead of per-box Python lists.
+"""
+
+import os
+import warnings
+from typing import Tuple
+
+import numpy as np
+
+
+# One output line per box: class id followed by normalized cx, cy, w, h
+_LABEL_LINE = "%d %.6f %.6f %.6f %.6f\n"
+
+
+def empty_labels() -> np.ndarray:
+    """Return an empty (0, 5) label array."""
+    return np.zeros((0, 5), dtype=np.float32)
+
+
+def read_yolo_labels(label_path: str) -> np.ndarray:
+    """
+    Read a YOLO label file in one bulk parse.
+
+    Args:
+        label_path: Path to the .txt label file
+
+    Returns:
+        np.ndarray: (N, 5) float32 array of [class_id, cx, cy, w, h]. Extra columns
+        (e.g. polygon points) are ignored; a missing file gives an empty array.
+    """
+    if not os.path.exists(label_path):
+        return empty_labels()
+
+    try:
+        with warnings.catch_warnings():
+            # Empty label files (background images) are valid; silence numpy's "no data" warning
+            warnings.simplefilter("ignore", UserWarning)
+            labels = np.loadtxt(label_path, dtype=np.float32, ndmin=2, usecols=range(5))
+    except ValueError:
+        # Ragged file (e.g. a stray short line): fall back to line-by-line parsing
+        labels = _read_yolo_labels_slow(label_path)
+
+    return labels.reshape(-1, 5)
+
+
+def parse_yolo_labels(text: str) -> np.ndarray:
+    """Parse YOLO label text (e.g. read from a shard) into an (N, 5) float32 array."""
+    lines = text.splitlines()
+    try:
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", UserWarning)
+            labels = np.loadtxt(lines, dtype=np.float32, ndmin=2, usecols=range(5))
+    except ValueError:
+        labels = _parse_label_lines(lines)
+    return labels.reshape(-1, 5)
+
+
+def _read_yolo_labels_slow(label_path: str) -> np.ndarray:
+    with open(label_path, 'r') as f:
+        return _parse_label_lines(f)
+
+
+def _parse_label_lines(lines) -> np.ndarray:
+    rows = []
+    for line in lines:
+        parts = line.split()
+        if len(parts) >= 5:
+            try:
+                rows.append([float(v) for v in parts[:5]])
+            except ValueError:
+                continue
+    if not rows:
+        return empty_labels()
+    return np.asarray(rows, dtype=np.float32)
+
+
+def split_labels(labels: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Split an (N, 5) label array into (N, 4) bboxes and (N,) integer class ids."""
+    labels = np.asarray(labels, dtype=np.float32).reshape(-1, 5)
+    return labels[:, 1:5], labels[:, 0].astype(np.int64)
+
+
+def format_yolo_labels(class_ids, bboxes) -> str:
+    """
+    Format boxes as YOLO label text with a single formatting pass.
+
+    Args:
+        class_ids: Sequence of N class ids
+        bboxes: Sequence of N [cx, cy, w, h] boxes (normalized)
+
+    Returns:
+        str: Label file contents, one line per box
+    """
+    bboxes = np.asarray(bboxes, dtype=np.float64).reshape(-1, 4)
+    if len(bboxes) == 0:
+        return ""
+    class_ids = np.asarray(class_ids, dtype=np.float64).reshape(-1, 1)
+    rows = np.hstack([class_ids, bboxes])
+    return (_LABEL_LINE * len(rows)) % tuple(rows.ravel().tolist())
+
+
+def write_yolo_labels(label_path: str, class_ids, bboxes):
+    """Write boxes to a YOLO label file."""
+    with open(label_path, 'w') as f:
+        f.write(format_yolo_labels(class_ids, bboxes))
+
+
+def clip_bboxes(bboxes) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Clip YOLO bboxes so every edge lies inside [0, 1].
+
+    Albumentations rejects boxes that poke out of the image by even a rounding error,
+    so widths/heights are clamped to (0, 1] and centers pulled in far enough that
+    both edges stay inside the image.
+
+    Args:
+        bboxes: Sequence of N [cx, cy, w, h] boxes (normalized)
+
+    Returns:
+        tuple: ((M, 4) float64 clipped boxes, (N,) bool mask of the rows that were kept)
+    """
+    boxes = np.asarray(bboxes, dtype=np.float64).reshape(-1, 4)
+    # Drop NaN/inf rows instead of letting them poison the transform
+    valid = np.isfinite(boxes).all(axis=1)
+    boxes = boxes[valid]
+
+    # Computed in float64 so cx + w/2 can't round past 1.0 when Albumentations converts it
+    w = np.clip(boxes[:, 2], 0.0001, 1.0)
+    h = np.clip(boxes[:, 3], 0.0001, 1.0)
+    cx = np.clip(boxes[:, 0], w / 2.0, 1.0 - w / 2.0)
+    cy = np.clip(boxes[:, 1], h / 2.0, 1.0 - h / 2.0)
+
+    return np.stack([cx, cy, w, h], axis=1), valid
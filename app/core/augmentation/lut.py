@@ -0,0 +1,52 @@
+"""
+256-entry lookup tables for uint8 colour effects.
+
+A LUT is a (256,) uint8 array applied to every channel, or a (256, 3) uint8 array
+with one column per RGB channel. Effects that are per-channel value mappings
+(brightness, contrast, gamma, channel shifts) sample a LUT, and consecutive LUTs are
+composed so the image is touched by a single cv2.LUT call.
+"""
+
+import cv2
+import numpy as np
+
+
+IDENTITY_LUT = np.arange(256, dtype=np.uint8)
+
+
+def compose_luts(first: np.ndarray, second: np.ndarray) -> np.ndarray:
+    """
+    Return the LUT equivalent to applying `first`, then `second`.
+
+    Exact for uint8 images, since each step maps uint8 values to uint8 values.
+    """
+    if first.ndim == 1 and second.ndim == 1:
+        return second[first]
+    first = _per_channel(first)
+    second = _per_channel(second)
+    return np.take_along_axis(second, first.astype(np.intp), axis=0)
+
+
+def _per_channel(lut: np.ndarray) -> np.ndarray:
+    if lut.ndim == 1:
+        return np.repeat(lut[:, None], 3, axis=1)
+    return lut
+
+
+def apply_lut(image: np.ndarray, lut: np.ndarray, dst: np.ndarray = None) -> np.ndarray:
+    """
+    Apply a (256,) or (256, 3) LUT to a uint8 RGB image.
+
+    Args:
+        image: (H, W, 3) uint8 image
+        lut: LUT to apply
+        dst: Optional output buffer (may be `image` itself for an in-place pass)
+
+    Returns:
+        np.ndarray: The mapped image
+    """
+    if lut.ndim == 2:
+        lut = np.ascontiguousarray(lut).reshape(1, 256, 3)
+    if dst is None:
+        return cv2.LUT(image, lut)
+    return cv2.LUT(image, lut, dst=dst)
@@ -0,0 +1,244 @@
+"""
+Online augmentation: applies a ForgeAugment pipeline inside the Ultralytics training
+data loader instead of writing augmented copies to disk.
+
+Every time the loader draws a training sample, the pipeline is run on it after
+Ultralytics' own mosaic/perspective augmentations, so each epoch sees fresh samples
+and no aug_ files are written or re-read.
+
+The same dataset hook also trains on pre-augmented samples packed into shards
+(see augmentation.shards), reading them straight from the shard files.
+"""
+
+import math
+from copy import copy
+from pathlib import Path
+
+import cv2
+import numpy as np
+from ultralytics.data.dataset import YOLODataset
+from ultralytics.models.yolo.detect import DetectionTrainer
+
+
+class PipelineTransform:
+    """
+    Ultralytics transform that runs an AugmentationPipeline on a training sample.
+
+    Holds the pipeline as its to_dict() data and rebuilds it lazily, so it can be
+    pickled into spawned data loader workers.
+    """
+
+    def __init__(self, pipeline_data: dict):
+        """
+        Args:
+            pipeline_data: AugmentationPipeline.to_dict() output
+        """
+        self.pipeline_data = pipeline_data
+        self._pipeline = None
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['_pipeline'] = None
+        return state
+
+    def _get_pipeline(self):
+        if self._pipeline is None:
+            from app.core.augmentation_engine import AugmentationPipeline
+            self._pipeline = AugmentationPipeline()
+            self._pipeline.from_dict(self.pipeline_data)
+            # Online samples should differ every epoch, never replay a fixed seed
+            self._pipeline.seed = None
+        return self._pipeline
+
+    def __call__(self, labels: dict) -> dict:
+        pipeline = self._get_pipeline()
+        if not pipeline.enabled or not pipeline.effects:
+            return labels
+
+        img = labels['img']
+        if img.ndim != 3 or img.shape[2] != 3:
+            return labels
+        h, w = img.shape[:2]
+
+        instances = labels['instances']
+        instances.convert_bbox(format='xywh')
+        instances.normalize(w, h)
+        bboxes = instances.bboxes
+        class_ids = labels['cls'].reshape(-1)
+
+        # Ultralytics works in BGR, the pipeline in RGB
+        rgb = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
+        aug_img, aug_bboxes, aug_classes = pipeline.run_on_image(rgb, bboxes, class_ids)
+
+        # Batches are collated into one tensor, so keep the shape the loader produced
+        if aug_img.shape[:2] != (h, w):
+            aug_img = cv2.resize(aug_img, (w, h), interpolation=cv2.INTER_LINEAR)
+        labels['img'] = np.ascontiguousarray(cv2.cvtColor(aug_img, cv2.COLOR_RGB2BGR))
+
+        aug_bboxes = np.asarray(aug_bboxes, dtype=np.float32).reshape(-1, 4)
+        segments = None
+        if len(aug_bboxes) != len(bboxes) and instances.segments is not None and len(instances.segments):
+            # Polygons can't follow dropped boxes; detection training doesn't need them
+            segments = np.zeros((0, instances.segments.shape[1], 2), dtype=np.float32)
+        instances.update(bboxes=aug_bboxes, segments=segments)
+        labels['cls'] = np.asarray(aug_classes, dtype=np.float32).reshape(-1, 1)
+        return labels
+
+
+class OnlineAugmentDataset(YOLODataset):
+    """YOLODataset that inserts a PipelineTransform before the final Format step,
+    and loads samples appended by add_shard_samples from their shards."""
+
+    pipeline_data = None
+    shard_reader = None
+    shard_start = None  # index of the first shard sample
+
+    def build_transforms(self, hyp=None):
+        transforms = super().build_transforms(hyp)
+        # Also re-applied when close_mosaic() rebuilds the transforms for the last epochs
+        if self.augment and self.pipeline_data:
+            transforms.transforms.insert(len(transforms.transforms) - 1, PipelineTransform(self.pipeline_data))
+        return transforms
+
+    def load_image(self, i, rect_mode=True, resize_short=False):
+        if self.shard_start is None or i < self.shard_start or self.ims[i] is not None:
+            return super().load_image(i, rect_mode, resize_short)
+
+        im = self.shard_reader.read_image(i - self.shard_start, self.cv2_flag)
+        if im is None:
+            raise FileNotFoundError(f"Image Not Found {self.im_files[i]}")
+        # Same resizing as BaseDataset.load_image
+        h0, w0 = im.shape[:2]
+        if rect_mode:
+            r = self.imgsz / (min(h0, w0) if resize_short else max(h0, w0))
+            if r != 1:
+                if resize_short:
+                    w, h = (math.ceil(w0 * r), self.imgsz) if h0 < w0 else (self.imgsz, math.ceil(h0 * r))
+                else:
+                    w, h = min(math.ceil(w0 * r), self.imgsz), min(math.ceil(h0 * r), self.imgsz)
+                im = cv2.resize(im, (w, h), interpolation=cv2.INTER_LINEAR)
+        elif not (h0 == w0 == self.imgsz):
+            im = cv2.resize(im, (self.imgsz, self.imgsz), interpolation=cv2.INTER_LINEAR)
+        if im.ndim == 2:
+            im = im[..., None]
+
+        if self.augment:
+            self.ims[i], self.im_hw0[i], self.im_hw[i] = im, (h0, w0), im.shape[:2]
+            self.buffer.append(i)
+            if 1 < len(self.buffer) >= self.max_buffer_length:
+                j = self.buffer.pop(0)
+                self.ims[j], self.im_hw0[j], self.im_hw[j] = None, None, None
+        return im, (h0, w0), im.shape[:2]
+
+
+def _as_forge_dataset(dataset):
+    """Switch a plain YOLODataset to OnlineAugmentDataset in place; None if unsupported."""
+    if type(dataset) is OnlineAugmentDataset:
+        return dataset
+    if type(dataset) is not YOLODataset:
+        return None
+    dataset.__class__ = OnlineAugmentDataset
+    return dataset
+
+
+def enable_online_augmentation(dataset, pipeline_data: dict, hyp):
+    """
+    Switch a built training dataset to online augmentation.
+
+    Args:
+        dataset: YOLODataset built by the trainer
+        pipeline_data: AugmentationPipeline.to_dict() output
+        hyp: Training hyperparameters the dataset was built with (trainer.args)
+
+    Returns:
+        The dataset, now applying the pipeline on every sample
+    """
+    if _as_forge_dataset(dataset) is None:
+        print(f"[Online Augmentation] Unsupported dataset type {type(dataset).__name__}, pipeline not applied")
+        return dataset
+    dataset.pipeline_data = pipeline_data
+    dataset.transforms = dataset.build_transforms(hyp=copy(hyp))
+    return dataset
+
+
+def add_shard_samples(dataset, shard_dir: str):
+    """
+    Append the samples packed in shard_dir to a built training dataset.
+
+    Images are decoded from the memory-mapped shards when the loader needs them;
+    nothing is extracted to disk.
+
+    Args:
+        dataset: YOLODataset built by the trainer (not in rect mode or with cache='ram')
+        shard_dir: Directory of shards written by AugmentationEngine
+
+    Returns:
+        int: Number of samples added
+    """
+    from app.core.augmentation.shards import ShardReader
+
+    reader = ShardReader(shard_dir)
+    if not len(reader):
+        return 0
+    # RAM caching packs the images into one buffer that can't grow
+    if (dataset.rect or not isinstance(dataset.ims, list) or getattr(dataset, 'shard_start', None) is not None
+            or _as_forge_dataset(dataset) is None):
+        print(f"[Shards] Unsupported dataset setup ({type(dataset).__name__}, rect or RAM cache), "
+              f"shard samples not added")
+        return 0
+
+    dataset.shard_reader = reader
+    dataset.shard_start = len(dataset.labels)
+    for i in range(len(reader)):
+        labels = reader.read_labels(i)
+        if dataset.single_cls:
+            labels[:, 0] = 0
+        width, height = reader.image_size(i)
+        # Pseudo path; only used for logging and never opened
+        im_file = f"{shard_dir}/{reader.key(i)}"
+        dataset.im_files.append(im_file)
+        dataset.labels.append({
+            'im_file': im_file,
+            'shape': (height, width),
+            'cls': labels[:, 0:1],
+            'bboxes': labels[:, 1:5],
+            'segments': [],
+            'keypoints': None,
+            'normalized': True,
+            'bbox_format': 'xywh',
+        })
+    added = len(dataset.labels) - dataset.shard_start
+    dataset.ni = len(dataset.labels)
+    dataset.ims += [None] * added
+    dataset.im_hw0 += [None] * added
+    dataset.im_hw += [None] * added
+    # Never loaded for shard samples, but BaseDataset expects one entry per image
+    dataset.npy_files += [Path(f).with_suffix('.npy') for f in dataset.im_files[dataset.shard_start:]]
+    if dataset.augment:
+        dataset.max_buffer_length = min((dataset.ni, dataset.batch_size * 8, 1000))
+    return added
+
+
+class OnlineAugmentTrainer(DetectionTrainer):
+    """
+    DetectionTrainer whose training set runs a ForgeAugment pipeline on the fly
+    and/or includes pre-augmented samples from shards.
+
+    Pass to YOLO.train with functools.partial to bind the pipeline:
+        model.train(trainer=partial(OnlineAugmentTrainer, pipeline_data=data), ...)
+    """
+
+    def __init__(self, *args, pipeline_data: dict = None, shard_dir: str = None, **kwargs):
+        self.pipeline_data = pipeline_data
+        self.shard_dir = shard_dir
+        super().__init__(*args, **kwargs)
+
+    def build_dataset(self, img_path, mode='train', batch=None):
+        dataset = super().build_dataset(img_path, mode, batch)
+        if mode == 'train' and self.shard_dir:
+            added = add_shard_samples(dataset, self.shard_dir)
+            if added:
+                print(f"[Shards] Training on {added} packed samples from {self.shard_dir}")
+        if mode == 'train' and self.pipeline_data:
+            enable_online_augmentation(dataset, self.pipeline_data, self.args)
+        return dataset
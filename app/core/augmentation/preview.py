@@ -0,0 +1,253 @@
+"""
+Background rendering of augmentation previews.
+
+The source image is decoded once and a downsampled proxy is cached for the preview
+size, so dragging an effect slider only re-runs the pipeline on a small image. Work
+happens on one worker thread; while it is busy only the newest request is kept, so
+stale parameter states are skipped instead of queued. Effects whose parameters are
+in pixels (blur kernels, elastic sigma, ...) look stronger on the proxy; request
+full_res for an exact render.
+
+Several samples can be rendered at once (in parallel) and tiled into a grid with
+each sample's per-effect timings drawn on it, using AugmentationPipeline.run_profiled.
+"""
+
+import concurrent.futures
+import math
+import os
+import threading
+import time
+from typing import Callable, Optional, Tuple
+
+import cv2
+import numpy as np
+
+from app.core.augmentation.labels import read_yolo_labels, split_labels
+
+
+class PreviewResult:
+    """
+    One rendered preview (images are RGB uint8).
+
+    `samples` holds (image, bboxes, class_labels, timings) for every augmented draw;
+    augmented/bboxes/class_labels/timings repeat the first one. `grid` is the tiled
+    overlay image when a grid size was requested, else None.
+    """
+
+    def __init__(self, generation, image_path, original, samples, full_res, seconds, grid=None):
+        self.generation = generation
+        self.image_path = image_path
+        self.original = original
+        self.samples = samples
+        self.augmented, self.bboxes, self.class_labels, self.timings = samples[0]
+        self.full_res = full_res
+        self.seconds = seconds
+        self.grid = grid
+
+
+def format_timings(timings, limit: Optional[int] = None) -> list:
+    """'Effect: 12.3 ms' lines, slowest first."""
+    ordered = sorted(timings, key=lambda item: item[1], reverse=True)
+    return [f"{name}: {seconds * 1000:.1f} ms" for name, seconds in ordered[:limit]]
+
+
+def render_grid(samples, size: Tuple[int, int], columns: Optional[int] = None) -> np.ndarray:
+    """
+    Tile augmented samples into one image with their boxes and per-effect timings drawn on.
+
+    Args:
+        samples: (image, bboxes, class_labels, timings) tuples as in PreviewResult.samples
+        size: (width, height) of the grid image
+        columns: Tiles per row (default: as square as possible)
+
+    Returns:
+        np.ndarray: (height, width, 3) RGB grid
+    """
+    width, height = size
+    columns = columns or math.ceil(math.sqrt(len(samples)))
+    rows = math.ceil(len(samples) / columns)
+    tile_w, tile_h = max(1, width // columns), max(1, height // rows)
+    grid = np.full((height, width, 3), 43, dtype=np.uint8)
+
+    for i, (image, bboxes, _, timings) in enumerate(samples):
+        img_h, img_w = image.shape[:2]
+        scale = min(tile_w / img_w, tile_h / img_h)
+        new_w, new_h = max(1, int(img_w * scale)), max(1, int(img_h * scale))
+        tile = cv2.resize(image, (new_w, new_h), interpolation=cv2.INTER_AREA if scale < 1 else cv2.INTER_LINEAR)
+        tile = np.ascontiguousarray(tile)
+
+        for cx, cy, bw, bh in (box[:4] for box in bboxes):
+            cv2.rectangle(tile, (int((cx - bw / 2) * new_w), int((cy - bh / 2) * new_h)),
+                          (int((cx + bw / 2) * new_w), int((cy + bh / 2) * new_h)), (0, 255, 0), 1)
+
+        lines = [f"total: {sum(t for _, t in timings) * 1000:.1f} ms"] + format_timings(timings, limit=5)
+        line_h = 13
+        overlay_h = min(new_h, line_h * len(lines) + 4)
+        overlay_w = min(new_w, 8 + 6 * max(len(line) for line in lines))
+        # Darken the text background so the numbers stay readable on any image
+        tile[:overlay_h, :overlay_w] //= 3
+        for j, line in enumerate(lines):
+            cv2.putText(tile, line, (3, line_h * (j + 1)), cv2.FONT_HERSHEY_SIMPLEX, 0.35,
+                        (255, 255, 0) if j == 0 else (255, 255, 255), 1, cv2.LINE_AA)
+
+        x0 = (i % columns) * tile_w + (tile_w - new_w) // 2
+        y0 = (i // columns) * tile_h + (tile_h - new_h) // 2
+        grid[y0:y0 + new_h, x0:x0 + new_w] = tile
+    return grid
+
+
+class PreviewRenderer:
+    """
+    Renders previews of a pipeline on a background thread, newest request wins.
+
+    The pipeline is passed as to_dict() data with each request and rebuilt on the
+    worker only when it changed, so the UI can keep editing its own pipeline while a
+    preview is running.
+    """
+
+    def __init__(self, on_result: Callable[[PreviewResult], None], on_error: Callable[[Exception], None] = None):
+        """
+        Args:
+            on_result: Called on the worker thread with each PreviewResult that is still
+                current. UIs must marshal it to their own thread (e.g. Tk's after()).
+            on_error: Called on the worker thread when a render fails
+        """
+        self.on_result = on_result
+        self.on_error = on_error
+        self._cond = threading.Condition()
+        self._pending = None
+        self._generation = 0
+        self._closed = False
+        self._thread = None
+
+        # Worker-thread state
+        self._pipeline = None
+        self._pipeline_data = None
+        self._source_key = None
+        self._source = None
+        self._proxies = {}
+        self._executor = None
+
+    @property
+    def generation(self) -> int:
+        """Generation of the newest request; results with a lower one are stale."""
+        return self._generation
+
+    def request(self, image_path: str, label_path: str, pipeline_data: dict, max_side: Optional[int] = 512,
+                full_res: bool = False, count: int = 1, grid_size: Optional[Tuple[int, int]] = None) -> int:
+        """
+        Ask for a preview, replacing any request that hasn't started yet.
+
+        Args:
+            image_path: Source image
+            label_path: Its YOLO label file
+            pipeline_data: AugmentationPipeline.to_dict() snapshot
+            max_side: Longer edge of the proxy the pipeline runs on
+            full_res: Run on the full-resolution image instead of the proxy
+            count: Number of augmented samples, rendered in parallel
+            grid_size: (width, height) to also tile the samples into PreviewResult.grid
+
+        Returns:
+            int: Generation of this request
+        """
+        with self._cond:
+            self._generation += 1
+            self._pending = (self._generation, image_path, label_path, pipeline_data, max_side, full_res,
+                             max(1, count), grid_size)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._loop, daemon=True)
+                self._thread.start()
+            self._cond.notify()
+            return self._generation
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._pending = None
+            self._cond.notify()
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+
+    def _loop(self):
+        while True:
+            with self._cond:
+                while self._pending is None and not self._closed:
+                    self._cond.wait()
+                if self._closed:
+                    return
+                request = self._pending
+                self._pending = None
+            try:
+                result = self._render(*request)
+            except Exception as e:
+                if self.on_error:
+                    self.on_error(e)
+                continue
+            # A newer request arrived while rendering; its result will replace this one
+            if result is not None and result.generation == self._generation:
+                self.on_result(result)
+
+    def _load_source(self, image_path, label_path):
+        try:
+            key = (image_path, os.path.getmtime(image_path), label_path,
+                   os.path.getmtime(label_path) if os.path.exists(label_path) else None)
+        except OSError:
+            return None
+        if key != self._source_key:
+            image = cv2.imread(image_path)
+            if image is None:
+                return None
+            image = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+            bboxes, class_labels = split_labels(read_yolo_labels(label_path))
+            self._source_key = key
+            self._source = (image, bboxes, class_labels)
+            self._proxies = {}
+        return self._source
+
+    def _proxy(self, image, max_side):
+        proxy = self._proxies.get(max_side)
+        if proxy is None:
+            height, width = image.shape[:2]
+            scale = max_side / max(height, width)
+            if scale >= 1:
+                proxy = image
+            else:
+                size = (max(1, round(width * scale)), max(1, round(height * scale)))
+                proxy = cv2.resize(image, size, interpolation=cv2.INTER_AREA)
+            self._proxies[max_side] = proxy
+        return proxy
+
+    def _get_pipeline(self, pipeline_data):
+        if self._pipeline is None or pipeline_data != self._pipeline_data:
+            from app.core.augmentation_engine import AugmentationPipeline
+            pipeline = AugmentationPipeline()
+            pipeline.from_dict(pipeline_data)
+            # Previews should show a fresh draw every time
+            pipeline.seed = None
+            self._pipeline = pipeline
+            self._pipeline_data = pipeline_data
+        return self._pipeline
+
+    def _render(self, generation, image_path, label_path, pipeline_data, max_side, full_res, count, grid_size):
+        source = self._load_source(image_path, label_path)
+        if source is None:
+            return None
+        image, bboxes, class_labels = source
+        if not full_res and max_side:
+            image = self._proxy(image, max_side)
+
+        start = time.perf_counter()
+        pipeline = self._get_pipeline(pipeline_data)
+        pipeline.get_profile_stages()  # compile once here, not raced by the sample threads
+        if count == 1:
+            samples = [pipeline.run_profiled(image, bboxes, class_labels)]
+        else:
+            if self._executor is None:
+                self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=min(8, os.cpu_count() or 4))
+            futures = [self._executor.submit(pipeline.run_profiled, image, bboxes, class_labels)
+                       for _ in range(count)]
+            samples = [future.result() for future in futures]
+        samples = [(np.ascontiguousarray(aug_img),) + tuple(rest) for aug_img, *rest in samples]
+        seconds = time.perf_counter() - start
+        grid = render_grid(samples, grid_size) if grid_size else None
+        return PreviewResult(generation, image_path, image, samples, full_res, seconds, grid)
@@ -0,0 +1,326 @@
+"""
+Lazy registry of augmentation filters.
+
+Filter files are indexed by parsing their source (class names, category, bbox_safe)
+instead of executing them, and the index is persisted with each file's mtime and size.
+Startup only stats the filter files; a module is imported the first time one of
+its effects is looked up, and rescans re-index changed files only.
+"""
+
+import ast
+import importlib.util
+import inspect
+import json
+import os
+import threading
+from collections.abc import Mapping
+from typing import Dict, Optional
+
+from app.core.augmentation.base import FilterCategory
+
+
+INDEX_VERSION = 2
+
+
+def default_index_path() -> str:
+    """Location of the persisted filter index (next to the global settings)."""
+    appdata_dir = os.path.join(os.environ.get('APPDATA', os.path.expanduser('~')), 'JIETStudio')
+    return os.path.join(appdata_dir, 'filter_index.json')
+
+
+def _literal_value(node):
+    if isinstance(node, ast.Constant):
+        return node.value
+    # FilterCategory.GEOMETRIC -> "Geometric"
+    if isinstance(node, ast.Attribute) and isinstance(node.value, ast.Name) and node.value.id == 'FilterCategory':
+        try:
+            return FilterCategory[node.attr].value
+        except KeyError:
+            return None
+    return None
+
+
+def _class_settings(node: ast.ClassDef) -> dict:
+    """category / bbox_safe assigned in a class body."""
+    settings = {}
+    for item in node.body:
+        if isinstance(item, ast.Assign) and len(item.targets) == 1 and isinstance(item.targets[0], ast.Name):
+            target = item.targets[0].id
+            value = _literal_value(item.value)
+            if target == 'category' and isinstance(value, str):
+                settings['category'] = value
+            elif target == 'bbox_safe' and isinstance(value, bool):
+                settings['bbox_safe'] = value
+    return settings
+
+
+def scan_filter_source(file_path: str) -> dict:
+    """
+    Find effect classes in a filter file without executing it.
+
+    A class counts as an effect if it defines get_transform or derives from
+    AugmentationEffect (or another effect in the same file), mirroring the
+    runtime check used when the module is imported. Classes deriving from a base
+    defined elsewhere are returned as pending; FilterRegistry resolves them against
+    the other filter files.
+
+    Returns:
+        dict: {'classes': [{'name', 'category', 'bbox_safe'}] for each effect class,
+        'pending': [{'name', 'bases', 'imported', 'category', 'bbox_safe'}] for the
+        undecided classes (category and bbox_safe are None unless set in the class body,
+        imported tells whether a base comes from an import)}
+    """
+    with open(file_path, 'r', encoding='utf-8') as f:
+        tree = ast.parse(f.read(), filename=file_path)
+
+    imported = set()
+    for node in tree.body:
+        if isinstance(node, ast.ImportFrom):
+            imported.update(alias.asname or alias.name for alias in node.names)
+
+    effects = {}
+    pending = []
+    for node in tree.body:
+        if not isinstance(node, ast.ClassDef):
+            continue
+        base_names = {b.id if isinstance(b, ast.Name) else getattr(b, 'attr', None) for b in node.bases}
+        base_names.discard(None)
+        defines_transform = any(isinstance(item, ast.FunctionDef) and item.name == 'get_transform' for item in node.body)
+        parent = next((effects[name] for name in base_names if name in effects), None)
+        settings = _class_settings(node)
+        if not (defines_transform or parent or 'AugmentationEffect' in base_names):
+            if base_names:
+                pending.append({
+                    'name': node.name,
+                    'bases': sorted(base_names),
+                    # `from helpers import Base` or `helpers.Base`
+                    'imported': any(name in imported for name in base_names)
+                                or any(isinstance(b, ast.Attribute) for b in node.bases),
+                    'category': settings.get('category'),
+                    'bbox_safe': settings.get('bbox_safe'),
+                })
+            continue
+
+        effects[node.name] = {
+            'name': node.name,
+            'category': settings.get('category', parent['category'] if parent else FilterCategory.OTHER.value),
+            'bbox_safe': settings.get('bbox_safe', parent['bbox_safe'] if parent else True),
+        }
+
+    return {'classes': list(effects.values()), 'pending': pending}
+
+
+class FilterRegistry(Mapping):
+    """
+    Read-only mapping of effect name -> effect class, importing filter modules on demand.
+
+    Iterating, len() and `in` only use the index; indexing imports the module that
+    defines the effect (once, until its file changes).
+    """
+
+    def __init__(self, filters_dir: str, index_path: Optional[str] = None):
+        """
+        Args:
+            filters_dir: Root directory searched recursively for filter .py files
+            index_path: Persisted index file (default: APPDATA/JIETStudio/filter_index.json)
+        """
+        self.filters_dir = filters_dir
+        self.index_path = index_path or default_index_path()
+        self._lock = threading.RLock()
+        self._files = self._load_index()
+        self._names = {}
+        self._effects = {}  # file path -> effect infos, including resolved pending classes
+        self._modules = {}  # file path -> {class name: class}
+        self.rescan()
+
+    def _load_index(self) -> Dict[str, dict]:
+        if os.path.exists(self.index_path):
+            try:
+                with open(self.index_path, 'r') as f:
+                    index = json.load(f)
+                if index.get('version') == INDEX_VERSION and index.get('filters_dir') == self.filters_dir:
+                    return index.get('files', {})
+            except (OSError, ValueError, AttributeError):
+                print(f"[Filter Registry] Ignoring unreadable index at {self.index_path}")
+        return {}
+
+    def _save_index(self):
+        data = {'version': INDEX_VERSION, 'filters_dir': self.filters_dir, 'files': self._files}
+        try:
+            os.makedirs(os.path.dirname(self.index_path), exist_ok=True)
+            tmp_path = self.index_path + '.tmp'
+            with open(tmp_path, 'w') as f:
+                json.dump(data, f, indent=2)
+            os.replace(tmp_path, self.index_path)
+        except OSError as e:
+            print(f"[Filter Registry] Could not save index: {e}")
+
+    def _filter_files(self):
+        for root, dirs, files in os.walk(self.filters_dir):
+            dirs.sort()
+            for file in sorted(files):
+                if file.endswith('.py') and not file.startswith('__'):
+                    yield os.path.join(root, file)
+
+    def rescan(self) -> int:
+        """
+        Re-index filter files that were added, changed or removed since the last scan.
+
+        Unchanged files are only stat'ed. Changed files are parsed (not executed)
+        and their already-imported module is dropped so the next lookup reloads it.
+
+        Returns:
+            int: Number of files (re)indexed or removed
+        """
+        if not os.path.exists(self.filters_dir):
+            print(f"Warning: Filters directory not found at {self.filters_dir}")
+            return 0
+
+        with self._lock:
+            seen = set()
+            changed = 0
+            for file_path in self._filter_files():
+                seen.add(file_path)
+                try:
+                    stat = os.stat(file_path)
+                except OSError:
+                    continue
+                entry = self._files.get(file_path)
+                if entry and entry['mtime'] == stat.st_mtime_ns and entry['size'] == stat.st_size:
+                    continue
+                try:
+                    scanned = scan_filter_source(file_path)
+                except (OSError, SyntaxError, UnicodeDecodeError) as e:
+                    print(f"Error loading filter {file_path}: {e}")
+                    scanned = {'classes': [], 'pending': []}
+                self._files[file_path] = {'mtime': stat.st_mtime_ns, 'size': stat.st_size, **scanned}
+                self._modules.pop(file_path, None)
+                changed += 1
+
+            for file_path in [path for path in self._files if path not in seen]:
+                del self._files[file_path]
+                self._modules.pop(file_path, None)
+                changed += 1
+
+            self._effects, imported = self._resolve()
+            self._names = {}
+            for file_path, infos in self._effects.items():
+                for info in infos:
+                    self._names.setdefault(info['name'], file_path)
+
+            if changed or imported:
+                self._save_index()
+            return changed
+
+    def _resolve(self):
+        """
+        Decide the pending classes of every file: a class whose base is an effect of any
+        filter file (transitively) is an effect too. Files whose remaining classes derive
+        from a base imported from outside the filters are imported once to check them at
+        runtime; the result is kept in the index until the file changes.
+
+        Returns:
+            tuple: ({file path: effect infos}, whether any file was imported)
+        """
+        effects = {path: list(entry['classes']) for path, entry in self._files.items()}
+        known = {info['name']: info for infos in effects.values() for info in infos}
+        remaining = {path: list(entry.get('pending', ())) for path, entry in self._files.items()}
+        progress = True
+        while progress:
+            progress = False
+            for path, pending in remaining.items():
+                for cls in list(pending):
+                    parent = next((known[base] for base in cls['bases'] if base in known), None)
+                    if parent is None:
+                        continue
+                    info = {
+                        'name': cls['name'],
+                        'category': parent['category'] if cls['category'] is None else cls['category'],
+                        'bbox_safe': parent['bbox_safe'] if cls['bbox_safe'] is None else cls['bbox_safe'],
+                    }
+                    effects[path].append(info)
+                    known.setdefault(info['name'], info)
+                    pending.remove(cls)
+                    progress = True
+
+        imported = False
+        for path, pending in remaining.items():
+            if not any(cls['imported'] for cls in pending):
+                continue
+            entry = self._files[path]
+            if 'runtime' not in entry:
+                entry['runtime'] = self._runtime_effects(path, [cls['name'] for cls in pending])
+                imported = True
+            effects[path].extend(entry['runtime'])
+        return effects, imported
+
+    def _runtime_effects(self, file_path: str, names) -> list:
+        """Import a filter file and describe those of `names` that are effect classes."""
+        try:
+            classes = self._import(file_path)
+        except Exception as e:
+            print(f"Error loading filter {file_path}: {e}")
+            return []
+        self._modules[file_path] = classes
+        infos = []
+        for name in names:
+            cls = classes.get(name)
+            if cls is None or inspect.isabstract(cls):
+                continue
+            category = getattr(cls, 'category', FilterCategory.OTHER)
+            infos.append({
+                'name': name,
+                'category': category.value if isinstance(category, FilterCategory) else str(category),
+                'bbox_safe': bool(getattr(cls, 'bbox_safe', True)),
+            })
+        return infos
+
+    def _import(self, file_path: str) -> Dict[str, type]:
+        file = os.path.basename(file_path)
+        spec = importlib.util.spec_from_file_location(f"filter_module_{file}", file_path)
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+
+        classes = {}
+        for name, obj in inspect.getmembers(module):
+            if inspect.isclass(obj) and obj.__module__ == module.__name__:
+                if hasattr(obj, 'get_transform') and hasattr(obj, 'to_dict'):
+                    classes[name] = obj
+        return classes
+
+    def __getitem__(self, name: str) -> type:
+        with self._lock:
+            file_path = self._names.get(name)
+            if file_path is None:
+                raise KeyError(name)
+            classes = self._modules.get(file_path)
+            if classes is None:
+                try:
+                    classes = self._import(file_path)
+                except Exception as e:
+                    print(f"Error loading filter {file_path}: {e}")
+                    raise KeyError(name) from e
+                self._modules[file_path] = classes
+            if name not in classes:
+                raise KeyError(name)
+            return classes[name]
+
+    def __iter__(self):
+        return iter(list(self._names))
+
+    def __len__(self) -> int:
+        return len(self._names)
+
+    def __contains__(self, name) -> bool:
+        return name in self._names
+
+    def get_info(self, name: str) -> Optional[dict]:
+        """Indexed metadata of an effect ({'name', 'category', 'bbox_safe', 'path'}) without importing it."""
+        with self._lock:
+            file_path = self._names.get(name)
+            if file_path is None:
+                return None
+            for info in self._effects[file_path]:
+                if info['name'] == name:
+                    return dict(info, path=file_path)
+        return None
@@ -0,0 +1,77 @@
+"""
+Per-sample random state for Albumentations.
+
+Albumentations 1.x draws every random parameter from the stdlib `random` module
+(random_utils derives its numpy RandomState from it as well), so seeding a sample
+used to mean seeding the process-wide RNG. install() rebinds the `random` names in
+the Albumentations modules to a proxy that forwards to the calling thread's
+random.Random while a seeded_random() block is active, and to the stdlib module
+otherwise. Seeded samples therefore never read or write the global state, and
+unseeded callers (the preview, profiling) can't change a seeded run's output.
+
+This depends on Albumentations 1.x calling the `random` module directly, which is
+why requirements.txt pins albumentations<2; install() warns if it finds nothing to
+reroute.
+"""
+
+import random
+import sys
+import threading
+from contextlib import contextmanager
+
+_local = threading.local()
+_install_lock = threading.Lock()
+
+
+class _ThreadRandom:
+    """Stand-in for the `random` module that uses the thread's seeded generator, if any."""
+
+    def __getattr__(self, name):
+        rng = getattr(_local, 'rng', None)
+        if rng is not None and hasattr(rng, name):
+            return getattr(rng, name)
+        # Unseeded, or a module-level name such as random.Random
+        return getattr(random, name)
+
+
+_PROXY = _ThreadRandom()
+
+
+def install() -> int:
+    """
+    Route the random draws of the Albumentations modules through the proxy.
+
+    Call once, after importing albumentations (which loads all of its transform modules).
+
+    Returns:
+        int: Number of module-level names rerouted
+    """
+    import albumentations
+
+    rerouted = 0
+    with _install_lock:
+        for module_name, module in list(sys.modules.items()):
+            if module is None or not module_name.startswith('albumentations'):
+                continue
+            namespace = vars(module)
+            for name in ('random', 'py_random'):
+                if namespace.get(name) is random:
+                    namespace[name] = _PROXY
+                    rerouted += 1
+                elif namespace.get(name) is _PROXY:
+                    rerouted += 1
+    if not rerouted:
+        print(f"[Augmentation] Albumentations {albumentations.__version__} does not draw from the random "
+              f"module; seeded runs will not be reproducible (install albumentations<2)")
+    return rerouted
+
+
+@contextmanager
+def seeded_random(seed):
+    """Make Albumentations draw from random.Random(seed) on this thread for the duration of the block."""
+    previous = getattr(_local, 'rng', None)
+    _local.rng = random.Random(seed)
+    try:
+        yield _local.rng
+    finally:
+        _local.rng = previous
@@ -0,0 +1,321 @@
+"""
+Packed shard output for augmented datasets.
+
+Instead of one image and one label file per sample, samples are appended to tar
+shards (WebDataset layout: `<key>.<ext>` image bytes followed by `<key>.txt` YOLO
+labels), so a run creates a handful of large files instead of hundreds of thousands
+of small ones. Each finished shard gets a `.json` index with the byte offsets of its
+members, which lets ShardReader memory-map the tar and read any sample directly.
+Shards without an index (e.g. from an interrupted run) are indexed by scanning the tar.
+A finished run replaces the shards of earlier runs (ShardWriter.prune_previous), and
+ShardReader keeps only the newest sample of a key, so re-runs never duplicate samples.
+"""
+
+import io
+import json
+import mmap
+import os
+import tarfile
+import threading
+import time
+from datetime import datetime
+from typing import List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+from app.core.augmentation.labels import parse_yolo_labels
+
+
+INDEX_VERSION = 1
+SHARD_EXTENSION = '.tar'
+
+
+def _index_path(shard_path: str) -> str:
+    return os.path.splitext(shard_path)[0] + '.json'
+
+
+def list_shards(shard_dir: str) -> List[str]:
+    """Sorted paths of the shards in shard_dir (empty if the directory doesn't exist)."""
+    if not os.path.isdir(shard_dir):
+        return []
+    return sorted(os.path.join(shard_dir, name) for name in os.listdir(shard_dir)
+                  if name.endswith(SHARD_EXTENSION))
+
+
+class SampleBuffer:
+    """Collects samples with ShardWriter's add() signature, for handing back from worker processes."""
+
+    def __init__(self):
+        self.samples = []
+
+    def add(self, key, image_bytes, ext, label_text, size):
+        self.samples.append((key, image_bytes, ext, label_text, size))
+
+
+class ShardWriter:
+    """
+    Thread-safe writer that appends samples to size-capped tar shards.
+
+    Shards are named `<prefix>-<run timestamp>-<number>.tar`, so a run never rewrites
+    the shards of an earlier one while it is writing; call prune_previous() once the run
+    has finished to remove them.
+    """
+
+    def __init__(self, shard_dir: str, prefix: str = 'aug', max_samples: int = 10000,
+                 max_bytes: int = 1 << 30):
+        """
+        Args:
+            shard_dir: Directory receiving the shards and their indexes
+            prefix: Shard file name prefix
+            max_samples: Samples per shard before starting the next one
+            max_bytes: Approximate shard size limit in bytes
+        """
+        self.shard_dir = shard_dir
+        self.prefix = prefix
+        self.max_samples = max(1, max_samples)
+        self.max_bytes = max_bytes
+        self.run_id = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
+        self.shard_paths = []
+        self.samples_written = 0
+        self._lock = threading.Lock()
+        self._tar = None
+        self._entries = []
+        os.makedirs(shard_dir, exist_ok=True)
+
+    def _open_shard(self):
+        path = os.path.join(self.shard_dir, f"{self.prefix}-{self.run_id}-{len(self.shard_paths):05d}{SHARD_EXTENSION}")
+        # PAX: USTAR caps member names at 100 characters, too short for long video-frame stems
+        self._tar = tarfile.open(path, 'w', format=tarfile.PAX_FORMAT)
+        self._entries = []
+        self.shard_paths.append(path)
+
+    def _add_member(self, name: str, data: bytes) -> Tuple[int, int]:
+        info = tarfile.TarInfo(name)
+        info.size = len(data)
+        info.mtime = int(time.time())
+        self._tar.addfile(info, io.BytesIO(data))
+        # The data block ends, padded to 512 bytes, where the tar's write offset now stands
+        padded = -(-len(data) // tarfile.BLOCKSIZE) * tarfile.BLOCKSIZE
+        return self._tar.offset - padded, len(data)
+
+    def add(self, key: str, image_bytes: bytes, ext: str, label_text: str, size: Tuple[int, int]):
+        """
+        Append one sample.
+
+        Args:
+            key: Sample name without extension (unique within the run)
+            image_bytes: Encoded image
+            ext: Image extension with dot, e.g. '.jpg'
+            label_text: YOLO label file contents
+            size: (width, height) of the image
+        """
+        label_bytes = label_text.encode('utf-8')
+        with self._lock:
+            if self._tar is None:
+                self._open_shard()
+            image_span = self._add_member(key + ext, image_bytes)
+            label_span = self._add_member(key + '.txt', label_bytes)
+            self._entries.append({
+                'key': key,
+                'ext': ext,
+                'image': list(image_span),
+                'labels': list(label_span),
+                'width': int(size[0]),
+                'height': int(size[1]),
+            })
+            self.samples_written += 1
+            if len(self._entries) >= self.max_samples or self._tar.offset >= self.max_bytes:
+                self._close_shard()
+
+    def _close_shard(self):
+        if self._tar is None:
+            return
+        path = self.shard_paths[-1]
+        self._tar.close()
+        self._tar = None
+        index = {'version': INDEX_VERSION, 'shard': os.path.basename(path), 'samples': self._entries}
+        tmp_path = _index_path(path) + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(index, f)
+        os.replace(tmp_path, _index_path(path))
+        self._entries = []
+
+    def close(self):
+        """Finish the current shard and write its index."""
+        with self._lock:
+            self._close_shard()
+
+    def prune_previous(self) -> int:
+        """
+        Delete the shards (and indexes) with this writer's prefix that earlier runs left in shard_dir.
+
+        Returns:
+            int: Number of shards removed
+        """
+        own = {os.path.abspath(path) for path in self.shard_paths}
+        removed = 0
+        for path in list_shards(self.shard_dir):
+            if os.path.abspath(path) in own or not os.path.basename(path).startswith(self.prefix + '-'):
+                continue
+            try:
+                os.remove(path)
+                if os.path.exists(_index_path(path)):
+                    os.remove(_index_path(path))
+                removed += 1
+            except OSError as e:
+                print(f"[Shards] Could not remove old shard {path}: {e}")
+        return removed
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+def _scan_shard(shard_path: str) -> list:
+    """Rebuild the sample entries of a shard that has no index by reading its tar headers."""
+    members = {}
+    order = []
+    with tarfile.open(shard_path, 'r') as tar:
+        try:
+            for member in tar:
+                if not member.isfile():
+                    continue
+                key, ext = os.path.splitext(member.name)
+                if key not in members:
+                    members[key] = {}
+                    order.append(key)
+                members[key][ext] = (member.offset_data, member.size)
+        except tarfile.ReadError:
+            # Truncated tail of an interrupted run; keep what was complete
+            pass
+
+    entries = []
+    for key in order:
+        parts = members[key]
+        image_ext = next((ext for ext in parts if ext != '.txt'), None)
+        if image_ext is None or '.txt' not in parts:
+            continue
+        entries.append({'key': key, 'ext': image_ext, 'image': list(parts[image_ext]),
+                        'labels': list(parts['.txt']), 'width': None, 'height': None})
+    return entries
+
+
+class ShardReader:
+    """
+    Random-access reader over every shard in a directory.
+
+    Samples are addressed by position (0..len-1) or by key. Shards are memory-mapped
+    lazily, so only the pages of samples actually read are loaded. The reader can be
+    pickled into data loader workers; each process re-opens its own mappings.
+
+    A key found in several shards (e.g. left over from an interrupted re-run) is read
+    once, from the newest shard.
+    """
+
+    def __init__(self, shard_dir: str):
+        self.shard_dir = shard_dir
+        self.shard_paths = list_shards(shard_dir)
+        # Shard names sort by run timestamp, so later shards override earlier samples
+        latest = {}
+        for number, path in enumerate(self.shard_paths):
+            for entry in self._load_entries(path):
+                latest.pop(entry['key'], None)
+                latest[entry['key']] = (number, entry)
+        self._samples = list(latest.values())  # (shard number, entry)
+        self._positions = {entry['key']: i for i, (_, entry) in enumerate(self._samples)}
+        self._maps = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _load_entries(shard_path: str) -> list:
+        index_path = _index_path(shard_path)
+        if os.path.exists(index_path):
+            try:
+                with open(index_path, 'r') as f:
+                    index = json.load(f)
+                if index.get('version') == INDEX_VERSION:
+                    return index['samples']
+            except (OSError, ValueError, KeyError):
+                pass
+        try:
+            return _scan_shard(shard_path)
+        except (OSError, tarfile.TarError) as e:
+            print(f"[Shards] Skipping unreadable shard {shard_path}: {e}")
+            return []
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['_maps'] = {}
+        del state['_lock']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._samples)
+
+    def keys(self) -> List[str]:
+        return [entry['key'] for _, entry in self._samples]
+
+    def index_of(self, key: str) -> Optional[int]:
+        return self._positions.get(key)
+
+    def _map(self, number: int) -> mmap.mmap:
+        mapped = self._maps.get(number)
+        if mapped is None:
+            with self._lock:
+                mapped = self._maps.get(number)
+                if mapped is None:
+                    with open(self.shard_paths[number], 'rb') as f:
+                        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                    self._maps[number] = mapped
+        return mapped
+
+    def _read(self, i: int, part: str) -> bytes:
+        number, entry = self._samples[i]
+        offset, size = entry[part]
+        return self._map(number)[offset:offset + size]
+
+    def image_bytes(self, i: int) -> bytes:
+        """Encoded image bytes of sample i."""
+        return self._read(i, 'image')
+
+    def read_image(self, i: int, flags: int = cv2.IMREAD_COLOR) -> Optional[np.ndarray]:
+        """Decode sample i (BGR, like cv2.imread)."""
+        data = np.frombuffer(self.image_bytes(i), dtype=np.uint8)
+        return cv2.imdecode(data, flags)
+
+    def read_labels(self, i: int) -> np.ndarray:
+        """(N, 5) [class_id, cx, cy, w, h] labels of sample i."""
+        return parse_yolo_labels(self._read(i, 'labels').decode('utf-8'))
+
+    def image_size(self, i: int) -> Tuple[int, int]:
+        """(width, height) of sample i, from the index or the image header."""
+        _, entry = self._samples[i]
+        if entry.get('width') is None:
+            from PIL import Image
+            with Image.open(io.BytesIO(self.image_bytes(i))) as im:
+                entry['width'], entry['height'] = im.size
+        return entry['width'], entry['height']
+
+    def key(self, i: int) -> str:
+        return self._samples[i][1]['key']
+
+    def __getitem__(self, i: int) -> Tuple[np.ndarray, np.ndarray]:
+        """(BGR image, (N, 5) labels) of sample i."""
+        return self.read_image(i), self.read_labels(i)
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    def close(self):
+        with self._lock:
+            for mapped in self._maps.values():
+                mapped.close()
+            self._maps = {}
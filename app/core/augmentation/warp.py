@@ -0,0 +1,139 @@
+"""
+3x3 homographies for fusing consecutive geometric effects into one warp.
+
+Matrices map source to output coordinates in "edge" pixel space, where the image
+covers [0, width] x [0, height] (pixel i spans [i, i + 1]). Flips, rotations about
+the center and crops are exact in this space; the conversion to OpenCV's
+pixel-center convention happens once, right before cv2.warpPerspective. Products
+that are only flips don't resample at all (see flip_code).
+"""
+
+from typing import List, Tuple
+
+import cv2
+import numpy as np
+
+
+def rotation_matrix(angle: float, width: int, height: int) -> np.ndarray:
+    """Counter-clockwise rotation by `angle` degrees about the image center (like A.Rotate)."""
+    matrix = np.eye(3)
+    matrix[:2] = cv2.getRotationMatrix2D((width / 2.0, height / 2.0), angle, 1.0)
+    return matrix
+
+
+def flip_matrix(horizontal: bool, width: int, height: int) -> np.ndarray:
+    """Mirror left-right (horizontal) or top-bottom."""
+    if horizontal:
+        return np.array([[-1.0, 0.0, width], [0.0, 1.0, 0.0], [0.0, 0.0, 1.0]])
+    return np.array([[1.0, 0.0, 0.0], [0.0, -1.0, height], [0.0, 0.0, 1.0]])
+
+
+def flip_code(matrix: np.ndarray, width: int, height: int):
+    """
+    Recognize a homography that only mirrors the image (or leaves it unchanged).
+
+    Returns:
+        The cv2.flip code (1 horizontal, 0 vertical, -1 both), 'identity', or None if
+        the matrix resamples
+    """
+    horizontal = matrix[0, 0] < 0
+    vertical = matrix[1, 1] < 0
+    expected = np.array([[-1.0 if horizontal else 1.0, 0.0, width if horizontal else 0.0],
+                         [0.0, -1.0 if vertical else 1.0, height if vertical else 0.0],
+                         [0.0, 0.0, 1.0]])
+    if not np.allclose(matrix, expected):
+        return None
+    if horizontal and vertical:
+        return -1
+    return 1 if horizontal else 0 if vertical else 'identity'
+
+
+def crop_matrix(x0: float, y0: float, x1: float, y1: float, width: int, height: int) -> np.ndarray:
+    """Crop the region [x0, x1] x [y0, y1] and stretch it back to width x height."""
+    sx = width / (x1 - x0)
+    sy = height / (y1 - y0)
+    return np.array([[sx, 0.0, -x0 * sx], [0.0, sy, -y0 * sy], [0.0, 0.0, 1.0]])
+
+
+def warp_image(image: np.ndarray, matrix: np.ndarray, border_value=0, dst: np.ndarray = None) -> np.ndarray:
+    """
+    Resample an image once with an edge-space homography, keeping its size.
+
+    Args:
+        image: (H, W, C) image
+        matrix: 3x3 source -> output homography in edge coordinates
+        border_value: Fill value for pixels mapped from outside the source
+        dst: Optional output buffer of the same shape (must not overlap `image`)
+
+    Returns:
+        np.ndarray: Warped image
+    """
+    height, width = image.shape[:2]
+    code = flip_code(matrix, width, height)
+    if code == 'identity':
+        return image
+    if code is not None:
+        # A mirror is an exact pixel permutation: copy instead of interpolating
+        return cv2.flip(image, code, dst=dst)
+    # Pixel centers sit at +0.5 in edge space: M = T(-0.5) . H . T(+0.5)
+    shift = np.array([[1.0, 0.0, 0.5], [0.0, 1.0, 0.5], [0.0, 0.0, 1.0]])
+    unshift = np.array([[1.0, 0.0, -0.5], [0.0, 1.0, -0.5], [0.0, 0.0, 1.0]])
+    pixel_matrix = unshift @ matrix @ shift
+    return cv2.warpPerspective(image, pixel_matrix, (width, height), dst=dst, flags=cv2.INTER_LINEAR,
+                               borderMode=cv2.BORDER_CONSTANT, borderValue=border_value)
+
+
+def warp_bboxes(bboxes, labels, matrix: np.ndarray, width: int, height: int,
+                min_visibility: float = 0.3) -> Tuple[List[list], list]:
+    """
+    Transform YOLO boxes with the same homography as the image.
+
+    Each box becomes the axis-aligned hull of its warped corners, is clipped to the
+    image, and is dropped when less than `min_visibility` of it stays inside
+    (the same rule Albumentations applies through BboxParams).
+
+    Args:
+        bboxes: Sequence of N [cx, cy, w, h] boxes (normalized)
+        labels: Sequence of N class labels
+        matrix: 3x3 source -> output homography in edge coordinates
+        width: Image width in pixels
+        height: Image height in pixels
+        min_visibility: Minimum visible fraction of a warped box to keep it
+
+    Returns:
+        tuple: (list of [cx, cy, w, h] boxes, list of labels) of the kept boxes
+    """
+    boxes = np.asarray(bboxes, dtype=np.float64).reshape(-1, 4)
+    if len(boxes) == 0:
+        return [], []
+
+    x0 = (boxes[:, 0] - boxes[:, 2] / 2) * width
+    x1 = (boxes[:, 0] + boxes[:, 2] / 2) * width
+    y0 = (boxes[:, 1] - boxes[:, 3] / 2) * height
+    y1 = (boxes[:, 1] + boxes[:, 3] / 2) * height
+    # (N, 4, 3) homogeneous corners
+    corners = np.stack([
+        np.stack([x0, y0, np.ones_like(x0)], axis=1),
+        np.stack([x1, y0, np.ones_like(x0)], axis=1),
+        np.stack([x1, y1, np.ones_like(x0)], axis=1),
+        np.stack([x0, y1, np.ones_like(x0)], axis=1),
+    ], axis=1)
+    warped = corners @ matrix.T
+    warped = warped[..., :2] / warped[..., 2:3]
+
+    low = warped.min(axis=1)
+    high = warped.max(axis=1)
+    area = np.prod(high - low, axis=1)
+    limits = np.array([width, height], dtype=np.float64)
+    low_c = np.clip(low, 0, limits)
+    high_c = np.clip(high, 0, limits)
+    clipped_area = np.prod(high_c - low_c, axis=1)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        keep = (clipped_area > 0) & (clipped_area >= min_visibility * area)
+
+    low_c = low_c[keep] / limits
+    high_c = high_c[keep] / limits
+    out = np.concatenate([(low_c + high_c) / 2, high_c - low_c], axis=1)
+    kept_labels = [label for label, k in zip(labels, keep) if k]
+    return out.tolist(), kept_labels
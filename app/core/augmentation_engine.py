@@ -8,104 +8,174 @@ import cv2
 import numpy as np
 import albumentations as A
 import json
+import hashlib
 import random
+import time
 from datetime import datetime
 from abc import ABC, abstractmethod
 import concurrent.futures
+import multiprocessing
+import queue
+import threading
 
 # --- Dynamic Loading ---
 
-import importlib.util
-import inspect
+from app.core.augmentation.labels import (
+    read_yolo_labels, split_labels, write_yolo_labels, format_yolo_labels, clip_bboxes
+)
+from app.core.augmentation.cache import AugmentationCache
+from app.core.augmentation.encoding import EncodeSettings, EncodeStats
+from app.core.augmentation.shards import ShardWriter, SampleBuffer
+from app.core.augmentation.lut import apply_lut, compose_luts
+from app.core.augmentation.warp import warp_image, warp_bboxes
+from app.core.augmentation.registry import FilterRegistry
+from app.core.augmentation import rng as sample_rng
 
-def load_filters():
-    """Recursively load AugmentationEffect subclasses from the filters directory."""
-    registry = {}
-    
-    # Base directory for filters
-    base_dir = os.path.dirname(os.path.abspath(__file__))
-    filters_dir = os.path.join(base_dir, 'augmentation', 'filters')
-    
-    if not os.path.exists(filters_dir):
-        print(f"Warning: Filters directory not found at {filters_dir}")
-        return registry
-
-    # Walk through directory
-    for root, dirs, files in os.walk(filters_dir):
-        for file in files:
-            if file.endswith('.py') and not file.startswith('__'):
-                file_path = os.path.join(root, file)
-                
-                try:
-                    # Dynamic import
-                    spec = importlib.util.spec_from_file_location(f"filter_module_{file}", file_path)
-                    module = importlib.util.module_from_spec(spec)
-                    spec.loader.exec_module(module)
-                    
-                    # Inspect for subclasses
-                    for name, obj in inspect.getmembers(module):
-                        if inspect.isclass(obj) and obj.__module__ == module.__name__:
-                            # Check if it inherits from AugmentationEffect (without importing base blindly)
-                            # We can check base class name or importing base safely
-                            if hasattr(obj, 'get_transform') and hasattr(obj, 'to_dict'):
-                                registry[name] = obj
-                                
-                except Exception as e:
-                    print(f"Error loading filter {file_path}: {e}")
-                    
-    return registry
+# Seeded samples get their own random.Random instead of reseeding the global one
+sample_rng.install()
+
+FILTERS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'augmentation', 'filters')
 
-EFFECT_REGISTRY = load_filters()
+# Indexed at import (stat only); filter modules are imported on first use of one of their effects
+EFFECT_REGISTRY = FilterRegistry(FILTERS_DIR)
+
+def load_filters():
+    """Pick up added, changed or removed filter files and return the effect registry."""
+    EFFECT_REGISTRY.rescan()
+    return EFFECT_REGISTRY
 
 def create_effect_from_dict(data):
     effect_type = data.get('type')
-    # Refresh registry on creation attempt to support hot-loading (optional, but requested)
-    global EFFECT_REGISTRY
+    effect_cls = EFFECT_REGISTRY.get(effect_type)
     
-    if effect_type in EFFECT_REGISTRY:
-        effect_cls = EFFECT_REGISTRY[effect_type]
-        effect = effect_cls(probability=data.get('probability', 0.5), enabled=data.get('enabled', True))
-        effect.set_params(data)
-        return effect
+    if effect_cls is None:
+        # Unknown type: re-index changed filter files (hot-loading) and try again
+        EFFECT_REGISTRY.rescan()
+        effect_cls = EFFECT_REGISTRY.get(effect_type)
+    if effect_cls is None:
+        return None
     
-    # Try reloading if not found
-    EFFECT_REGISTRY = load_filters()
-    if effect_type in EFFECT_REGISTRY:
-        effect_cls = EFFECT_REGISTRY[effect_type]
-        effect = effect_cls(probability=data.get('probability', 0.5), enabled=data.get('enabled', True))
-        effect.set_params(data)
-        return effect
-        
-    return None
+    effect = effect_cls(probability=data.get('probability', 0.5), enabled=data.get('enabled', True))
+    effect.set_params(data)
+    return effect
+
+# Boxes less visible than this after a transform are dropped
+MIN_BBOX_VISIBILITY = 0.3
+
+AUGMENTATION_BACKENDS = ('thread', 'process')
+
+# Sentinel that tells a streaming stage its input is exhausted
+_STAGE_DONE = object()
+
+def derive_seed(seed, image_key, aug_idx):
+    """Derive the seed of one augmentation from the run seed, the source and the copy index.
+    
+    Depends only on its arguments, so a sample comes out the same regardless of worker
+    count, backend or processing order.
+    """
+    raw = f"{seed}:{image_key}:{aug_idx}".encode('utf-8')
+    return int.from_bytes(hashlib.blake2b(raw, digest_size=4).digest(), 'little')
 
 # --- Pipeline ---
 
+class _EffectList(list):
+    """A pipeline's effect list: every in-place change bumps the pipeline's version and
+    hands the effects it now holds (or no longer holds) their owner."""
+
+    def __init__(self, owner, effects=()):
+        super().__init__(effects)
+        self._owner = owner
+        for effect in self:
+            effect._owner = owner
+
+    def _changed(self, before):
+        current = {id(effect) for effect in self}
+        for effect in before:
+            if id(effect) not in current:
+                effect._owner = None
+        for effect in self:
+            effect._owner = self._owner
+        self._owner._touch()
+
+
+def _list_mutator(name):
+    method = getattr(list, name)
+
+    def mutator(self, *args, **kwargs):
+        before = list(self)
+        result = method(self, *args, **kwargs)
+        self._changed(before)
+        return result
+    mutator.__name__ = name
+    return mutator
+
+
+for _name in ('append', 'extend', 'insert', 'pop', 'remove', 'clear', 'sort', 'reverse',
+              '__setitem__', '__delitem__', '__iadd__', '__imul__'):
+    setattr(_EffectList, _name, _list_mutator(_name))
+
+
 class AugmentationPipeline:
     def __init__(self):
         self.effects = []
         self.enabled = True
         self.augmentations_per_image = 5
+        # Optional run seed for reproducible datasets (None = random every run)
+        self.seed = None
         
-        # Performance: Transform caching
+        # Performance: Transform caching, invalidated by the change counter
+        self._version = 0
         self._cached_compose = None
-        self._cache_hash = None
+        self._cache_version = None
+        self._cached_stages = None
+        self._stages_version = None
+        self._cached_profile_stages = None
+        self._profile_stages_version = None
+        self._config_hash = None
+        self._config_hash_version = None
+
+    def __setattr__(self, name, value):
+        if name == 'effects':
+            for effect in self.__dict__.get('effects', ()):
+                effect._owner = None
+            # Appending, replacing or reordering in place must invalidate the caches too
+            value = _EffectList(self, value)
+        super().__setattr__(name, value)
+        # Assigning a public attribute (enabled, seed, augmentations_per_image, effects) is a change
+        if not name.startswith('_'):
+            self._touch()
+
+    @property
+    def version(self):
+        """Change counter bumped whenever the pipeline's settings, its effect list (adding,
+        removing, reordering, also by mutating `effects` in place) or any effect's
+        settings (including enabled) change.
+        
+        Cheap to read, so callers (e.g. the UI preview) can compare it to a stored value
+        to find out whether anything needs recomputing.
+        """
+        return self._version
+
+    def _touch(self):
+        # Through __dict__: __init__ assigns public attributes before the counter exists
+        self.__dict__['_version'] = self.__dict__.get('_version', 0) + 1
+
+    # The effect list bumps the version and sets each effect's _owner, through which
+    # effects report their own changes back to the pipeline
 
     def add_effect(self, effect):
         self.effects.append(effect)
 
     def remove_effect(self, index):
         if 0 <= index < len(self.effects):
-            self.effects.pop(index)
+            del self.effects[index]
 
     def move_effect(self, from_index, to_index):
         if 0 <= from_index < len(self.effects) and 0 <= to_index < len(self.effects):
-            self.effects.insert(to_index, self.effects.pop(from_index))
+            effects = list(self.effects)
+            effects.insert(to_index, effects.pop(from_index))
+            self.effects[:] = effects
 
-    def _compute_pipeline_hash(self):
-        """Compute hash of current pipeline configuration for cache invalidation."""
-        config_str = json.dumps(self.to_dict(), sort_keys=True)
-        return hash(config_str)
-    
     def get_compose(self, use_cache=True):
         """Compile the pipeline into an Albumentations Compose object.
         
@@ -118,42 +188,112 @@ class AugmentationPipeline:
         if not use_cache:
             return self._build_compose()
         
-        # Check cache
-        current_hash = self._compute_pipeline_hash()
-        if current_hash != self._cache_hash or self._cached_compose is None:
+        # Check cache: a plain integer comparison on the hot path
+        version = self._version
+        if self._cached_compose is None or self._cache_version != version:
             self._cached_compose = self._build_compose()
-            self._cache_hash = current_hash
+            self._cache_version = version
         
         return self._cached_compose
     
+    def get_stages(self):
+        """Compile the pipeline into execution stages.
+        
+        Consecutive pixel_only effects form a ('fast', [effects]) stage whose apply()
+        kernels run directly on the image; two or more adjacent warp_only effects form a
+        ('warp', [effects]) stage resampled once with their combined matrix; every other
+        run of effects becomes a ('compose', A.Compose) stage with bbox handling.
+        Cached like get_compose().
+        
+        Returns:
+            list: [(kind, effects or A.Compose), ...] in pipeline order
+        """
+        version = self._version
+        if self._cached_stages is None or self._stages_version != version:
+            self._cached_stages = self._build_stages()
+            self._stages_version = version
+        return self._cached_stages
+
+    def get_profile_stages(self):
+        """Compile the pipeline into one stage per enabled effect, for run_profiled().
+        
+        Returns:
+            list: [(effect name, (kind, effects or A.Compose)), ...] in pipeline order
+        """
+        version = self._version
+        if self._cached_profile_stages is None or self._profile_stages_version != version:
+            self._cached_profile_stages = [
+                (effect.name, ('fast', [effect]) if effect.pixel_only
+                 else ('compose', self._compose([effect.get_transform()])))
+                for effect in self.effects if effect.enabled
+            ]
+            self._profile_stages_version = version
+        return self._cached_profile_stages
+
+    def config_hash(self):
+        """Stable hash of the effect configuration, i.e. of everything that shapes the output.
+        
+        augmentations_per_image is deliberately left out so raising the copy count keeps
+        the samples that already exist. Recomputed only when the version changes.
+        """
+        if self._config_hash is None or self._config_hash_version != self._version:
+            effects = [effect.to_dict() for effect in self.effects]
+            config_str = json.dumps(effects, sort_keys=True)
+            self._config_hash = hashlib.sha1(config_str.encode('utf-8')).hexdigest()
+            self._config_hash_version = self._version
+        return self._config_hash
+
     def _build_compose(self):
         """Build the Albumentations Compose object."""
-        transforms = []
+        return self._compose([effect.get_transform() for effect in self.effects if effect.enabled])
+
+    def _build_stages(self):
+        runs = []
         for effect in self.effects:
-            if effect.enabled:
-                transforms.append(effect.get_transform())
+            if not effect.enabled:
+                continue
+            kind = 'fast' if effect.pixel_only else 'warp' if effect.warp_only else 'compose'
+            if runs and runs[-1][0] == kind:
+                runs[-1][1].append(effect)
+            else:
+                runs.append((kind, [effect]))
         
+        # A lone geometric effect gains nothing from fusion; let Albumentations run it
+        merged = []
+        for kind, effects in runs:
+            if kind == 'warp' and len(effects) < 2:
+                kind = 'compose'
+            if merged and kind == 'compose' and merged[-1][0] == 'compose':
+                merged[-1][1].extend(effects)
+            else:
+                merged.append((kind, effects))
+        runs = merged
+        
+        return [(kind, self._compose([e.get_transform() for e in effects]) if kind == 'compose' else effects)
+                for kind, effects in runs]
+
+    @staticmethod
+    def _compose(transforms):
         return A.Compose(transforms, bbox_params=A.BboxParams(
             format='yolo',
             label_fields=['class_labels'],
-            min_visibility=0.3
+            min_visibility=MIN_BBOX_VISIBILITY
         ))
 
     def to_dict(self):
         return {
             'enabled': self.enabled,
             'augmentations_per_image': self.augmentations_per_image,
+            'seed': self.seed,
             'effects': [effect.to_dict() for effect in self.effects]
         }
 
     def from_dict(self, data):
         self.enabled = data.get('enabled', True)
         self.augmentations_per_image = data.get('augmentations_per_image', 5)
-        self.effects = []
-        for effect_data in data.get('effects', []):
-            effect = create_effect_from_dict(effect_data)
-            if effect:
-                self.effects.append(effect)
+        self.seed = data.get('seed')
+        effects = (create_effect_from_dict(effect_data) for effect_data in data.get('effects', []))
+        self.effects = [effect for effect in effects if effect]
 
     def save(self, path):
         with open(path, 'w') as f:
@@ -165,34 +305,176 @@ class AugmentationPipeline:
                 data = json.load(f)
                 self.from_dict(data)
 
-    def run_on_image(self, image, bboxes, class_labels):
+    def run_on_image(self, image, bboxes, class_labels, seed=None):
         """Run pipeline on a single image and return transformed results.
         
         Args:
             image: numpy array (RGB)
-            bboxes: list of [cx, cy, w, h] in YOLO format (normalized)
-            class_labels: list of class IDs
+            bboxes: list or (N, 4) array of [cx, cy, w, h] in YOLO format (normalized)
+            class_labels: list or (N,) array of class IDs
+            seed: Optional seed making the result reproducible
             
         Returns:
             tuple: (transformed_image, transformed_bboxes, transformed_labels)
         """
+        seeds = None if seed is None else [seed]
+        return next(self.run_batch(image, bboxes, class_labels, 1, seeds=seeds))
+
+    def run_profiled(self, image, bboxes, class_labels, seed=None):
+        """Run the pipeline on a single image, timing every effect.
+        
+        Effects run one at a time instead of as fused LUT/warp stages, so the result
+        follows the same distribution as run_on_image() but the total can be a little
+        higher than a fused run.
+        
+        Args:
+            image: numpy array (RGB)
+            bboxes: list or (N, 4) array of [cx, cy, w, h] in YOLO format (normalized)
+            class_labels: list or (N,) array of class IDs
+            seed: Optional seed making the result reproducible
+            
+        Returns:
+            tuple: (transformed_image, transformed_bboxes, transformed_labels, timings), where
+            timings is a list of (effect name, seconds) in pipeline order
+        """
+        timings = []
         if not self.enabled or not self.effects:
-            return image, bboxes, class_labels
+            return image, bboxes, class_labels, timings
+        
+        sanitized_bboxes, keep = clip_bboxes(bboxes)
+        labels = np.asarray(class_labels).reshape(-1)[keep].tolist()
+        stages = self.get_profile_stages()
+        if not (image.dtype == np.uint8 and image.ndim == 3 and image.shape[2] == 3):
+            # Fast-path kernels only handle uint8 RGB
+            stages = [(effect.name, ('compose', self._compose([effect.get_transform()])))
+                      for effect in self.effects if effect.enabled]
+        
+        def run(rng=None):
+            result = (image, sanitized_bboxes.tolist(), labels)
+            for name, stage in stages:
+                start = time.perf_counter()
+                result = self._run_stages([stage], *result, source=image, rng=rng)
+                timings.append((name, time.perf_counter() - start))
+            return result
+        
+        try:
+            if seed is None:
+                result = run(_unseeded_rng())
+            else:
+                with sample_rng.seeded_random(seed):
+                    result = run(np.random.default_rng(seed))
+        except Exception as e:
+            print(f"[Augmentation Error] Failed to profile pipeline: {e}")
+            return image, bboxes, class_labels, timings
+        return result + (timings,)
+
+    def run_batch(self, image, bboxes, class_labels, count, seeds=None):
+        """Yield `count` independent augmentations of a single image.
+        
+        The compose is resolved and the bboxes are sanitized once for the whole batch,
+        so each extra copy only pays for the transform itself. The source image is
+        never modified.
+        
+        Args:
+            image: numpy array (RGB)
+            bboxes: list or (N, 4) array of [cx, cy, w, h] in YOLO format (normalized)
+            class_labels: list or (N,) array of class IDs
+            count: Number of augmentations to generate
+            seeds: Optional list of `count` seeds, one per augmentation. Each seeded
+                augmentation draws from its own generators, never from the global state.
+            
+        Yields:
+            tuple: (transformed_image, transformed_bboxes, transformed_labels)
+        """
+        if not self.enabled or not self.effects:
+            for _ in range(count):
+                yield image, bboxes, class_labels
+            return
 
         # Sanitize bboxes: clip to [0, 1] range to avoid floating point precision issues with Albumentations
-        sanitized_bboxes = self._clip_bboxes(bboxes) if bboxes else []
+        sanitized_bboxes, keep = clip_bboxes(bboxes)
+        labels = np.asarray(class_labels).reshape(-1)[keep].tolist()
+        sanitized_bboxes = sanitized_bboxes.tolist()
 
-        transform = self.get_compose()
+        stages = self._stages_for(image)
+        
+        for i in range(count):
+            seed = None if seeds is None else seeds[i]
+            yield self._apply_seeded(seed, stages, image, sanitized_bboxes, labels, bboxes, class_labels)
+
+    def run_on_batch(self, images, bboxes_list, labels_list, seeds=None, out=None):
+        """Augment a batch of same-sized images into one preallocated output array.
+        
+        Every item draws its own random parameters. Pixel-only, fused LUT and fused
+        warp stages write straight into the item's slice of the output, so no
+        per-item image is allocated unless an Albumentations stage runs. The
+        source images are never modified.
+        
+        Args:
+            images: (B, H, W, C) array, or a list of B images of one shape (RGB)
+            bboxes_list: B sequences of [cx, cy, w, h] boxes in YOLO format (normalized)
+            labels_list: B sequences of class IDs
+            seeds: Optional list of B seeds, as in run_batch()
+            out: Optional (B, H, W, C) output array; must not overlap `images`
+            
+        Returns:
+            tuple: (images, bboxes_list, labels_list). images is the output array, or
+            a list of arrays if an effect changed the size of some item (e.g. a
+            fixed-size crop).
+        """
+        count = len(images)
+        if count == 0:
+            return (np.empty((0,) + tuple(np.shape(images)[1:]), dtype=np.uint8) if out is None else out), [], []
+        shape = images[0].shape
+        if any(img.shape != shape for img in images):
+            raise ValueError("run_on_batch needs images of one size; use run_on_image for mixed sizes")
+        if len(bboxes_list) != count or len(labels_list) != count:
+            raise ValueError("run_on_batch needs one bbox list and one label list per image")
+        if out is None:
+            out = np.empty((count,) + shape, dtype=images[0].dtype)
+        
+        if not self.enabled or not self.effects:
+            out[...] = images
+            return out, [list(b) for b in bboxes_list], [list(l) for l in labels_list]
         
+        stages = self._stages_for(images[0])
+        results = []
+        out_bboxes = []
+        out_labels = []
+        for i in range(count):
+            sanitized_bboxes, keep = clip_bboxes(bboxes_list[i])
+            labels = np.asarray(labels_list[i]).reshape(-1)[keep].tolist()
+            seed = None if seeds is None else seeds[i]
+            image, bboxes, labels = self._apply_seeded(seed, stages, images[i], sanitized_bboxes.tolist(), labels,
+                                                       bboxes_list[i], labels_list[i], dst=out[i])
+            results.append(image)
+            out_bboxes.append(list(bboxes))
+            out_labels.append(list(labels))
+        
+        if any(image.shape != shape for image in results):
+            return results, out_bboxes, out_labels
+        for i, image in enumerate(results):
+            if image is not out[i] and not np.shares_memory(image, out):
+                out[i] = image
+        return out, out_bboxes, out_labels
+
+    def _stages_for(self, image):
+        if image.dtype == np.uint8 and image.ndim == 3 and image.shape[2] == 3:
+            return self.get_stages()
+        # Fast-path kernels only handle uint8 RGB; anything else goes through Albumentations
+        return [('compose', self.get_compose())]
+
+    def _apply_seeded(self, seed, stages, image, sanitized_bboxes, labels, bboxes, class_labels, dst=None):
+        if seed is None:
+            return self._apply(stages, image, sanitized_bboxes, labels, bboxes, class_labels, dst)
+        with sample_rng.seeded_random(seed):
+            return self._apply(stages, image, sanitized_bboxes, labels, bboxes, class_labels, dst,
+                               rng=np.random.default_rng(seed))
+
+    def _apply(self, stages, image, sanitized_bboxes, labels, bboxes, class_labels, dst=None, rng=None):
+        """Run the compiled stages, falling back to the untouched input on failure."""
         try:
-            kwargs = {
-                'image': image,
-                'bboxes': sanitized_bboxes,
-                'class_labels': class_labels if class_labels else []
-            }
-
-            result = transform(**kwargs)
-            return result['image'], result['bboxes'], result['class_labels']
+            return self._run_stages(stages, image, sanitized_bboxes, labels, dst, rng=rng)
         except Exception as e:
             # Improved error handling with context
             import traceback
@@ -204,135 +486,637 @@ class AugmentationPipeline:
             print(f"  Traceback: {traceback.format_exc()}")
             return image, bboxes, class_labels
 
-    def _clip_bboxes(self, bboxes):
-        """Clip YOLO bboxes to [0, 1] range to avoid Albumentations precision errors."""
-        clipped = []
-        for bbox in bboxes:
-            try:
-                cx, cy, w, h = bbox
-                # 1. Ensure dimensions are within [0, 1] and positive
-                nw = max(0.0001, min(1.0, w))
-                nh = max(0.0001, min(1.0, h))
-                
-                # 2. Ensure center is within [nw/2, 1-nw/2] so edges strictly stay within [0, 1]
-                ncx = max(nw/2.0, min(1.0 - nw/2.0, cx))
-                ncy = max(nh/2.0, min(1.0 - nh/2.0, cy))
-                
-                clipped.append([ncx, ncy, nw, nh])
-            except (ValueError, TypeError):
+    @staticmethod
+    def _run_stages(stages, image, bboxes, labels, dst=None, source=None, rng=None):
+        """Run the stages on one sample; `dst` is an optional buffer the result may be written to.
+        
+        `source` is the caller's image when `image` is an intermediate result we own; `rng`
+        is the sample's numpy Generator for the fast-path stages (a fresh one if None).
+        """
+        source = image if source is None else source
+        for kind, stage in stages:
+            if kind == 'compose':
+                result = stage(image=image, bboxes=bboxes, class_labels=labels)
+                image, bboxes, labels = result['image'], result['bboxes'], result['class_labels']
                 continue
-        return clipped
+            
+            if rng is None:
+                rng = _unseeded_rng()
+            if kind == 'warp':
+                image, bboxes, labels = _apply_warp_stage(stage, rng, image, bboxes, labels, _free(dst, image))
+                continue
+            # Kernels work in place: never on the caller's image (or a view of it, e.g. after a crop)
+            owned = not np.may_share_memory(image, source)
+            lut = None
+            for effect in stage:
+                if rng.random() >= effect.probability:
+                    continue
+                effect_lut = effect.sample_lut(rng)
+                if effect_lut is not None:
+                    # Colour mappings are composed and applied in one pass when the run ends
+                    lut = effect_lut if lut is None else compose_luts(lut, effect_lut)
+                    continue
+                if lut is not None:
+                    image, owned = _apply_pending_lut(image, lut, owned, dst), True
+                    lut = None
+                if not owned or not image.flags.c_contiguous or not image.flags.writeable:
+                    buffer = _free(dst, image)
+                    if buffer is None:
+                        image = np.array(image, order='C')
+                    else:
+                        np.copyto(buffer, image)
+                        image = buffer
+                    owned = True
+                image = effect.apply(image, rng)
+            if lut is not None:
+                image = _apply_pending_lut(image, lut, owned, dst)
+        
+        return image, list(bboxes), list(labels)
+
+
+def _unseeded_rng():
+    # Drawn from the global state, so a caller that seeds it (e.g. the benchmark) stays reproducible
+    return np.random.default_rng(np.random.randint(0, 2**31 - 1))
+
+
+def _free(dst, image):
+    """Return dst if it can receive a result computed from image, else None."""
+    if dst is None or dst.shape != image.shape or dst.dtype != image.dtype or np.may_share_memory(dst, image):
+        return None
+    return dst
+
+
+def _apply_warp_stage(effects, rng, image, bboxes, labels, dst=None):
+    """Multiply the matrices of the geometric effects that fire and resample once (flips only copy)."""
+    height, width = image.shape[:2]
+    matrix = None
+    border_value = None
+    for effect in effects:
+        if rng.random() >= effect.probability:
+            continue
+        effect_matrix = effect.sample_matrix(rng, width, height)
+        matrix = effect_matrix if matrix is None else effect_matrix @ matrix
+        if border_value is None:
+            border_value = getattr(effect, 'border_value', None)
+    if matrix is None:
+        return image, bboxes, labels
+    
+    fill = border_value or 0
+    image = warp_image(image, matrix, border_value=(fill, fill, fill), dst=dst)
+    bboxes, labels = warp_bboxes(bboxes, labels, matrix, width, height, MIN_BBOX_VISIBILITY)
+    return image, bboxes, labels
+
+
+def _apply_pending_lut(image, lut, owned, dst=None):
+    """Apply a fused LUT, in place if the buffer is ours, else into dst or a new array (no extra copy)."""
+    if owned and image.flags.c_contiguous and image.flags.writeable:
+        return apply_lut(image, lut, dst=image)
+    return apply_lut(np.ascontiguousarray(image), lut, dst=_free(dst, image))
+
+def downscale_to(image, max_size):
+    """Shrink an image so its longer edge is at most max_size, keeping the aspect ratio.
+    
+    Images that already fit are returned as-is (never upscaled). INTER_AREA averages
+    the dropped pixels instead of aliasing them.
+    """
+    height, width = image.shape[:2]
+    longest = max(height, width)
+    if longest <= max_size:
+        return image
+    scale = max_size / longest
+    size = (max(1, round(width * scale)), max(1, round(height * scale)))
+    return cv2.resize(image, size, interpolation=cv2.INTER_AREA)
+
+
+def _reduced_read_flag(img_path, max_size):
+    """imread flag that lets the decoder skip resolution we'll throw away.
+    
+    JPEG decoders can decode at 1/2, 1/4 or 1/8 scale far faster than at full size;
+    pick the strongest reduction that still leaves the longer edge >= max_size.
+    """
+    try:
+        from PIL import Image
+        with Image.open(img_path) as im:
+            longest = max(im.size)
+    except Exception:
+        return cv2.IMREAD_COLOR
+    for factor, flag in ((8, cv2.IMREAD_REDUCED_COLOR_8), (4, cv2.IMREAD_REDUCED_COLOR_4),
+                         (2, cv2.IMREAD_REDUCED_COLOR_2)):
+        if longest // factor >= max_size:
+            return flag
+    return cv2.IMREAD_COLOR
 
 # --- Engine ---
 
+class _RunContext:
+    """Settings of one augment_dataset run, shared by every stage and shipped to process workers."""
+
+    def __init__(self, images_dir, labels_dir, output_images_dir, output_labels_dir, seed=None, purge_stale=False,
+                 max_size=None, config_hash=None, encoding=None, shard_dir=None):
+        self.images_dir = images_dir
+        self.labels_dir = labels_dir
+        self.output_images_dir = output_images_dir
+        self.output_labels_dir = output_labels_dir
+        self.seed = seed
+        self.purge_stale = purge_stale
+        self.max_size = max_size
+        self.encoding = encoding or EncodeSettings()
+        # Samples are packed into shards here instead of written as files
+        self.shard_dir = shard_dir
+        # Pipeline config hash, extended with every run setting that changes the output
+        self.config_hash = config_hash
+
+
+class _Progress:
+    """Thread-safe progress counter that forwards to the user's callback."""
+
+    def __init__(self, total, callback):
+        self.total = total
+        self.callback = callback
+        self.current = 0
+        # Samples found in the output cache (counted apart from failed or skipped ones)
+        self.reused = 0
+        self._lock = threading.Lock()
+
+    def advance(self, count, message, reused=False):
+        with self._lock:
+            self.current += count
+            if reused:
+                self.reused += count
+            current = self.current
+        if self.callback:
+            # A failing UI callback must not kill the stage thread reporting progress
+            try:
+                self.callback(current, self.total, message)
+            except Exception as e:
+                print(f"[Augmentation] Progress callback error: {e}")
+
+
 class AugmentationEngine:
     """Refactored backbone using the pipeline."""
     
-    def __init__(self, pipeline=None):
+    def __init__(self, pipeline=None, seed=None):
+        """
+        Args:
+            pipeline: The AugmentationPipeline to run
+            seed: Run seed; overrides pipeline.seed when set
+        """
         self.pipeline = pipeline or AugmentationPipeline()
+        self.seed = seed
+        # EncodeStats of the last augment_dataset run
+        self.last_encode_stats = None
+        # Samples the last augment_dataset run took from the output cache instead of generating
+        self.last_reused_count = 0
 
-    def augment_dataset(self, images_dir, labels_dir, output_images_dir, output_labels_dir, progress_callback=None, workers=4):
+    def augment_dataset(self, images_dir, labels_dir, output_images_dir, output_labels_dir, progress_callback=None, workers=4,
+                        backend='thread', seed=None, queue_size=8, cache_dir=None, collect_garbage=False,
+                        purge_stale=False, max_size=None, encoding=None, write_workers=None,
+                        shard_dir=None, shard_size=10000):
         """
         Augment entire dataset.
+
+        Args:
+            backend: 'thread' streams images through decode, transform and write stages running
+                on threads, 'process' runs whole images on a ProcessPoolExecutor so transforms
+                are not serialized by the GIL.
+            seed: Run seed, defaulting to the engine's and then the pipeline's seed. Each
+                augmentation is seeded from (seed, source file name, copy index), so seeded runs
+                are bit-identical across runs, backends and worker counts, and output names are
+                deterministic. Seeded augmentations use per-sample generators, so they don't contend
+                with each other or with unseeded callers such as the preview.
+            queue_size: Capacity of the queues between stages (and the number of in-flight
+                images per process worker). Bounds memory regardless of dataset size.
+            cache_dir: Enables the content-addressed output cache. Outputs are named by
+                (source hash, pipeline config hash, augmentation index, seed) and samples
+                that already exist are skipped, so unchanged re-runs and resumed runs are cheap.
+            collect_garbage: With a cache, delete outputs produced by other pipeline configurations.
+            purge_stale: With a cache, delete the outputs of sources whose image or label changed
+                since they were augmented, and of sources that were removed from the dataset.
+                The cache manifest also makes runs incremental: sources already augmented with
+                the current pipeline are skipped after a stat, without hashing or decoding.
+            max_size: Downscale sources whose longer edge exceeds this many pixels before the
+                pipeline runs (e.g. the training imgsz, which Ultralytics letterboxes the long
+                edge to anyway). Aspect ratio is kept, so YOLO boxes are unchanged, effects cost
+                roughly scale^2 less and outputs are smaller. Part of the cache key.
+            encoding: EncodeSettings (or its to_dict() form) choosing output format, JPEG/WebP
+                quality, PNG compression level and encoder. Defaults to the source format with
+                OpenCV's default parameters. Part of the cache key.
+            write_workers: Encoder/writer threads of the thread backend (default workers // 4).
+                Raise it when encoding dominates, e.g. for PNG or WebP output.
+            shard_dir: Pack samples into tar shards in this directory (see augmentation.shards)
+                instead of writing an image and a label file per sample into the output
+                directories. A finished run replaces the shards of earlier runs; the output
+                cache is not used.
+            shard_size: Samples per shard.
+
+        Bytes written and time spent encoding are printed and kept in self.last_encode_stats.
+
+        Returns:
+            int: Number of augmented samples written by this run
         """
         if not self.pipeline.enabled:
             return 0
+
+        if backend not in AUGMENTATION_BACKENDS:
+            raise ValueError(f"Unknown augmentation backend '{backend}'. Expected one of {AUGMENTATION_BACKENDS}")
+        
+        if shard_dir and cache_dir:
+            print("[Augmentation] The output cache does not apply to shard output, ignoring it")
+            cache_dir = None
         
         # Ensure output directories exist
-        os.makedirs(output_images_dir, exist_ok=True)
-        os.makedirs(output_labels_dir, exist_ok=True)
+        if not shard_dir:
+            os.makedirs(output_images_dir, exist_ok=True)
+            os.makedirs(output_labels_dir, exist_ok=True)
         
         image_files = [f for f in os.listdir(images_dir) 
-                      if f.lower().endswith(('.jpg', '.jpeg', '.png', '.bmp')) and not f.startswith('aug')]
+                      if f.lower().endswith(('.jpg', '.jpeg', '.png', '.bmp', '.webp')) and not f.startswith('aug')]
         
-        total_images = len(image_files)
-        augmented_count = 0
+        if seed is None:
+            seed = self.seed if self.seed is not None else self.pipeline.seed
         
-        if workers > 1:
-            print(f"[Augmentation] Using {workers} workers")
-            # Pre-build compose outside threads (thread safety: each thread gets its own)
-            with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
-                futures = []
-                for idx, img_file in enumerate(image_files):
-                     futures.append(executor.submit(self._augment_single_image, 
-                                                    idx, img_file, images_dir, labels_dir, 
-                                                    output_images_dir, output_labels_dir, 
-                                                    total_images, progress_callback))
-                
-                for future in concurrent.futures.as_completed(futures):
+        if max_size is not None and max_size <= 0:
+            max_size = None
+        config_hash = self.pipeline.config_hash()
+        if max_size:
+            config_hash = hashlib.sha1(f"{config_hash}:max_size={max_size}".encode('utf-8')).hexdigest()
+        if isinstance(encoding, dict):
+            encoding = EncodeSettings.from_dict(encoding)
+        encoding = encoding or EncodeSettings()
+        if not encoding.is_default():
+            config_hash = hashlib.sha1(f"{config_hash}:encoding={encoding.cache_token()}".encode('utf-8')).hexdigest()
+        
+        ctx = _RunContext(images_dir, labels_dir, output_images_dir, output_labels_dir,
+                          seed=seed, purge_stale=purge_stale, max_size=max_size, config_hash=config_hash,
+                          encoding=encoding, shard_dir=shard_dir)
+        stats = EncodeStats()
+        shards = ShardWriter(shard_dir, max_samples=shard_size) if shard_dir else None
+        cache = AugmentationCache(cache_dir) if cache_dir else None
+        progress = _Progress(len(image_files) * self.pipeline.augmentations_per_image, progress_callback)
+        
+        if cache and collect_garbage:
+            removed = cache.collect_garbage(output_images_dir, output_labels_dir, ctx.config_hash)
+            if removed:
+                print(f"[Augmentation Cache] Removed {removed} outdated files")
+        if cache and purge_stale:
+            removed = cache.purge_missing([os.path.join(images_dir, f) for f in image_files])
+            if removed:
+                print(f"[Augmentation Cache] Removed {removed} files of deleted sources")
+        
+        try:
+            if workers > 1 and backend == 'process':
+                augmented_count = self._augment_with_processes(image_files, ctx, cache, progress, stats,
+                                                               workers, queue_size, shards)
+            elif workers > 1:
+                augmented_count = self._augment_streaming(image_files, ctx, cache, progress, stats,
+                                                          workers, queue_size, write_workers, shards)
+            else:
+                # Single thread fallback
+                augmented_count = 0
+                for img_file in image_files:
+                    outputs = self._plan_outputs(img_file, ctx, cache, progress)
+                    if outputs:
+                        augmented_count += self._augment_single_image(img_file, ctx, outputs, progress, stats,
+                                                                      shards)
+        finally:
+            self.last_encode_stats = stats
+            if shards:
+                shards.close()
+            if cache:
+                cache.commit()
+                cache.save()
+        
+        self.last_reused_count = 0
+        if cache:
+            reused = progress.reused
+            self.last_reused_count = reused
+            print(f"[Augmentation Cache] Wrote {augmented_count} samples, reused {reused} cached samples")
+        if stats.images:
+            print(f"[Augmentation] Encoded {stats.summary()}")
+        if shards and shards.shard_paths:
+            print(f"[Augmentation] Packed {shards.samples_written} samples into {len(shards.shard_paths)} shards")
+            # Only now that this run is complete may it replace the previous one
+            removed = shards.prune_previous()
+            if removed:
+                print(f"[Augmentation] Removed {removed} shards of the previous run")
+                    
+        return augmented_count
+
+    def _augment_streaming(self, image_files, ctx, cache, progress, stats, workers, queue_size, write_workers=None,
+                           shards=None):
+        """Run augmentation as a decode -> transform -> write pipeline on threads.
+
+        Stages are connected by bounded queues, so a slow stage blocks the one feeding it
+        instead of letting decoded images pile up. cv2 releases the GIL while decoding and
+        encoding, which lets disk I/O overlap with the transform workers.
+        """
+        io_workers = max(1, workers // 4)
+        write_workers = max(1, write_workers or io_workers)
+        print(f"[Augmentation] Using {workers} transform workers, {io_workers} decode workers, "
+              f"{write_workers} write workers")
+
+        per_image = self.pipeline.augmentations_per_image
+        decode_queue = queue.Queue(maxsize=queue_size)
+        write_queue = queue.Queue(maxsize=queue_size * max(1, per_image))
+        pending_files = iter(image_files)
+        lock = threading.Lock()
+        state = {'written': 0}
+
+        # Build the stages the transform threads run once here rather than racing to build them
+        self.pipeline.get_stages()
+
+        # Samples lost to a decode or transform error travel on as (img_file, None, count)
+        # records, so the writer still counts them and progress always reaches the total
+        def decode_stage():
+            while True:
+                with lock:
+                    img_file = next(pending_files, None)
+                if img_file is None:
+                    return
+                outputs = []
+                try:
+                    outputs = self._plan_outputs(img_file, ctx, cache, progress)
+                    if not outputs:
+                        continue
+                    source = self._load_source(img_file, ctx.images_dir, ctx.labels_dir, ctx.max_size)
+                except Exception as e:
+                    print(f"Augmentation decode error ({img_file}): {e}")
+                    source = None
+                if source is not None:
+                    decode_queue.put((img_file, source, outputs))
+                elif outputs:
+                    write_queue.put((img_file, None, len(outputs)))
+
+        def transform_stage():
+            while True:
+                item = decode_queue.get()
+                if item is _STAGE_DONE:
+                    return
+                img_file, (image, bboxes, class_labels), outputs = item
+                queued = 0
+                try:
+                    batch = self.pipeline.run_batch(image, bboxes, class_labels, len(outputs),
+                                                    seeds=self._sample_seeds(img_file, ctx, outputs))
+                    for names, result in zip(outputs, batch):
+                        write_queue.put((img_file, names, result))
+                        queued += 1
+                except Exception as e:
+                    print(f"Augmentation worker error ({img_file}): {e}")
+                if queued < len(outputs):
+                    write_queue.put((img_file, None, len(outputs) - queued))
+
+        def write_stage():
+            while True:
+                item = write_queue.get()
+                if item is _STAGE_DONE:
+                    return
+                img_file, names, result = item
+                if names is None:
+                    progress.advance(result, f"Skipped {img_file}")
+                    continue
+                (aug_idx, aug_img_name, aug_label_name), (aug_img, aug_bboxes, aug_classes) = names, result
+                try:
+                    self._write_augmentation(aug_img, aug_bboxes, aug_classes,
+                                             os.path.join(ctx.output_images_dir, aug_img_name),
+                                             os.path.join(ctx.output_labels_dir, aug_label_name),
+                                             ctx.encoding, stats, shards)
+                    with lock:
+                        state['written'] += 1
+                except Exception as e:
+                    print(f"Augmentation write error ({img_file}): {e}")
+                progress.advance(1, f"Augmenting {img_file}")
+
+        decoders = [threading.Thread(target=decode_stage, daemon=True) for _ in range(io_workers)]
+        transformers = [threading.Thread(target=transform_stage, daemon=True) for _ in range(workers)]
+        writers = [threading.Thread(target=write_stage, daemon=True) for _ in range(write_workers)]
+        for thread in decoders + transformers + writers:
+            thread.start()
+
+        # Shut the stages down in order so nothing queued is dropped
+        for thread in decoders:
+            thread.join()
+        for _ in transformers:
+            decode_queue.put(_STAGE_DONE)
+        for thread in transformers:
+            thread.join()
+        for _ in writers:
+            write_queue.put(_STAGE_DONE)
+        for thread in writers:
+            thread.join()
+
+        return state['written']
+
+    def _augment_with_processes(self, image_files, ctx, cache, progress, stats, workers, queue_size, shards=None):
+        """Run augmentation on a process pool.
+
+        The pipeline is shipped to each worker once as its to_dict() form and rebuilt there,
+        so effect objects never need to be pickled. Only a bounded number of images are in
+        flight at once, and progress is reported from this process as results stream back.
+        Output planning (and cache lookups) happen here so the cache index has one owner,
+        and with shard output the workers hand encoded samples back to the one shard writer.
+        """
+        print(f"[Augmentation] Using {workers} worker processes")
+        max_in_flight = workers * max(1, queue_size)
+        augmented_count = 0
+
+        # 'spawn' keeps workers independent of the Tk main loop and behaves the same on every OS
+        mp_ctx = multiprocessing.get_context('spawn')
+        with concurrent.futures.ProcessPoolExecutor(max_workers=workers, mp_context=mp_ctx,
+                                                    initializer=_process_worker_init,
+                                                    initargs=(self.pipeline.to_dict(),)) as executor:
+            pending = {}
+            tasks = iter(image_files)
+            exhausted = False
+
+            while pending or not exhausted:
+                while not exhausted and len(pending) < max_in_flight:
+                    img_file = next(tasks, None)
+                    if img_file is None:
+                        exhausted = True
+                        break
+                    outputs = self._plan_outputs(img_file, ctx, cache, progress)
+                    if not outputs:
+                        continue
+                    future = executor.submit(_process_worker_run, img_file, ctx, outputs)
+                    pending[future] = (img_file, len(outputs))
+
+                if not pending:
+                    break
+
+                done, _ = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+                for future in done:
+                    img_file, planned = pending.pop(future)
                     try:
-                        augmented_count += future.result()
+                        written, worker_stats, packed = future.result()
+                        stats.merge(worker_stats)
                     except Exception as e:
                         print(f"Augmentation worker error: {e}")
-        else:
-            # Single thread fallback
-            for idx, img_file in enumerate(image_files):
-                augmented_count += self._augment_single_image(idx, img_file, images_dir, labels_dir,
-                                                              output_images_dir, output_labels_dir,
-                                                              total_images, progress_callback)
-                    
+                    else:
+                        # Packed samples only count once they are in a shard
+                        augmented_count += written - len(packed)
+                        for key, *sample in packed:
+                            try:
+                                shards.add(key, *sample)
+                                augmented_count += 1
+                            except Exception as e:
+                                print(f"Augmentation write error ({key}): {e}")
+                    progress.advance(planned, f"Augmenting {img_file}")
+
         return augmented_count
 
-    def _augment_single_image(self, idx, img_file, images_dir, labels_dir, output_images_dir, output_labels_dir, total_images, progress_callback):
-        augmented_count = 0
+    def _plan_outputs(self, img_file, ctx, cache, progress):
+        """Decide which augmented samples of img_file need to be generated.
+
+        Returns:
+            list: (aug_idx, image_name, label_name) for every sample still to write.
+            Samples found in the cache are counted as progress and left out.
+        """
+        per_image = self.pipeline.augmentations_per_image
+        if cache is None:
+            ext = ctx.encoding.extension(img_file)
+            return [(aug_idx,) + self._output_names(aug_idx, img_file, ctx.seed, ext) for aug_idx in range(per_image)]
+
+        img_path = os.path.join(ctx.images_dir, img_file)
+        label_path = os.path.join(ctx.labels_dir, os.path.splitext(img_file)[0] + '.txt')
+        config_hash = ctx.config_hash
+
+        # Fast path: the manifest says this source is done and neither file was touched since
+        if cache.is_current(img_path, label_path, config_hash, ctx.seed, per_image):
+            progress.advance(per_image, f"Up to date {img_file}", reused=True)
+            return []
+
+        # The label is part of the key, so relabeled sources get fresh samples
+        content_hash = f"{cache.source_hash(img_path)}:{cache.source_hash(label_path)}"
+        outputs = []
+        recorded = []
+        for aug_idx in range(per_image):
+            key = cache.sample_key(content_hash, config_hash, aug_idx, ctx.seed)
+            aug_img_name, aug_label_name = cache.output_names(config_hash, key, img_file,
+                                                              ctx.encoding.extension(img_file))
+            aug_img_path = os.path.join(ctx.output_images_dir, aug_img_name)
+            aug_label_path = os.path.join(ctx.output_labels_dir, aug_label_name)
+            recorded.append([aug_img_path, aug_label_path])
+            if not cache.is_cached(aug_img_path, aug_label_path):
+                outputs.append((aug_idx, aug_img_name, aug_label_name))
+
+        if ctx.purge_stale:
+            removed = cache.purge_changed(img_path, content_hash, keep=[path for pair in recorded for path in pair])
+            if removed:
+                print(f"[Augmentation Cache] Removed {removed} outdated files of {img_file}")
+        cache.stage(img_path, label_path, content_hash, config_hash, ctx.seed, recorded)
+
+        skipped = per_image - len(outputs)
+        if skipped:
+            progress.advance(skipped, f"Cached {img_file}", reused=True)
+        return outputs
+
+    def _load_source(self, img_file, images_dir, labels_dir, max_size=None):
+        """Decode a source image (RGB) and its YOLO labels.
+
+        Args:
+            max_size: Optional limit for the longer image edge; larger images are downscaled
+
+        Returns:
+            tuple: (image, (N, 4) bboxes array, (N,) class id array), or None if the image can't be read
+        """
         img_path = os.path.join(images_dir, img_file)
         label_file = os.path.splitext(img_file)[0] + '.txt'
         label_path = os.path.join(labels_dir, label_file)
         
-        # Load source
-        # cv2.imread is generally thread safe but we need to be careful with global resources if any
-        image = cv2.imread(img_path)
-        if image is None: return 0
+        # cv2.imread is thread safe and releases the GIL while decoding
+        image = cv2.imread(img_path, _reduced_read_flag(img_path, max_size) if max_size else cv2.IMREAD_COLOR)
+        if image is None: return None
+        if max_size:
+            image = downscale_to(image, max_size)
         image = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
         
-        bboxes = []
-        class_labels = []
-        
-        if os.path.exists(label_path):
-            with open(label_path, 'r') as f:
-                for line in f:
-                    parts = line.strip().split()
-                    if len(parts) >= 5:
-                        class_id = int(float(parts[0]))
-                        cx, cy, w, h = map(float, parts[1:5])
-                        bboxes.append([cx, cy, w, h])
-                        class_labels.append(class_id)
-        
-        # Generate augmentations
-        for aug_idx in range(self.pipeline.augmentations_per_image):
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
-            rand_suffix = random.randint(1000, 9999)
-            base_name = os.path.splitext(img_file)[0]
-            ext = os.path.splitext(img_file)[1]
-            
-            aug_img_name = f"aug_{aug_idx}_{timestamp}_{rand_suffix}_{base_name}{ext}"
-            aug_label_name = f"aug_{aug_idx}_{timestamp}_{rand_suffix}_{base_name}.txt"
-            
-            aug_img_path = os.path.join(output_images_dir, aug_img_name)
-            aug_label_path = os.path.join(output_labels_dir, aug_label_name)
-            
-            # Run Pipeline
-            # Note: Pipeline get_compose handles caching. In threaded env, we should verify thread safety of Albumentations.
-            # Albumentations Compose is generally stateless during call, but our caching mechanism might need lock if we update it.
-            # However, we build it once usually.
-            
-            aug_img, aug_bboxes, aug_classes = self.pipeline.run_on_image(image, bboxes, class_labels)
-            
-            # Save results
-            final_img = cv2.cvtColor(aug_img, cv2.COLOR_RGB2BGR)
-            cv2.imwrite(aug_img_path, final_img)
-            
-            with open(aug_label_path, 'w') as f:
-                for bbox, class_id in zip(aug_bboxes, aug_classes):
-                    cx, cy, w, h = bbox
-                    f.write(f"{int(class_id)} {cx:.6f} {cy:.6f} {w:.6f} {h:.6f}\n")
+        # Uniform scaling leaves normalized YOLO boxes untouched
+        bboxes, class_labels = split_labels(read_yolo_labels(label_path))
+        return image, bboxes, class_labels
+
+    def _sample_seeds(self, img_file, ctx, outputs):
+        """Per-augmentation seeds of the planned outputs, or None for an unseeded run."""
+        if ctx.seed is None:
+            return None
+        return [derive_seed(ctx.seed, img_file, aug_idx) for aug_idx, _, _ in outputs]
+
+    def _output_names(self, aug_idx, img_file, seed=None, ext=None):
+        """Return (image_name, label_name) for one augmented copy of img_file.
+        
+        Seeded runs get deterministic names, so re-running overwrites identical files.
+        ext overrides the image extension (default: the source's).
+        """
+        base_name, source_ext = os.path.splitext(img_file)
+        ext = ext or source_ext
+        if seed is not None:
+            prefix = f"aug_{aug_idx}_s{seed}_{base_name}"
+            return prefix + ext, prefix + '.txt'
+        
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
+        rand_suffix = random.randint(1000, 9999)
+        
+        aug_img_name = f"aug_{aug_idx}_{timestamp}_{rand_suffix}_{base_name}{ext}"
+        aug_label_name = f"aug_{aug_idx}_{timestamp}_{rand_suffix}_{base_name}.txt"
+        return aug_img_name, aug_label_name
+
+    def _write_augmentation(self, aug_img, aug_bboxes, aug_classes, aug_img_path, aug_label_path,
+                            encoding=None, stats=None, shards=None):
+        """Write one sample. Both files are written to a temp name and renamed into place,
+        so an interrupted run never leaves a truncated file that looks like a cache hit.
+        With `shards` (a ShardWriter or SampleBuffer) the sample is packed there instead."""
+        encoding = encoding or EncodeSettings()
+        ext = os.path.splitext(aug_img_path)[1]
+        if stats is not None:
+            encoded = stats.encode(encoding, aug_img, ext)
+        else:
+            encoded = encoding.encode(aug_img, ext)
+        
+        if shards is not None:
+            key = os.path.splitext(os.path.basename(aug_img_path))[0]
+            height, width = aug_img.shape[:2]
+            shards.add(key, encoded, ext, format_yolo_labels(aug_classes, aug_bboxes), (width, height))
+            return
+        
+        tmp_img_path = aug_img_path + '.tmp'
+        with open(tmp_img_path, 'wb') as f:
+            f.write(encoded)
+        os.replace(tmp_img_path, aug_img_path)
+        
+        tmp_label_path = aug_label_path + '.tmp'
+        write_yolo_labels(tmp_label_path, aug_classes, aug_bboxes)
+        os.replace(tmp_label_path, aug_label_path)
+
+    def _augment_single_image(self, img_file, ctx, outputs, progress=None, stats=None, shards=None):
+        """Decode img_file once and write the planned augmentations.
+
+        Returns:
+            int: Number of samples written
+        """
+        augmented_count = 0
+        source = self._load_source(img_file, ctx.images_dir, ctx.labels_dir, ctx.max_size)
+        if source is None:
+            if progress:
+                progress.advance(len(outputs), f"Skipped {img_file}")
+            return 0
+        image, bboxes, class_labels = source
+        
+        # Generate augmentations (decoded once, compose and bboxes resolved once)
+        batch = self.pipeline.run_batch(image, bboxes, class_labels, len(outputs),
+                                        seeds=self._sample_seeds(img_file, ctx, outputs))
+        for (aug_idx, aug_img_name, aug_label_name), (aug_img, aug_bboxes, aug_classes) in zip(outputs, batch):
+            aug_img_path = os.path.join(ctx.output_images_dir, aug_img_name)
+            aug_label_path = os.path.join(ctx.output_labels_dir, aug_label_name)
             
-            augmented_count += 1
+            try:
+                self._write_augmentation(aug_img, aug_bboxes, aug_classes, aug_img_path, aug_label_path,
+                                         ctx.encoding, stats, shards)
+                augmented_count += 1
+            except Exception as e:
+                # One failed sample must not take the rest of the image with it
+                print(f"Augmentation write error ({img_file}): {e}")
             
-            if progress_callback:
-                current = idx * self.pipeline.augmentations_per_image + aug_idx + 1
-                total = total_images * self.pipeline.augmentations_per_image
-                progress_callback(current, total, f"Augmenting {img_file}")
+            if progress:
+                progress.advance(1, f"Augmenting {img_file}")
                 
         return augmented_count
 
@@ -342,18 +1126,25 @@ class AugmentationEngine:
         if image is None: return None
         image = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
         
-        bboxes = []
-        class_labels = []
-        
-        if os.path.exists(label_path):
-            with open(label_path, 'r') as f:
-                for line in f:
-                    parts = line.strip().split()
-                    if len(parts) >= 5:
-                        class_id = int(float(parts[0]))
-                        cx, cy, w, h = map(float, parts[1:5])
-                        bboxes.append([cx, cy, w, h])
-                        class_labels.append(class_id)
-                        
+        bboxes, class_labels = split_labels(read_yolo_labels(label_path))
         aug_img, aug_bboxes, aug_classes = self.pipeline.run_on_image(image, bboxes, class_labels)
         return aug_img, aug_bboxes, aug_classes
+
+
+# --- Process Workers ---
+
+_worker_engine = None
+
+def _process_worker_init(pipeline_data):
+    """Rebuild the pipeline once per worker process from its serialized form."""
+    global _worker_engine
+    pipeline = AugmentationPipeline()
+    pipeline.from_dict(pipeline_data)
+    pipeline.get_stages()
+    _worker_engine = AugmentationEngine(pipeline)
+
+def _process_worker_run(img_file, ctx, outputs):
+    stats = EncodeStats()
+    packed = SampleBuffer() if ctx.shard_dir else None
+    written = _worker_engine._augment_single_image(img_file, ctx, outputs, stats=stats, shards=packed)
+    return written, stats, packed.samples if packed else []
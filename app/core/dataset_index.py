@@ -0,0 +1,288 @@
+"""
+Persistent index of a project's images and labels.
+
+Listing a large dataset and stat'ing every label file again each time training starts
+is slow, especially on network filesystems. The index keeps, per image, its label
+file's mtime and size and the set of classes it contains. update() lists both
+directories once, stats the label files in parallel and only re-parses labels that
+changed, so building a train/val split becomes an in-memory query.
+
+It also remembers which split every image group was assigned to (see stable_split),
+so validation images never move into training as the dataset grows.
+"""
+
+import concurrent.futures
+import hashlib
+import json
+import os
+import re
+import threading
+from collections import Counter, defaultdict
+from typing import Dict, List, Optional
+
+
+INDEX_VERSION = 1
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp', '.webp')
+
+# ForgeAugment output names: cached, seeded and timestamped variants, then the source stem
+_AUGMENTED_NAME = re.compile(r'^aug_(?:[0-9a-f]{8}_[0-9a-f]{12}|\d+_s-?\d+|\d+_\d{8}_\d{6}_\d+_\d{4})_(.+)$')
+# Frames extracted from a video: <video>_frame_000123
+_VIDEO_FRAME = re.compile(r'^(.+)_frame_\d+$')
+
+
+def group_key(name: str) -> str:
+    """
+    Group that an image must share a split with.
+
+    Frames extracted from one video (`<video>_frame_000123.jpg`) form one group, and
+    augmented copies (`aug_..._<stem>`) join the group of their source image.
+    """
+    stem = os.path.splitext(name)[0]
+    match = _AUGMENTED_NAME.match(stem)
+    if match:
+        stem = match.group(1)
+    match = _VIDEO_FRAME.match(stem)
+    return match.group(1) if match else stem
+
+
+def stable_fraction(key: str) -> float:
+    """Deterministic pseudo-random number in [0, 1) for a group key."""
+    digest = hashlib.blake2b(key.encode('utf-8'), digest_size=8).digest()
+    return int.from_bytes(digest, 'little') / 2.0 ** 64
+
+
+class DatasetEntry:
+    """One indexed image."""
+
+    __slots__ = ('name', 'image_path', 'label_path', 'label_size', 'label_mtime', 'classes')
+
+    def __init__(self, name, image_path, label_path, label_size, label_mtime, classes):
+        self.name = name
+        self.image_path = image_path
+        self.label_path = label_path
+        # None when the image has no label file (unlabeled, never used for training)
+        self.label_size = label_size
+        self.label_mtime = label_mtime
+        self.classes = classes
+
+    @property
+    def is_labeled(self) -> bool:
+        return bool(self.label_size)
+
+    @property
+    def is_background(self) -> bool:
+        """Verified background: an empty label file."""
+        return self.label_size == 0
+
+    @property
+    def is_augmented(self) -> bool:
+        return self.name.startswith('aug_')
+
+
+def _read_classes(label_path: str) -> List[int]:
+    classes = set()
+    try:
+        with open(label_path, 'r') as f:
+            for line in f:
+                parts = line.split(maxsplit=1)
+                if parts:
+                    try:
+                        classes.add(int(float(parts[0])))
+                    except ValueError:
+                        continue
+    except OSError:
+        return []
+    return sorted(classes)
+
+
+class DatasetIndex:
+    """
+    Incrementally updated index of images/labels, persisted as JSON.
+
+    Usage:
+        index = DatasetIndex(images_dir, labels_dir, index_path)
+        index.update()
+        labeled = [e for e in index.entries() if e.is_labeled]
+    """
+
+    def __init__(self, images_dir: str, labels_dir: str, index_path: str, io_workers: int = 16):
+        """
+        Args:
+            images_dir: Directory of the images
+            labels_dir: Directory of the YOLO label files
+            index_path: JSON file the index is persisted to
+            io_workers: Threads used to stat label files (hides network filesystem latency)
+        """
+        self.images_dir = images_dir
+        self.labels_dir = labels_dir
+        self.index_path = index_path
+        self.io_workers = max(1, io_workers)
+        self._lock = threading.Lock()
+        # image name -> [label mtime_ns or None, label size or None, classes]
+        self._entries = {}
+        # {'fraction': val fraction, 'groups': {group key: 'train' | 'val'}}
+        self._splits = {'fraction': None, 'groups': {}}
+        self._load()
+
+    def _load(self):
+        if os.path.exists(self.index_path):
+            try:
+                with open(self.index_path, 'r') as f:
+                    data = json.load(f)
+                if data.get('version') == INDEX_VERSION and data.get('images_dir') == self.images_dir:
+                    self._entries = data.get('entries', {})
+                    self._splits = data.get('splits') or self._splits
+            except (OSError, ValueError, AttributeError):
+                print(f"[Dataset Index] Ignoring unreadable index at {self.index_path}")
+
+    def save(self):
+        """Persist the index atomically."""
+        with self._lock:
+            data = {'version': INDEX_VERSION, 'images_dir': self.images_dir, 'entries': self._entries,
+                    'splits': self._splits}
+        try:
+            os.makedirs(os.path.dirname(self.index_path), exist_ok=True)
+            tmp_path = self.index_path + '.tmp'
+            with open(tmp_path, 'w') as f:
+                json.dump(data, f, separators=(',', ':'))
+            os.replace(tmp_path, self.index_path)
+        except OSError as e:
+            print(f"[Dataset Index] Could not save index: {e}")
+
+    def update(self) -> int:
+        """
+        Bring the index up to date with the image and label directories.
+
+        Each directory is listed once. Label files are stat'ed in parallel and only
+        re-read when their mtime or size changed. Saves the index if anything changed.
+
+        Returns:
+            int: Number of entries added, changed or removed
+        """
+        images = [name for name in os.listdir(self.images_dir) if name.lower().endswith(IMAGE_EXTENSIONS)]
+        try:
+            label_names = set(os.listdir(self.labels_dir))
+        except FileNotFoundError:
+            label_names = set()
+
+        def refresh(name):
+            label_name = os.path.splitext(name)[0] + '.txt'
+            old = self._entries.get(name)
+            if label_name not in label_names:
+                return name, [None, None, []], old != [None, None, []]
+            try:
+                stat = os.stat(os.path.join(self.labels_dir, label_name))
+            except OSError:
+                return name, [None, None, []], old != [None, None, []]
+            if old and old[0] == stat.st_mtime_ns and old[1] == stat.st_size:
+                return name, old, False
+            classes = _read_classes(os.path.join(self.labels_dir, label_name)) if stat.st_size else []
+            return name, [stat.st_mtime_ns, stat.st_size, classes], True
+
+        changed = 0
+        entries = {}
+        with concurrent.futures.ThreadPoolExecutor(max_workers=self.io_workers) as executor:
+            for name, entry, was_changed in executor.map(refresh, images, chunksize=256):
+                entries[name] = entry
+                changed += was_changed
+        changed += len(set(self._entries) - set(entries))
+
+        with self._lock:
+            self._entries = entries
+        if changed:
+            self.save()
+        return changed
+
+    def entries(self, exclude_augmented: bool = False) -> List[DatasetEntry]:
+        """Indexed images in name order."""
+        with self._lock:
+            items = sorted(self._entries.items())
+        result = []
+        for name, (mtime, size, classes) in items:
+            if exclude_augmented and name.startswith('aug_'):
+                continue
+            image_path = os.path.join(self.images_dir, name).replace('\\', '/')
+            label_path = os.path.join(self.labels_dir, os.path.splitext(name)[0] + '.txt')
+            result.append(DatasetEntry(name, image_path, label_path, size, mtime, classes))
+        return result
+
+    def class_counts(self, entries: Optional[List[DatasetEntry]] = None) -> Counter:
+        """Number of images containing each class."""
+        counts = Counter()
+        for entry in entries if entries is not None else self.entries():
+            counts.update(entry.classes)
+        return counts
+
+    def stable_split(self, entries: List[DatasetEntry], val_fraction: float, stratify: bool = True):
+        """
+        Deterministic, group-aware train/val split that stays stable as the dataset grows.
+
+        Images are split by group (see group_key), so all frames of a video and all
+        augmented copies of an image land on the same side. A group's side is decided
+        once, from a hash of its key, and remembered in the index: later runs only
+        assign new groups, so nothing ever moves between train and val unless the
+        validation fraction changes (which reassigns everything, deterministically).
+
+        With stratify, groups are bucketed by the rarest class they contain and new
+        groups are assigned per bucket: in hash order, each bucket sends new groups to
+        validation until it holds round(groups * val_fraction) of them, and at least
+        one when it has several groups, so rare classes get evaluated. Earlier
+        assignments never move, so the fraction is met on a best-effort basis: a
+        bucket that is already over its share stays over it, and many small buckets
+        (one validation group each) can push the overall fraction above the target.
+
+        Args:
+            entries: DatasetEntry objects to split (e.g. labeled images)
+            val_fraction: Target fraction (0-1) of groups in validation
+            stratify: Balance validation groups per class bucket instead of per hash
+
+        Returns:
+            tuple: (train entries, val entries)
+        """
+        groups = defaultdict(list)
+        for entry in entries:
+            groups[group_key(entry.name)].append(entry)
+
+        with self._lock:
+            if self._splits.get('fraction') != val_fraction:
+                if self._splits.get('groups'):
+                    print(f"[Dataset Index] Validation fraction changed to {val_fraction:.0%}, reassigning splits")
+                self._splits = {'fraction': val_fraction, 'groups': {}}
+            assigned = self._splits['groups']
+            new_groups = [key for key in groups if key not in assigned]
+
+            if stratify and val_fraction > 0:
+                for keys in _strata(groups).values():
+                    fresh = sorted((key for key in keys if key not in assigned), key=stable_fraction)
+                    if not fresh:
+                        continue
+                    target = int(round(len(keys) * val_fraction))
+                    if len(keys) > 1:
+                        # Cover every bucket, but keep at least one group for training
+                        target = min(max(target, 1), len(keys) - 1)
+                    missing = target - sum(assigned.get(key) == 'val' for key in keys)
+                    for i, key in enumerate(fresh):
+                        assigned[key] = 'val' if i < missing else 'train'
+            else:
+                for key in new_groups:
+                    assigned[key] = 'val' if stable_fraction(key) < val_fraction else 'train'
+            changed = bool(new_groups)
+
+        if changed:
+            self.save()
+
+        train, val = [], []
+        for key, members in groups.items():
+            (val if assigned[key] == 'val' else train).extend(members)
+        return train, val
+
+
+def _strata(groups) -> Dict[object, List[str]]:
+    """Bucket group keys by the rarest class (fewest groups) they contain; None for no classes."""
+    group_classes = {key: {c for entry in members for c in entry.classes} for key, members in groups.items()}
+    counts = Counter(c for classes in group_classes.values() for c in classes)
+    strata = defaultdict(list)
+    for key, classes in group_classes.items():
+        stratum = min(classes, key=lambda c: (counts[c], c)) if classes else None
+        strata[stratum].append(key)
+    return strata
@@ -0,0 +1,271 @@
+"""
+Runs Ultralytics training in a child process.
+
+Training in a thread of the Tk process means the data loader, the GIL-bound UI and
+stdout redirection all compete, and a CUDA out-of-memory error can take the whole
+application down. TrainingJob starts a spawned process that owns CUDA and the model;
+the parent only receives events:
+
+    - TrainingTelemetry dicts ('batch' / 'epoch', see training_telemetry)
+    - {'type': 'log', 'text': ...} with the process' stdout/stderr
+
+on one multiprocessing queue, plus the final status over a pipe. stop() asks the
+trainer to finish after the current epoch (weights are saved and validated as
+usual); cancel() asks it to abort at the next batch and only terminates the process
+if it doesn't exit in time. Either way every byte of GPU memory the run used is
+released when the process exits.
+"""
+
+import multiprocessing
+import queue
+import sys
+import threading
+import time
+import traceback
+from typing import Optional, Tuple
+
+
+class _EventWriter:
+    """stdout/stderr replacement in the training process that forwards text as 'log' events.
+
+    Never blocks the caller: when the event queue is full the text is dropped, and the
+    number of dropped lines is reported with the next message that gets through.
+    """
+
+    def __init__(self, events, interval: float = 0.1, max_chars: int = 65536):
+        self.events = events
+        self.interval = interval
+        self.max_chars = max_chars
+        self.dropped_lines = 0
+        self._buffer = []
+        self._size = 0
+        self._last_send = 0.0
+        self._lock = threading.Lock()
+
+    def write(self, string):
+        if not string:
+            return
+        with self._lock:
+            self._buffer.append(string)
+            self._size += len(string)
+            # Batch tqdm's many small writes into a few messages
+            if self._size < self.max_chars and time.time() - self._last_send < self.interval:
+                return
+            text = self._take()
+        self._send(text)
+
+    def flush(self):
+        with self._lock:
+            text = self._take()
+        self._send(text)
+
+    def close(self, timeout: float = 5.0):
+        """Send what is left, waiting up to timeout for room in the queue (the last lines matter most)."""
+        with self._lock:
+            text = self._take()
+        self._send(text, timeout)
+
+    def isatty(self):
+        return False
+
+    def _take(self):
+        """Empty the buffer (lock held)."""
+        if not self._buffer:
+            return None
+        text = ''.join(self._buffer)
+        self._buffer = []
+        self._size = 0
+        self._last_send = time.time()
+        return text
+
+    def _send(self, text, timeout: Optional[float] = None):
+        # Outside the lock: a full queue must not stall the other printing threads
+        if text is None:
+            return
+        with self._lock:
+            dropped, self.dropped_lines = self.dropped_lines, 0
+        message = text
+        if dropped:
+            message = f"[Training] {dropped} log lines dropped, the console could not keep up\n" + text
+        try:
+            if timeout is None:
+                self.events.put_nowait({'type': 'log', 'text': message})
+            else:
+                self.events.put({'type': 'log', 'text': message}, timeout=timeout)
+        except queue.Full:
+            with self._lock:
+                self.dropped_lines += dropped + (text.count('\n') or 1)
+
+
+class _Cancelled(Exception):
+    """Raised from a training callback when the parent cancels the run."""
+
+
+def _train_process(params: dict, events, stop_event, cancel_event, result_conn):
+    """Entry point of the training process."""
+    # Redirect before importing Ultralytics, whose logger binds to sys.stdout on import
+    writer = _EventWriter(events)
+    sys.stdout = writer
+    sys.stderr = writer
+    status, message = 'error', 'Training did not start.'
+    try:
+        from functools import partial
+
+        from ultralytics import YOLO
+
+        from app.core.training_telemetry import TrainingTelemetry
+
+        def on_train_epoch_end(trainer):
+            if stop_event.is_set():
+                print("Training stopped by user.")
+                # Ultralytics validates and saves this epoch, then ends the run
+                trainer.stop = True
+
+        def check_cancelled(*args):
+            if cancel_event.is_set():
+                raise _Cancelled()
+
+        check_cancelled()
+        model = YOLO(params['model_name'])
+        model.add_callback("on_train_epoch_end", on_train_epoch_end)
+        # Cancellation is checked between batches, including validation batches
+        for event in ("on_pretrain_routine_end", "on_train_batch_end", "on_val_batch_end"):
+            model.add_callback(event, check_cancelled)
+        TrainingTelemetry(events=events).attach(model)
+
+        train_args = dict(params['train_args'])
+        if params.get('online_pipeline') or params.get('shard_dir'):
+            from app.core.augmentation.online import OnlineAugmentTrainer
+            train_args['trainer'] = partial(OnlineAugmentTrainer, pipeline_data=params.get('online_pipeline'),
+                                            shard_dir=params.get('shard_dir'))
+
+        model.train(**train_args)
+        save_dir = getattr(model.trainer, 'save_dir', None) or params['run_dir']
+        if stop_event.is_set():
+            status, message = 'stopped', f"Training stopped by user. Results saved to {save_dir}"
+        else:
+            status, message = 'completed', f"Training completed. Results saved to {save_dir}"
+    except _Cancelled:
+        status, message = 'cancelled', "Training cancelled."
+    except Exception as e:
+        traceback.print_exc()
+        status, message = 'error', f"Error during training: {str(e)}"
+    finally:
+        writer.close()
+        try:
+            result_conn.send((status, message))
+        except (OSError, EOFError):
+            pass
+        result_conn.close()
+
+
+class TrainingJob:
+    """
+    One training run in a child process.
+
+    Usage:
+        job = TrainingJob(params)
+        job.start()
+        events = job.drain()          # poll from the UI
+        status, message = job.wait()  # 'completed' | 'stopped' | 'cancelled' | 'error'
+    """
+
+    def __init__(self, params: dict, max_events: int = 1000):
+        """
+        Args:
+            params: Picklable run description: model_name, run_dir, train_args (keyword
+                arguments for YOLO.train), and optionally online_pipeline and shard_dir
+            max_events: Size of the event queue
+        """
+        self.params = params
+        # Spawn, not fork: the child must not inherit the Tk process' CUDA or GUI state
+        self._ctx = multiprocessing.get_context('spawn')
+        self.events = self._ctx.Queue(maxsize=max_events)
+        self._stop_event = self._ctx.Event()
+        self._cancel_event = self._ctx.Event()
+        self._result_recv, self._result_send = self._ctx.Pipe(duplex=False)
+        self._process = None
+        self._cancelled = False
+        # Set once the process was terminated: the queue may hold a half-written message
+        self._killed = False
+        self._result = None
+
+    def start(self):
+        # Not a daemon: the data loader starts worker processes of its own
+        self._process = self._ctx.Process(target=_train_process, name="TrainingJob",
+                                          args=(self.params, self.events, self._stop_event, self._cancel_event,
+                                                self._result_send))
+        self._process.start()
+        # The child holds its own copy; closing ours lets recv() notice a dead child
+        self._result_send.close()
+
+    def is_alive(self) -> bool:
+        return self._process is not None and self._process.is_alive()
+
+    @property
+    def stop_requested(self) -> bool:
+        return self._stop_event.is_set()
+
+    def stop(self):
+        """Graceful stop: finish the current epoch, save and validate, then exit."""
+        self._stop_event.set()
+
+    def cancel(self, timeout: float = 10.0):
+        """Hard cancel: abort at the next batch without finishing the epoch.
+
+        The process is asked to exit first; it is terminated (then killed) only if it is
+        still running after timeout, e.g. stuck in data loading. Terminating a process
+        can leave a half-written message in the event queue, so drain() returns nothing
+        after that. Doesn't block; wait() reports the run as 'cancelled'.
+        """
+        if not self.is_alive() or self._cancelled:
+            return
+        self._cancelled = True
+        self._cancel_event.set()
+        thread = threading.Thread(target=self._force_exit, args=(timeout,), name="TrainingJobCancel", daemon=True)
+        thread.start()
+
+    def _force_exit(self, timeout: float):
+        self._process.join(timeout)
+        if self._process.exitcode is not None:
+            return
+        self._killed = True
+        self._process.terminate()
+        self._process.join(timeout)
+        if self._process.exitcode is None:
+            self._process.kill()
+
+    def drain(self, limit: Optional[int] = None) -> list:
+        """Queued events (oldest first), without blocking."""
+        drained = []
+        if self._killed:
+            return drained
+        while limit is None or len(drained) < limit:
+            try:
+                drained.append(self.events.get_nowait())
+            except queue.Empty:
+                break
+        return drained
+
+    def wait(self) -> Tuple[str, str]:
+        """
+        Block until the process has exited.
+
+        Returns:
+            tuple: (status, message) with status 'completed', 'stopped', 'cancelled' or 'error'
+        """
+        if self._result is not None:
+            return self._result
+        result = None
+        try:
+            # Arrives just before the process exits; EOF if it died without reporting
+            result = self._result_recv.recv()
+        except (EOFError, OSError):
+            pass
+        self._process.join()
+        if self._cancelled:
+            result = ('cancelled', "Training cancelled.")
+        elif result is None:
+            result = ('error', f"Training process exited unexpectedly (exit code {self._process.exitcode}).")
+        self._result = result
+        return result
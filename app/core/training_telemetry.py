@@ -0,0 +1,180 @@
+"""
+Structured training progress from Ultralytics callbacks.
+
+Instead of scraping the tqdm text Ultralytics writes to stdout, TrainingTelemetry
+hooks the trainer's callbacks and puts plain dict events on a thread-safe queue:
+
+    {'type': 'batch', 'epoch', 'epochs', 'batch', 'batches', 'losses', 'lr',
+     'it_s', 'eta', 'gpu_mem'}
+    {'type': 'epoch', 'epoch', 'epochs', 'losses', 'metrics', 'lr', 'epoch_time',
+     'eta', 'gpu_mem'}
+
+epoch and batch are 1-based, eta is in seconds (None until it can be estimated) and
+gpu_mem in GB. Batch events are throttled, so the queue stays small even at high
+iteration rates; the UI drains it on its own timer. The queue can also be a
+multiprocessing queue, to publish events from a training process (see training_runner).
+"""
+
+import queue
+import time
+from typing import List, Optional
+
+
+class TrainingTelemetry:
+    """
+    Collects progress events from an Ultralytics training run.
+
+    Usage:
+        telemetry = TrainingTelemetry()
+        telemetry.attach(model)   # before model.train()
+        ...
+        for event in telemetry.drain():   # e.g. from a Tk after() loop
+            ...
+    """
+
+    def __init__(self, batch_interval: float = 0.1, max_events: int = 1000, events=None):
+        """
+        Args:
+            batch_interval: Minimum seconds between two batch events (the last batch of
+                an epoch is always reported)
+            max_events: Queue size; batch events are dropped while it is full
+            events: Queue to use instead of a new queue.Queue (e.g. a multiprocessing.Queue)
+        """
+        self.batch_interval = batch_interval
+        self.events = events if events is not None else queue.Queue(maxsize=max_events)
+        self._reset_run()
+
+    def _reset_run(self):
+        self._batch = 0
+        self._epochs_done = 0
+        self._last_push = 0.0
+        self._batch_start = None
+        self._batch_rate = None
+        self._train_start = None
+
+    def attach(self, model):
+        """Register the callbacks on a YOLO model; call before model.train()."""
+        model.add_callback("on_train_start", self._on_train_start)
+        model.add_callback("on_train_epoch_start", self._on_train_epoch_start)
+        model.add_callback("on_train_batch_end", self._on_train_batch_end)
+        model.add_callback("on_fit_epoch_end", self._on_fit_epoch_end)
+
+    def drain(self, limit: Optional[int] = None) -> List[dict]:
+        """Return the queued events (oldest first) without blocking."""
+        drained = []
+        while limit is None or len(drained) < limit:
+            try:
+                drained.append(self.events.get_nowait())
+            except queue.Empty:
+                break
+        return drained
+
+    def clear(self):
+        self.drain()
+        self._reset_run()
+
+    # Callbacks (run on the training thread)
+
+    def _on_train_start(self, trainer):
+        self._reset_run()
+        self._train_start = time.time()
+
+    def _on_train_epoch_start(self, trainer):
+        self._batch = 0
+        self._batch_start = time.time()
+
+    def _on_train_batch_end(self, trainer):
+        self._batch += 1
+        now = time.time()
+        if self._batch_start is not None:
+            # Smoothed rate over the epoch so far, like tqdm's it/s
+            elapsed = now - self._batch_start
+            if elapsed > 0:
+                self._batch_rate = self._batch / elapsed
+
+        batches = _num_batches(trainer)
+        if now - self._last_push < self.batch_interval and self._batch != batches:
+            return
+        self._last_push = now
+
+        eta = None
+        if self._batch_rate and batches:
+            eta = (batches - self._batch) / self._batch_rate + self._remaining_epochs(trainer) * self._epoch_seconds(batches)
+        self._put({
+            'type': 'batch',
+            'epoch': trainer.epoch + 1,
+            'epochs': trainer.epochs,
+            'batch': self._batch,
+            'batches': batches,
+            'losses': _losses(trainer),
+            'lr': _lr(trainer),
+            'it_s': self._batch_rate,
+            'eta': eta,
+            'gpu_mem': _gpu_memory(trainer),
+        }, block=False)
+
+    def _on_fit_epoch_end(self, trainer):
+        self._epochs_done += 1
+        eta = None
+        if self._train_start is not None:
+            mean_epoch = (time.time() - self._train_start) / self._epochs_done
+            eta = self._remaining_epochs(trainer) * mean_epoch
+        metrics = {key: float(value) for key, value in (trainer.metrics or {}).items()
+                   if isinstance(value, (int, float))}
+        self._put({
+            'type': 'epoch',
+            'epoch': trainer.epoch + 1,
+            'epochs': trainer.epochs,
+            'losses': _losses(trainer),
+            'metrics': metrics,
+            'lr': _lr(trainer),
+            'epoch_time': getattr(trainer, 'epoch_time', None),
+            'eta': eta,
+            'gpu_mem': _gpu_memory(trainer),
+        }, block=True)
+
+    def _remaining_epochs(self, trainer) -> int:
+        return max(0, trainer.epochs - (trainer.epoch + 1))
+
+    def _epoch_seconds(self, batches: int) -> float:
+        """Estimated length of a full epoch from the current batch rate (validation not included)."""
+        return batches / self._batch_rate if self._batch_rate else 0.0
+
+    def _put(self, event: dict, block: bool):
+        try:
+            # Epoch summaries are worth a short wait; batch events are superseded anyway
+            self.events.put(event, block=block, timeout=1.0 if block else None)
+        except queue.Full:
+            pass
+
+
+def _num_batches(trainer) -> Optional[int]:
+    try:
+        return len(trainer.train_loader)
+    except (AttributeError, TypeError):
+        return None
+
+
+def _losses(trainer) -> dict:
+    """Running mean training losses by name, e.g. {'box_loss': 1.2, ...}."""
+    if trainer.tloss is None:
+        return {}
+    try:
+        items = trainer.label_loss_items(trainer.tloss, prefix='train')
+    except Exception:
+        return {}
+    return {key.split('/', 1)[-1]: float(value) for key, value in items.items()}
+
+
+def _lr(trainer) -> Optional[float]:
+    optimizer = getattr(trainer, 'optimizer', None)
+    if optimizer is None or not optimizer.param_groups:
+        return None
+    return float(optimizer.param_groups[0]['lr'])
+
+
+def _gpu_memory(trainer) -> Optional[float]:
+    try:
+        return float(trainer._get_memory())
+    except Exception:
+        return None
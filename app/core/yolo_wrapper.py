@@ -5,8 +5,8 @@ import threading
 from ultralytics import YOLO
 import shutil
 from datetime import datetime
-import gc
-import torch
+from app.core.dataset_index import DatasetIndex, stable_fraction
+from app.core.training_runner import TrainingJob
 
 class YOLOWrapper:
     def __init__(self, project_path):
@@ -16,50 +16,70 @@ class YOLOWrapper:
         if not os.path.exists(self.models_dir):
             os.makedirs(self.models_dir)
         
-        self.stop_training_flag = False
+        self.training_job = None
+        self.run_dir = None
             
         self.data_dir = os.path.join(project_path, "data")
         self.images_dir = os.path.join(self.data_dir, "images")
         self.labels_dir = os.path.join(self.data_dir, "labels")
+        self.dataset_index = DatasetIndex(self.images_dir, self.labels_dir,
+                                          os.path.join(project_path, ".cache", "dataset_index.json"))
 
-    def prepare_dataset(self, validation_split=0.2, bg_ratio=0.1):
-        """Generates train.txt and val.txt with random split and BG sampling."""
-        all_imgs = [f for f in os.listdir(self.images_dir) 
-                    if f.lower().endswith(('.jpg', '.jpeg', '.png', '.bmp'))]
+    def prepare_dataset(self, validation_split=0.2, bg_ratio=0.1, exclude_augmented=False, stratify=False,
+                        stable_split=True):
+        """Generates train.txt and val.txt with a train/val split and BG sampling.
         
-        labeled_imgs = []
-        verified_bg_imgs = []
+        The image list comes from the project's DatasetIndex, which only re-reads
+        labels that changed since the last run.
         
-        for img_file in all_imgs:
-            img_path = os.path.join(self.images_dir, img_file).replace('\\', '/')
-            label_file = os.path.splitext(img_file)[0] + ".txt"
-            label_path = os.path.join(self.labels_dir, label_file)
-            
-
-            if os.path.exists(label_path):
-                if os.path.getsize(label_path) > 0:
-                    labeled_imgs.append(img_path)
-                else:
-                    verified_bg_imgs.append(img_path)
-            # Unlabeled images (no label file) are EXCLUDED from training
+        With stable_split (default), images are split by group (frames of one video,
+        augmented copies of one image) and every group keeps the side it was first
+        assigned to, so validation images never leak into training as the dataset grows
+        (see DatasetIndex.stable_split). Otherwise the split is redrawn at random.
+        With stratify, every class gets its share of validation images (stable split only).
+        
+        With exclude_augmented, ForgeAugment's materialized aug_ copies are left out
+        (used with online augmentation, which augments the originals on the fly).
+        """
+        self.dataset_index.update()
+        entries = self.dataset_index.entries(exclude_augmented=exclude_augmented)
+        
+        # Unlabeled images (no label file) are EXCLUDED from training
+        labeled = [e for e in entries if e.is_labeled]
+        background = [e for e in entries if e.is_background]
         
-        # Shuffle labeled
-        random.shuffle(labeled_imgs)
         if validation_split > 1.0:
             validation_split = validation_split / 100.0
-        split_idx = int(len(labeled_imgs) * (1 - validation_split))
+        if stable_split:
+            train_entries, val_entries = self.dataset_index.stable_split(labeled, validation_split, stratify)
+            train_labeled = [e.image_path for e in train_entries]
+            val_labeled = [e.image_path for e in val_entries]
+            # Backgrounds follow the same stable groups; quotas are filled in hash order
+            train_bg_pool, val_bg_pool = self.dataset_index.stable_split(background, validation_split, stratify=False)
+            train_bg_pool = [e.image_path for e in sorted(train_bg_pool, key=lambda e: stable_fraction(e.name))]
+            val_bg_pool = [e.image_path for e in sorted(val_bg_pool, key=lambda e: stable_fraction(e.name))]
+        else:
+            # Shuffle labeled
+            labeled_imgs = [e.image_path for e in labeled]
+            random.shuffle(labeled_imgs)
+            split_idx = int(len(labeled_imgs) * (1 - validation_split))
 
-        train_labeled = labeled_imgs[:split_idx]
-        val_labeled = labeled_imgs[split_idx:]
+            train_labeled = labeled_imgs[:split_idx]
+            val_labeled = labeled_imgs[split_idx:]
         
         # Calculate BG quotas
         train_bg_count = int(len(train_labeled) * bg_ratio)
         val_bg_count = int(len(val_labeled) * bg_ratio)
         
-        random.shuffle(verified_bg_imgs)
-        
-        train_bg = verified_bg_imgs[:train_bg_count]
-        val_bg = verified_bg_imgs[train_bg_count : train_bg_count + val_bg_count]
+        if stable_split:
+            train_bg = train_bg_pool[:train_bg_count]
+            val_bg = val_bg_pool[:val_bg_count]
+        else:
+            verified_bg_imgs = [e.image_path for e in background]
+            random.shuffle(verified_bg_imgs)
+            
+            train_bg = verified_bg_imgs[:train_bg_count]
+            val_bg = verified_bg_imgs[train_bg_count : train_bg_count + val_bg_count]
         
         train_imgs = train_labeled + train_bg
         val_imgs = val_labeled + val_bg
@@ -96,91 +116,69 @@ class YOLOWrapper:
         return yaml_path
 
     def stop_training(self):
-        self.stop_training_flag = True
-    
-    def cleanup_memory(self):
-        """Aggressive memory cleanup to free VRAM and RAM after training."""
-        print("[Memory Cleanup] Clearing VRAM and RAM...")
-        
-        # Force garbage collection
-        gc.collect()
-        
-        # Clear CUDA cache if available
-        if torch.cuda.is_available():
-            torch.cuda.empty_cache()
-            torch.cuda.ipc_collect()
-            print(f"[Memory Cleanup] Freed CUDA cache")
-        
-        # Additional garbage collection
-        gc.collect()
-        
-        print("[Memory Cleanup] Memory cleanup complete")
-
-    def train_model(self, model_name, data_yaml, epochs, batch_size, imgsz, callback=None, half=False, workers=4, resume=False, **kwargs):
-        """Runs training in a separate thread."""
-        self.stop_training_flag = False
-        
-        def on_train_epoch_end(trainer):
-            if self.stop_training_flag:
-                print("Training stopped by user.")
-                trainer.stop = True
-                raise InterruptedError("Training stopped by user.")
-
-        def run():
-            try:
-                model_path = os.path.join(self.models_dir, model_name)
-                if not os.path.exists(model_path) and not model_name.endswith('.pt'):
-                     pass
-                
-                model = YOLO(model_name) 
-                model.add_callback("on_train_epoch_end", on_train_epoch_end)
-                
-                project_runs = os.path.join(self.project_path, "runs")
-                name = f"train_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
-                
-                results = model.train(
-                    data=data_yaml,
-                    epochs=epochs,
-                    batch=batch_size,
-                    imgsz=imgsz,
-                    project=project_runs,
-                    name=name,
-                    exist_ok=True,
-                    workers=workers,
-                    half=half,
-                    resume=resume,
-                    **kwargs
-                )
-                
-                # Clean up model reference and memory
-                del model
-                self.cleanup_memory()
-                
-                if callback:
-                    callback(f"Training completed. Results saved to {project_runs}/{name}")
-            except InterruptedError:
-                # Clean up on manual stop
-                try:
-                    del model
-                except:
-                    pass
-                self.cleanup_memory()
-                
-                if callback:
-                    callback("Training stopped by user.")
-            except Exception as e:
-                # Clean up on error
-                try:
-                    del model
-                except:
-                    pass
-                self.cleanup_memory()
-                
-                if callback:
-                    callback(f"Error during training: {str(e)}")
-
-        thread = threading.Thread(target=run)
-        thread.start()
+        """Finish the current epoch (saving and validating it), then end the run."""
+        if self.training_job:
+            self.training_job.stop()
+
+    def cancel_training(self):
+        """Terminate the training process immediately; the current epoch is lost."""
+        if self.training_job:
+            self.training_job.cancel()
+
+    def is_training(self):
+        return self.training_job is not None and self.training_job.is_alive()
+
+    def train_model(self, model_name, data_yaml, epochs, batch_size, imgsz, callback=None, half=False, workers=4, resume=False,
+                    online_pipeline=None, shard_dir=None, **kwargs):
+        """Runs training in a separate process (see TrainingJob) and returns immediately.
+        
+        online_pipeline: Optional AugmentationPipeline.to_dict() data. When given, the pipeline
+        is applied to training samples while they are loaded instead of from files on disk.
+        shard_dir: Optional directory of augmentation shards whose samples are added to the
+        training set, read directly from the shards.
+        
+        Progress events and console output are read with training_events(); callback gets
+        the final message once the process has exited (on a background thread).
+        """
+        project_runs = os.path.join(self.project_path, "runs")
+        name = f"train_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+        # Where this run's weights, plots and console log go
+        self.run_dir = os.path.join(project_runs, name)
+        
+        params = {
+            'model_name': model_name,
+            'run_dir': self.run_dir,
+            'online_pipeline': online_pipeline,
+            'shard_dir': shard_dir,
+            'train_args': dict(
+                data=data_yaml,
+                epochs=epochs,
+                batch=batch_size,
+                imgsz=imgsz,
+                project=project_runs,
+                name=name,
+                exist_ok=True,
+                workers=workers,
+                half=half,
+                resume=resume,
+                **kwargs
+            ),
+        }
+        job = TrainingJob(params)
+        self.training_job = job
+        job.start()
+
+        def watch():
+            # The process exiting frees all of its RAM and VRAM, no cleanup needed here
+            status, message = job.wait()
+            if callback:
+                callback(message)
+
+        threading.Thread(target=watch, daemon=True).start()
+
+    def training_events(self):
+        """Events of the current training run (telemetry and 'log' output) since the last call."""
+        return self.training_job.drain() if self.training_job else []
 
     def run_inference(self, model_path, source, conf=0.25, device=None):
         """Runs inference on a source."""
@@ -6,11 +6,15 @@ import tkinter as tk
 from tkinter import ttk, messagebox, filedialog
 from PIL import Image, ImageTk
 import os
+import math
 import shutil
 import threading
 from app.core.augmentation_engine import (
-    AugmentationEngine, AugmentationPipeline, EFFECT_REGISTRY, create_effect_from_dict, load_filters
+    AugmentationEngine, AugmentationPipeline, EFFECT_REGISTRY, create_effect_from_dict, load_filters,
+    AUGMENTATION_BACKENDS
 )
+from app.core.augmentation.encoding import OUTPUT_FORMATS
+from app.core.augmentation.preview import PreviewRenderer, format_timings
 from app.ui.components import RoundedButton
 import cv2
 import numpy as np
@@ -26,6 +30,12 @@ class AugmentationView(ttk.Frame):
         
         self.preview_original = None
         self.preview_augmented = None
+        # (image name, pipeline version) of the last rendered preview
+        self._preview_key = None
+        # Renders on a worker thread; results are handed back to the Tk thread
+        self.preview_renderer = PreviewRenderer(
+            lambda result: self.after(0, lambda: self._show_preview(result)),
+            on_error=lambda e: print(f"Preview error: {e}"))
         
         # State
         self.selected_effect_index = None
@@ -70,6 +80,69 @@ class AugmentationView(ttk.Frame):
         self.count_var = tk.IntVar(value=5)
         ttk.Spinbox(count_frame, from_=1, to=50, textvariable=self.count_var, width=5, 
                     command=self.save_global_settings).pack(side=tk.LEFT, padx=5)
+        
+        # Seed (blank = new random augmentations every run)
+        ttk.Label(count_frame, text="Seed:").pack(side=tk.LEFT, padx=(10, 0))
+        self.seed_var = tk.StringVar(value="")
+        seed_entry = ttk.Entry(count_frame, textvariable=self.seed_var, width=10)
+        seed_entry.pack(side=tk.LEFT, padx=5)
+        seed_entry.bind("<FocusOut>", lambda e: self.save_global_settings())
+        seed_entry.bind("<Return>", lambda e: self.save_global_settings())
+
+        backend_frame = ttk.Frame(global_frame)
+        backend_frame.pack(fill=tk.X, pady=5)
+        ttk.Label(backend_frame, text="Execution:").pack(side=tk.LEFT)
+        self.backend_var = tk.StringVar(value=self.project_manager.get_setting("augmentation_backend", "thread"))
+        backend_combo = ttk.Combobox(backend_frame, textvariable=self.backend_var, values=AUGMENTATION_BACKENDS,
+                                     state="readonly", width=10)
+        backend_combo.pack(side=tk.LEFT, padx=5)
+        backend_combo.bind("<<ComboboxSelected>>",
+                           lambda e: self.project_manager.set_setting("augmentation_backend", self.backend_var.get()))
+
+        # Downscale sources before augmenting (longer edge in px, 0 = keep original size)
+        ttk.Label(backend_frame, text="Max Size:").pack(side=tk.LEFT, padx=(10, 0))
+        self.max_size_var = tk.IntVar(value=self.project_manager.get_setting("augmentation_max_size", 0))
+        ttk.Spinbox(backend_frame, from_=0, to=8192, increment=32, textvariable=self.max_size_var, width=6,
+                    command=self._save_max_size).pack(side=tk.LEFT, padx=5)
+
+        # Output encoding; PNG sources are otherwise re-encoded as slow, large PNGs
+        output_frame = ttk.Frame(global_frame)
+        output_frame.pack(fill=tk.X, pady=5)
+        ttk.Label(output_frame, text="Output:").pack(side=tk.LEFT)
+        self.format_var = tk.StringVar(value=self.project_manager.get_setting("augmentation_format", "source"))
+        format_combo = ttk.Combobox(output_frame, textvariable=self.format_var, values=OUTPUT_FORMATS,
+                                    state="readonly", width=7)
+        format_combo.pack(side=tk.LEFT, padx=5)
+        format_combo.bind("<<ComboboxSelected>>", lambda e: self._save_encoding())
+        ttk.Label(output_frame, text="Quality:").pack(side=tk.LEFT, padx=(10, 0))
+        self.quality_var = tk.IntVar(value=self.project_manager.get_setting("augmentation_quality", 95))
+        ttk.Spinbox(output_frame, from_=1, to=100, textvariable=self.quality_var, width=4,
+                    command=self._save_encoding).pack(side=tk.LEFT, padx=5)
+        ttk.Label(output_frame, text="PNG Level:").pack(side=tk.LEFT, padx=(10, 0))
+        self.png_level_var = tk.IntVar(value=self.project_manager.get_setting("augmentation_png_compression", 1))
+        ttk.Spinbox(output_frame, from_=0, to=9, textvariable=self.png_level_var, width=3,
+                    command=self._save_encoding).pack(side=tk.LEFT, padx=5)
+        self.pil_encoder_var = tk.BooleanVar(value=self.project_manager.get_setting("augmentation_encoder", "cv2") == "pil")
+        ttk.Checkbutton(output_frame, text="Pillow", variable=self.pil_encoder_var,
+                        command=self._save_encoding).pack(side=tk.LEFT, padx=5)
+
+        self.cache_var = tk.BooleanVar(value=self.project_manager.get_setting("augmentation_cache", False))
+        ttk.Checkbutton(global_frame, text="Reuse cached outputs", variable=self.cache_var,
+                        command=lambda: self.project_manager.set_setting("augmentation_cache", self.cache_var.get())
+                        ).pack(anchor=tk.W)
+        self.gc_var = tk.BooleanVar(value=self.project_manager.get_setting("augmentation_collect_garbage", False))
+        ttk.Checkbutton(global_frame, text="Remove outputs of older pipelines", variable=self.gc_var,
+                        command=lambda: self.project_manager.set_setting("augmentation_collect_garbage", self.gc_var.get())
+                        ).pack(anchor=tk.W)
+        self.purge_var = tk.BooleanVar(value=self.project_manager.get_setting("augmentation_purge_stale", False))
+        ttk.Checkbutton(global_frame, text="Remove outputs of relabeled/deleted images", variable=self.purge_var,
+                        command=lambda: self.project_manager.set_setting("augmentation_purge_stale", self.purge_var.get())
+                        ).pack(anchor=tk.W)
+        # Few large files instead of an image + label pair per sample (kinder to network filesystems)
+        self.shards_var = tk.BooleanVar(value=self.project_manager.get_setting("augmentation_shards", False))
+        ttk.Checkbutton(global_frame, text="Pack outputs into shards (data/shards)", variable=self.shards_var,
+                        command=lambda: self.project_manager.set_setting("augmentation_shards", self.shards_var.get())
+                        ).pack(anchor=tk.W)
 
         # Effect Actions (Add, Remove, Move)
         action_frame = ttk.Frame(parent)
@@ -126,6 +199,10 @@ class AugmentationView(ttk.Frame):
         title_frame.pack(fill=tk.X, padx=10, pady=10)
         ttk.Label(title_frame, text="Preview", font=('Arial', 14, 'bold')).pack(side=tk.LEFT)
         ttk.Button(title_frame, text="Refresh Preview", command=self.generate_preview).pack(side=tk.RIGHT)
+        ttk.Button(title_frame, text="Full Resolution",
+                   command=lambda: self.generate_preview(full_res=True)).pack(side=tk.RIGHT, padx=5)
+        self.preview_status = ttk.Label(title_frame, text="", foreground="#666")
+        self.preview_status.pack(side=tk.RIGHT, padx=5)
         
         # Image selector
         select_frame = ttk.Frame(parent)
@@ -134,6 +211,11 @@ class AugmentationView(ttk.Frame):
         self.image_combo = ttk.Combobox(select_frame, state='readonly')
         self.image_combo.pack(side=tk.LEFT, fill=tk.X, expand=True, padx=5)
         self.refresh_image_list()
+        # >1 shows a grid of random draws with per-effect timings
+        ttk.Label(select_frame, text="Samples:").pack(side=tk.LEFT, padx=(10, 0))
+        self.preview_count_var = tk.IntVar(value=self.project_manager.get_setting("augmentation_preview_samples", 1))
+        ttk.Spinbox(select_frame, from_=1, to=16, textvariable=self.preview_count_var, width=4,
+                    command=self._on_preview_count).pack(side=tk.LEFT, padx=5)
         
         # Canvases
         preview_container = ttk.Frame(parent)
@@ -217,7 +299,7 @@ class AugmentationView(ttk.Frame):
         # Debounce preview: cancel pending preview and schedule a new one
         if hasattr(self, '_preview_after_id') and self._preview_after_id:
             self.after_cancel(self._preview_after_id)
-        self._preview_after_id = self.after(300, self.generate_preview)
+        self._preview_after_id = self.after(300, self.refresh_preview_if_changed)
 
     def clear_settings(self):
         for widget in self.settings_content.winfo_children():
@@ -384,6 +466,8 @@ class AugmentationView(ttk.Frame):
     def save_global_settings(self):
         self.pipeline.enabled = self.enabled_var.get()
         self.pipeline.augmentations_per_image = self.count_var.get()
+        seed_text = self.seed_var.get().strip()
+        self.pipeline.seed = int(seed_text) if seed_text.lstrip('-').isdigit() else None
         self.save_config()
 
     def save_config(self):
@@ -398,6 +482,7 @@ class AugmentationView(ttk.Frame):
                 self.pipeline.load(config_path)
                 self.enabled_var.set(self.pipeline.enabled)
                 self.count_var.set(self.pipeline.augmentations_per_image)
+                self.seed_var.set("" if self.pipeline.seed is None else str(self.pipeline.seed))
                 self.refresh_listbox()
     
     # Utility methods for preview and image handling (copied/adapted from previous)
@@ -409,24 +494,65 @@ class AugmentationView(ttk.Frame):
         self.image_combo['values'] = images
         if images: self.image_combo.current(0)
 
-    def generate_preview(self):
+    def refresh_preview_if_changed(self):
+        """Regenerate the preview only if the image or the pipeline changed since the last one."""
+        if self._preview_key != (self.image_combo.get(), self.pipeline.version):
+            self.generate_preview()
+
+    def generate_preview(self, full_res=False):
+        """Queue a preview render. By default the pipeline runs on a canvas-sized proxy;
+        full_res renders the original resolution (exact for pixel-sized parameters)."""
         selected = self.image_combo.get()
         if not selected: return
+        self._preview_key = (selected, self.pipeline.version)
         
         images_dir = os.path.join(self.project_manager.current_project_path, "data", "images")
         labels_dir = os.path.join(self.project_manager.current_project_path, "data", "labels")
         img_path = os.path.join(images_dir, selected)
         label_path = os.path.join(labels_dir, os.path.splitext(selected)[0] + '.txt')
         
-        # Display Original
-        original_img = Image.open(img_path)
-        self.display_image(self.original_canvas, original_img)
-        
-        # Display Augmented
-        res = self.engine.preview_augmentation(img_path, label_path)
-        if res:
-            aug_img, bbox, cls = res
-            self.display_image(self.augmented_canvas, Image.fromarray(aug_img), bboxes=bbox)
+        canvas = self.augmented_canvas
+        width, height = canvas.winfo_width(), canvas.winfo_height()
+        if width < 10: width, height = 512, 512
+        try:
+            count = max(1, self.preview_count_var.get())
+        except tk.TclError:
+            count = 1
+        grid_size = None
+        max_side = max(width, height)
+        if count > 1:
+            grid_size = (width, height)
+            # Each sample only needs to be as large as its tile
+            columns = math.ceil(math.sqrt(count))
+            max_side = max(width // columns, height // math.ceil(count / columns), 32)
+        self.preview_renderer.request(img_path, label_path, self.pipeline.to_dict(), max_side=max_side,
+                                      full_res=full_res, count=count, grid_size=grid_size)
+        if full_res:
+            self.preview_status.config(text="Rendering full resolution...")
+
+    def _show_preview(self, result):
+        # Parameters changed again since this render was requested
+        if result.generation != self.preview_renderer.generation:
+            return
+        self.display_image(self.original_canvas, Image.fromarray(result.original))
+        height, width = result.augmented.shape[:2]
+        mode = "full" if result.full_res else "proxy"
+        if result.grid is not None:
+            self.display_image(self.augmented_canvas, Image.fromarray(result.grid))
+            self.preview_status.config(
+                text=f"{len(result.samples)} x {width}x{height} {mode}, {result.seconds * 1000:.0f} ms")
+        else:
+            self.display_image(self.augmented_canvas, Image.fromarray(result.augmented), bboxes=result.bboxes)
+            slowest = ", ".join(format_timings(result.timings, limit=2))
+            self.preview_status.config(text=f"{width}x{height} {mode}, {result.seconds * 1000:.0f} ms"
+                                            + (f" ({slowest})" if slowest else ""))
+
+    def _on_preview_count(self):
+        try:
+            self.project_manager.set_setting("augmentation_preview_samples", max(1, self.preview_count_var.get()))
+        except tk.TclError:
+            return
+        self.generate_preview()
 
     def display_image(self, canvas, pil_img, bboxes=None):
         w, h = canvas.winfo_width(), canvas.winfo_height()
@@ -447,7 +573,7 @@ class AugmentationView(ttk.Frame):
         canvas.create_image(w//2, h//2, image=photo)
 
         # Draw bboxes if provided
-        if bboxes:
+        if bboxes is not None and len(bboxes) > 0:
             offset_x = (w - new_w) // 2
             offset_y = (h - new_h) // 2
             
@@ -480,6 +606,30 @@ class AugmentationView(ttk.Frame):
         if canvas == self.original_canvas: self.preview_original = photo
         else: self.preview_augmented = photo
 
+    def _save_max_size(self):
+        try:
+            self.project_manager.set_setting("augmentation_max_size", max(0, self.max_size_var.get()))
+        except tk.TclError:
+            pass
+
+    def _encoding_options(self):
+        return {
+            'format': self.format_var.get(),
+            'quality': self.quality_var.get(),
+            'png_compression': self.png_level_var.get(),
+            'encoder': 'pil' if self.pil_encoder_var.get() else 'cv2',
+        }
+
+    def _save_encoding(self):
+        try:
+            options = self._encoding_options()
+        except tk.TclError:
+            return
+        self.project_manager.set_setting("augmentation_format", options['format'])
+        self.project_manager.set_setting("augmentation_quality", options['quality'])
+        self.project_manager.set_setting("augmentation_png_compression", options['png_compression'])
+        self.project_manager.set_setting("augmentation_encoder", options['encoder'])
+
     def run_augmentation(self):
         if not self.project_manager.current_project_path: return
         if not messagebox.askyesno("Run", f"Generate {self.count_var.get()} augmentations per image?"): return
@@ -488,11 +638,30 @@ class AugmentationView(ttk.Frame):
         self.progress_bar['value'] = 0
         self.progress_label.config(text="Starting...")
         
-        thread = threading.Thread(target=self._run_thread)
+        # Read Tk variables here; the worker thread must not touch them
+        run_options = {'backend': self.backend_var.get()}
+        try:
+            run_options['max_size'] = self.max_size_var.get() or None
+            self._save_max_size()
+        except tk.TclError:
+            pass
+        try:
+            run_options['encoding'] = self._encoding_options()
+            self._save_encoding()
+        except tk.TclError:
+            pass
+        if self.shards_var.get():
+            run_options['shard_dir'] = os.path.join(self.project_manager.current_project_path, "data", "shards")
+        elif self.cache_var.get():
+            run_options['cache_dir'] = os.path.join(self.project_manager.current_project_path, ".cache", "augmentation")
+            run_options['collect_garbage'] = self.gc_var.get()
+            run_options['purge_stale'] = self.purge_var.get()
+        
+        thread = threading.Thread(target=self._run_thread, args=(run_options,))
         thread.daemon = True
         thread.start()
 
-    def _run_thread(self):
+    def _run_thread(self, run_options):
         try:
             p = self.project_manager.current_project_path
             
@@ -507,7 +676,8 @@ class AugmentationView(ttk.Frame):
                 os.path.join(p, "data", "images"),
                 os.path.join(p, "data", "labels"),
                 lambda c, t, m: self.after(0, lambda: self._update_progress(c, t, m)),
-                workers=workers
+                workers=workers,
+                **run_options
             )
             self.after(0, lambda: self._complete(count))
         except Exception as e:
@@ -520,7 +690,14 @@ class AugmentationView(ttk.Frame):
 
     def _complete(self, count):
         self.progress_frame.pack_forget()
-        messagebox.showinfo("Done", f"Created {count} images.")
+        stats = self.engine.last_encode_stats
+        message = f"Created {count} images."
+        if self.engine.last_reused_count:
+            message += (f"\nReused {self.engine.last_reused_count} cached outputs; uncheck "
+                        f"\"Reuse cached outputs\" to generate fresh ones.")
+        if stats is not None and stats.images:
+            message += f"\nEncoded {stats.summary()}"
+        messagebox.showinfo("Done", message)
         self.refresh_image_list()
 
     def import_filter(self):
@@ -546,10 +723,9 @@ class AugmentationView(ttk.Frame):
             messagebox.showerror("Error", f"Failed to import filter: {e}")
 
     def refresh_effect_registry(self):
-        """Reload filters and update dropdown."""
-        import app.core.augmentation_engine as aug_engine
-        aug_engine.EFFECT_REGISTRY = load_filters()
-        effect_names = sorted(list(aug_engine.EFFECT_REGISTRY.keys()))
+        """Re-index changed filter files and update dropdown."""
+        registry = load_filters()
+        effect_names = sorted(list(registry.keys()))
         self.add_effect_combo['values'] = effect_names
         if effect_names:
             self.add_effect_combo.current(0)
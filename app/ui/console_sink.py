@@ -0,0 +1,157 @@
+"""
+Bounded, rate-limited console for long-running jobs.
+
+ConsoleSink is a file-like object (stdout/stderr can be pointed at it) that may be
+written from any thread. Writes only go into a ring buffer; the Tk widget is updated
+from the Tk thread at most max_fps times per second, so a training run printing
+thousands of lines never floods the event loop. Carriage-return progress updates
+(tqdm) overwrite the current line instead of adding new ones, and the widget keeps
+only the last max_lines lines. The full history can be spilled to a log file.
+"""
+
+import collections
+import os
+import threading
+import tkinter as tk
+from typing import Optional
+
+
+class ConsoleSink:
+    """
+    Thread-safe writer that feeds a tk.Text widget at a limited rate.
+
+    Usage:
+        sink = ConsoleSink(text_widget)
+        sys.stdout = sink
+        sink.open_log(os.path.join(run_dir, "console.log"))
+    """
+
+    def __init__(self, text_widget: tk.Text, max_lines: int = 5000, max_fps: int = 10):
+        """
+        Args:
+            text_widget: Widget the console is shown in (only touched on the Tk thread)
+            max_lines: Lines kept in the buffer and the widget; older ones are dropped
+            max_fps: Maximum widget updates per second
+        """
+        self.output = text_widget
+        self.max_lines = max(1, max_lines)
+        self.interval_ms = max(1, 1000 // max(1, max_fps))
+        self._lock = threading.Lock()
+        # Completed lines for the ring buffer / not yet shown in the widget
+        self._history = collections.deque(maxlen=self.max_lines)
+        self._pending = collections.deque(maxlen=self.max_lines)
+        # The line being written; '\r' restarts it
+        self._partial = ''
+        # The last write ended with '\r', which may be the first half of a '\r\n'
+        self._carriage = False
+        self._dirty = False
+        self._log_file = None
+        self._closed = False
+        self._after_id = self.output.after(self.interval_ms, self._flush)
+
+    # File-like interface (any thread)
+
+    def write(self, string: str):
+        if not string:
+            return
+        with self._lock:
+            if self._carriage:
+                string = '\r' + string
+            self._carriage = string.endswith('\r')
+            if self._carriage:
+                string = string[:-1]
+            # Windows line endings end a line; only a lone '\r' overwrites it
+            string = string.replace('\r\n', '\n')
+            lines = string.split('\n')
+            for i, part in enumerate(lines):
+                if '\r' in part:
+                    # Keep only what follows the last carriage return (the latest progress state)
+                    self._partial = part.rsplit('\r', 1)[-1]
+                else:
+                    self._partial += part
+                if i < len(lines) - 1:
+                    self._history.append(self._partial)
+                    self._pending.append(self._partial)
+                    if self._log_file is not None:
+                        self._log_file.write(self._partial + '\n')
+                    self._partial = ''
+            self._dirty = True
+
+    def flush(self):
+        pass
+
+    def isatty(self) -> bool:
+        return False
+
+    # Log file
+
+    def open_log(self, path: str):
+        """Start spilling the console to path, beginning with the lines still buffered."""
+        with self._lock:
+            if self._log_file is not None:
+                self._log_file.close()
+            try:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                self._log_file = open(path, 'a', encoding='utf-8')
+            except OSError as e:
+                self._log_file = None
+                self._history.append(f"[Console] Could not open log file {path}: {e}")
+                self._pending.append(self._history[-1])
+                self._dirty = True
+                return
+            self._log_file.writelines(line + '\n' for line in self._history)
+
+    def close_log(self):
+        """Write out the unfinished line and close the log file."""
+        with self._lock:
+            if self._log_file is None:
+                return
+            if self._partial:
+                self._log_file.write(self._partial + '\n')
+            self._log_file.close()
+            self._log_file = None
+
+    # Widget updates (Tk thread)
+
+    def _flush(self):
+        if self._closed:
+            return
+        with self._lock:
+            dirty = self._dirty
+            pending = list(self._pending)
+            partial = self._partial
+            self._pending.clear()
+            self._dirty = False
+            if self._log_file is not None:
+                self._log_file.flush()
+
+        if dirty:
+            try:
+                self._render(pending, partial)
+            except tk.TclError:
+                return
+        self._after_id = self.output.after(self.interval_ms, self._flush)
+
+    def _render(self, pending, partial):
+        # Follow the output only if the user hasn't scrolled up
+        at_bottom = self.output.yview()[1] >= 0.999
+        # The widget's last line is the partial line; replace it with the new text
+        self.output.delete("end-1c linestart", "end-1c")
+        text = ''.join(line + '\n' for line in pending) + partial
+        self.output.insert("end-1c", text)
+
+        lines = int(self.output.index("end-1c").split('.')[0])
+        if lines > self.max_lines:
+            self.output.delete("1.0", f"{lines - self.max_lines + 1}.0")
+        if at_bottom:
+            self.output.see(tk.END)
+
+    def close(self):
+        """Stop updating the widget and close the log file."""
+        self._closed = True
+        if self._after_id is not None:
+            try:
+                self.output.after_cancel(self._after_id)
+            except tk.TclError:
+                pass
+        self.close_log()
@@ -117,7 +117,7 @@ class LabelingTool(tk.Frame):
     def refresh_image_list(self):
         self.image_listbox.delete(0, tk.END)
         img_dir = os.path.join(self.project_manager.current_project_path, "data", "images")
-        self.images = [f for f in os.listdir(img_dir) if f.lower().endswith(('.jpg', '.jpeg', '.png', '.bmp'))]
+        self.images = [f for f in os.listdir(img_dir) if f.lower().endswith(('.jpg', '.jpeg', '.png', '.bmp', '.webp'))]
         
         non_labeled_color = ThemeManager().get("inspector_non_labeled_color")
         
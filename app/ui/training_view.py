@@ -1,36 +1,15 @@
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox
 from app.core.yolo_wrapper import YOLOWrapper
+from app.core.augmentation.shards import list_shards
 from app.ui.components import RoundedButton
+from app.ui.console_sink import ConsoleSink
 import sys
 import os
+import json
 
-import re
-
-class RedirectText(object):
-    def __init__(self, text_widget, callback=None):
-        self.output = text_widget
-        self.callback = callback
-
-    def write(self, string):
-        try:
-            # Detect \r (tqdm-style progress updates)
-            if '\r' in string:
-                last_part = string.split('\r')[-1]
-                if self.callback:
-                    self.callback(last_part)
-            
-            self.output.insert(tk.END, string)
-            self.output.see(tk.END)
-            
-            if '\n' in string and self.callback:
-                for line in string.splitlines():
-                    self.callback(line)
-        except tk.TclError:
-            pass
-
-    def flush(self):
-        pass
+# How often training telemetry is drained into the progress labels
+TELEMETRY_INTERVAL_MS = 100
 
 class TrainingView(tk.Frame):
     def __init__(self, parent, project_manager, unload_callback=None, reload_callback=None):
@@ -48,9 +27,13 @@ class TrainingView(tk.Frame):
         
         self._create_ui()
         
-        # Redirect stdout/stderr
-        sys.stdout = RedirectText(self.console_text, callback=self.parse_progress)
-        sys.stderr = RedirectText(self.console_text, callback=self.parse_progress)
+        # Redirect stdout/stderr into a buffered, rate-limited console
+        self.console = ConsoleSink(self.console_text)
+        sys.stdout = self.console
+        sys.stderr = self.console
+        
+        # Progress labels are fed from structured training callbacks, not console text
+        self.after(TELEMETRY_INTERVAL_MS, self._poll_telemetry)
 
     def _create_ui(self):
         # Create Notebook for Tabs
@@ -119,16 +102,29 @@ class TrainingView(tk.Frame):
         # User requested: "one bieng a boolean for half=true/false, it shuld write half(fp16) in the tab"
         tk.Checkbutton(config_frame, text="half (fp16)", variable=self.half_var).grid(row=3, column=2, sticky=tk.W)
 
+        # Apply the ForgeAugment pipeline while loading batches instead of training on aug_ files
+        self.online_aug_var = tk.BooleanVar(value=False)
+        tk.Checkbutton(config_frame, text="Online Augmentation", variable=self.online_aug_var).grid(row=3, column=3, columnspan=2, sticky=tk.W)
+
+        # Give every class its share of validation images
+        self.stratify_var = tk.BooleanVar(value=False)
+        tk.Checkbutton(config_frame, text="Stratified Split", variable=self.stratify_var).grid(row=3, column=5, sticky=tk.W)
+
+        # Add the samples ForgeAugment packed into data/shards to the training set
+        self.shards_var = tk.BooleanVar(value=False)
+        tk.Checkbutton(config_frame, text="Train on Augmentation Shards (data/shards)",
+                       variable=self.shards_var).grid(row=4, column=0, columnspan=3, sticky=tk.W)
+
         # Train Button
         # We need to wrap RoundedButton in a frame or use place if grid is tricky with canvas size, 
         # but grid works fine for canvas.
         self.start_btn = RoundedButton(config_frame, text="START TRAINING", command=self.start_training, 
                                   width=200, height=50)
-        self.start_btn.grid(row=4, column=0, columnspan=3, pady=20, sticky=tk.E, padx=5)
+        self.start_btn.grid(row=5, column=0, columnspan=3, pady=20, sticky=tk.E, padx=5)
 
         self.stop_btn = RoundedButton(config_frame, text="STOP TRAINING", command=self.stop_training, 
                                   width=200, height=50)
-        self.stop_btn.grid(row=4, column=3, columnspan=3, pady=20, sticky=tk.W, padx=5)
+        self.stop_btn.grid(row=5, column=3, columnspan=3, pady=20, sticky=tk.W, padx=5)
         self.stop_btn.config(state="disabled")
 
         # Console Output
@@ -174,6 +170,9 @@ class TrainingView(tk.Frame):
         self.lbl_eta = tk.Label(self.resource_frame, text="ETA: --:--", bg="#222", fg="#aaa", font=("Consolas", 9))
         self.lbl_eta.pack(side=tk.LEFT, padx=5)
 
+        self.lbl_metrics = tk.Label(self.resource_frame, text="", bg="#222", fg="#aaa", font=("Consolas", 9))
+        self.lbl_metrics.pack(side=tk.LEFT, padx=5)
+
         self.console_text = tk.Text(self, bg="black", fg="white", height=20)
         self.console_text.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
         
@@ -219,28 +218,61 @@ class TrainingView(tk.Frame):
         device_info = self.yolo_wrapper.get_device_info()
         self.lbl_device.config(text=f"Device: {device_info}")
 
-    def parse_progress(self, line):
-        """Parse YOLO tqdm output for epoch, progress % and ETA."""
-        if not line or not self.winfo_exists():
+    def _poll_telemetry(self):
+        """Apply the training process' events queued since the last poll, then reschedule."""
+        try:
+            if not self.winfo_exists():
+                return
+        except tk.TclError:
             return
-            
-        # Example: " 1/50   14.7G   0.123 ... 10/10 [00:05<00:00,  1.92it/s]"
-        epoch_match = re.search(r'(\d+)/(\d+)', line)
-        if epoch_match:
-            curr, total = epoch_match.groups()
-            # Heuristic: if total is high, it's likely the epoch count
-            try:
-                if int(total) >= self.epochs_var.get():
-                    self.lbl_epoch.config(text=f"Epoch: {curr}/{total}")
-            except: pass
-            
-        percent_match = re.search(r'(\d+)%', line)
-        if percent_match:
-            self.lbl_progress.config(text=f"Progress: {percent_match.group(1)}%")
-            
-        eta_match = re.search(r'<(\d+:\d+)', line)
-        if eta_match:
-            self.lbl_eta.config(text=f"ETA: {eta_match.group(1)}")
+        self._apply_training_events(self.yolo_wrapper.training_events())
+        self.after(TELEMETRY_INTERVAL_MS, self._poll_telemetry)
+
+    def _apply_training_events(self, events):
+        last_batch = None
+        for event in events:
+            if event['type'] == 'log':
+                self.console.write(event['text'])
+            elif event['type'] == 'batch':
+                last_batch = event
+            elif event['type'] == 'epoch':
+                self._show_epoch(event)
+        # Only the newest batch matters for the labels
+        if last_batch:
+            self._show_batch(last_batch)
+
+    @staticmethod
+    def _format_eta(seconds):
+        if seconds is None:
+            return "--:--"
+        minutes, secs = divmod(int(seconds), 60)
+        hours, minutes = divmod(minutes, 60)
+        return f"{hours}:{minutes:02d}:{secs:02d}" if hours else f"{minutes:02d}:{secs:02d}"
+
+    def _show_batch(self, event):
+        self.lbl_epoch.config(text=f"Epoch: {event['epoch']}/{event['epochs']}")
+        if event['batches']:
+            self.lbl_progress.config(text=f"Progress: {100 * event['batch'] // event['batches']}%")
+        self.lbl_eta.config(text=f"ETA: {self._format_eta(event['eta'])}")
+
+        parts = [f"{name.replace('_loss', '')} {value:.3f}" for name, value in event['losses'].items()]
+        if event['lr'] is not None:
+            parts.append(f"lr {event['lr']:.2e}")
+        if event['it_s']:
+            parts.append(f"{event['it_s']:.1f} it/s")
+        if event['gpu_mem']:
+            parts.append(f"{event['gpu_mem']:.1f}G")
+        self.lbl_metrics.config(text="  ".join(parts))
+
+    def _show_epoch(self, event):
+        self.lbl_epoch.config(text=f"Epoch: {event['epoch']}/{event['epochs']}")
+        self.lbl_eta.config(text=f"ETA: {self._format_eta(event['eta'])}")
+        metrics = event['metrics']
+        summary = "  ".join(f"{key.split('/')[-1].replace('(B)', '')} {metrics[key]:.3f}"
+                            for key in ('metrics/precision(B)', 'metrics/recall(B)',
+                                        'metrics/mAP50(B)', 'metrics/mAP50-95(B)') if key in metrics)
+        if summary:
+            self.console.write(f"[Epoch {event['epoch']}/{event['epochs']}] {summary}\n")
 
     def update_stats(self, stats):
         if not self.winfo_exists():
@@ -279,33 +311,79 @@ class TrainingView(tk.Frame):
             # Gather hyperparameters
             hyperparams = {k: v.get() for k, v in self.hyper_vars.items()}
 
-            self.console_text.insert(tk.END, f"Preparing dataset (BG Ratio: {bg_ratio:.1%})...\n")
-            train_txt, val_txt = self.yolo_wrapper.prepare_dataset(self.val_split_var.get(), bg_ratio=bg_ratio)
+            online_pipeline = None
+            if self.online_aug_var.get():
+                online_pipeline = self._load_online_pipeline()
+                if online_pipeline is None:
+                    return
+
+            shard_dir = None
+            if self.shards_var.get():
+                shard_dir = os.path.join(self.project_manager.current_project_path, "data", "shards")
+                if not list_shards(shard_dir):
+                    messagebox.showerror("Error", "No augmentation shards found. Enable \"Pack outputs into shards\" "
+                                         "in the ForgeAugment tab and run it first.")
+                    return
+                self.console.write(f"Including augmentation shards from {shard_dir}\n")
+
+            self.console.write(f"Preparing dataset (BG Ratio: {bg_ratio:.1%})...\n")
+            train_txt, val_txt = self.yolo_wrapper.prepare_dataset(self.val_split_var.get(), bg_ratio=bg_ratio,
+                                                                   exclude_augmented=online_pipeline is not None,
+                                                                   stratify=self.stratify_var.get())
             
-            self.console_text.insert(tk.END, "Generating config...\n")
+            self.console.write("Generating config...\n")
             data_yaml = self.yolo_wrapper.generate_yaml(classes, train_txt, val_txt)
             
-            self.console_text.insert(tk.END, f"Starting training with {self.model_var.get()} (Resume: {resume})...\n")
+            self.console.write(f"Starting training with {self.model_var.get()} (Resume: {resume})...\n")
             self.start_btn.config(state="disabled")
             self.stop_btn.config(state="normal")
             self.yolo_wrapper.train_model(self.model_var.get(), data_yaml, epochs, batch, imgsz, 
-                                          callback=self.on_training_complete, half=self.half_var.get(), 
-                                          workers=self.workers_var.get(), resume=resume, **hyperparams)
+                                          callback=lambda message: self.after(0, self.on_training_complete, message),
+                                          half=self.half_var.get(), 
+                                          workers=self.workers_var.get(), resume=resume,
+                                          online_pipeline=online_pipeline, shard_dir=shard_dir, **hyperparams)
+            # Full console history of the run, next to its weights and plots
+            self.console.open_log(os.path.join(self.yolo_wrapper.run_dir, "console.log"))
             
         except Exception as e:
             messagebox.showerror("Error", str(e))
             self.start_btn.config(state="normal")
             self.stop_btn.config(state="disabled")
 
+    def _load_online_pipeline(self):
+        """Load the project's ForgeAugment pipeline for online augmentation."""
+        config_path = os.path.join(self.project_manager.current_project_path, "augmentation_pipeline.json")
+        if not os.path.exists(config_path):
+            messagebox.showerror("Error", "No augmentation pipeline found. Configure one in the ForgeAugment tab first.")
+            return None
+        with open(config_path, 'r') as f:
+            pipeline_data = json.load(f)
+        if not pipeline_data.get('effects'):
+            messagebox.showerror("Error", "The augmentation pipeline has no effects.")
+            return None
+        self.console.write(f"Online augmentation: {len(pipeline_data['effects'])} effect(s), aug_ files excluded\n")
+        return pipeline_data
+
     def stop_training(self):
+        job = self.yolo_wrapper.training_job
+        if job is not None and job.stop_requested:
+            # Second click: don't wait for the epoch to end
+            if messagebox.askyesno("Cancel Training", "Training is finishing the current epoch. Terminate it now? "
+                                   "Progress since the last saved epoch is lost."):
+                self.yolo_wrapper.cancel_training()
+                self.console.write("Cancelling training...\n")
+                self.stop_btn.config(state="disabled")
+            return
         if messagebox.askyesno("Stop Training", "Are you sure you want to stop training? It will stop after the current epoch."):
             self.yolo_wrapper.stop_training()
-            self.console_text.insert(tk.END, "Stopping training... (waiting for epoch end)\n")
-            self.stop_btn.config(state="disabled") # Prevent multiple clicks
+            self.console.write("Stopping training... (waiting for epoch end, press STOP again to cancel immediately)\n")
 
     def on_training_complete(self, message):
         try:
-            self.console_text.insert(tk.END, f"\n{message}\n")
+            # Output the process sent just before exiting
+            self._apply_training_events(self.yolo_wrapper.training_events())
+            self.console.write(f"\n{message}\n")
+            self.console.close_log()
             self.start_btn.config(state="normal")
             self.stop_btn.config(state="disabled")
             
@@ -320,7 +398,11 @@ class TrainingView(tk.Frame):
     def destroy(self):
         if self.monitor:
             self.monitor.stop()
+        # A running training process would otherwise keep the application from exiting
+        if self.yolo_wrapper.is_training():
+            self.yolo_wrapper.cancel_training()
         # Restore original stdout/stderr
         sys.stdout = self.original_stdout
         sys.stderr = self.original_stderr
+        self.console.close()
         super().destroy()
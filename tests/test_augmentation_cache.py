@@ -0,0 +1,43 @@
+import os
+
+from app.core.augmentation.cache import AugmentationCache
+
+
+def make_source(tmp_path):
+    img_path = tmp_path / "src.jpg"
+    label_path = tmp_path / "src.txt"
+    img_path.write_bytes(b"image")
+    label_path.write_text("0 0.5 0.5 0.2 0.2\n")
+    return str(img_path), str(label_path)
+
+
+def make_outputs(tmp_path, count):
+    outputs = []
+    for i in range(count):
+        pair = [str(tmp_path / f"aug_{i}.jpg"), str(tmp_path / f"aug_{i}.txt")]
+        for path in pair:
+            with open(path, 'w') as f:
+                f.write("x")
+        outputs.append(pair)
+    return outputs
+
+
+def test_source_is_current_after_commit(tmp_path):
+    cache = AugmentationCache(str(tmp_path / "cache"))
+    img_path, label_path = make_source(tmp_path)
+    outputs = make_outputs(tmp_path, 3)
+    cache.stage(img_path, label_path, "content", "config", 1, outputs)
+    assert cache.commit() == 1
+    assert cache.is_current(img_path, label_path, "config", 1, 3)
+    assert not cache.is_current(img_path, label_path, "other", 1, 3)
+    assert not cache.is_current(img_path, label_path, "config", 1, 4)
+
+
+def test_deleted_output_is_not_current(tmp_path):
+    cache = AugmentationCache(str(tmp_path / "cache"))
+    img_path, label_path = make_source(tmp_path)
+    outputs = make_outputs(tmp_path, 3)
+    cache.stage(img_path, label_path, "content", "config", 1, outputs)
+    cache.commit()
+    os.remove(outputs[1][0])
+    assert not cache.is_current(img_path, label_path, "config", 1, 3)
@@ -0,0 +1,49 @@
+import pytest
+
+from app.ui.console_sink import ConsoleSink
+
+
+class FakeText:
+    """Stands in for tk.Text; the sink only schedules its flush on it here."""
+
+    def after(self, ms, callback):
+        return 'after#1'
+
+    def after_cancel(self, after_id):
+        pass
+
+
+@pytest.fixture
+def sink():
+    sink = ConsoleSink(FakeText())
+    yield sink
+    sink.close()
+
+
+def logged_lines(sink, tmp_path, *writes):
+    path = tmp_path / "console.log"
+    sink.open_log(str(path))
+    for string in writes:
+        sink.write(string)
+    sink.close_log()
+    return path.read_text(encoding='utf-8').splitlines()
+
+
+def test_newline_ends_line(sink, tmp_path):
+    assert logged_lines(sink, tmp_path, "first\nsec", "ond\n") == ["first", "second"]
+
+
+def test_carriage_return_overwrites_line(sink, tmp_path):
+    assert logged_lines(sink, tmp_path, "10%", "\r50%", "\r100%\n") == ["100%"]
+
+
+def test_crlf_is_a_newline(sink, tmp_path):
+    assert logged_lines(sink, tmp_path, "first\r\nsecond\r\n") == ["first", "second"]
+
+
+def test_crlf_split_across_writes(sink, tmp_path):
+    assert logged_lines(sink, tmp_path, "first\r", "\nsecond\r", "\n") == ["first", "second"]
+
+
+def test_trailing_carriage_return_still_overwrites(sink, tmp_path):
+    assert logged_lines(sink, tmp_path, "10%\r", "50%\r", "100%\n") == ["100%"]
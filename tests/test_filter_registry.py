@@ -0,0 +1,91 @@
+import sys
+import textwrap
+
+import pytest
+
+from app.core.augmentation.registry import FilterRegistry
+
+EFFECT_BODY = '''
+    def get_transform(self):
+        import albumentations as A
+        return A.NoOp(p=self.probability)
+
+    def get_param_specs(self):
+        return {}
+
+    def set_params(self, params):
+        pass
+'''
+
+
+def write(path, source, body=''):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(textwrap.dedent(source) + body, encoding='utf-8')
+
+
+@pytest.fixture
+def filters_dir(tmp_path):
+    filters = tmp_path / "filters"
+    write(filters / "tint_base.py", '''
+        from app.core.augmentation.base import AugmentationEffect, FilterCategory
+
+        class TintBase(AugmentationEffect):
+            category = FilterCategory.COLOR
+        ''', EFFECT_BODY)
+    write(filters / "tints.py", '''
+        from tint_base import TintBase
+
+        class WarmTint(TintBase):
+            bbox_safe = False
+        ''')
+    write(filters / "more" / "warmer.py", '''
+        from tints import WarmTint
+
+        class WarmerTint(WarmTint):
+            pass
+        ''')
+    return filters
+
+
+def make_registry(filters_dir, tmp_path):
+    return FilterRegistry(str(filters_dir), index_path=str(tmp_path / "index.json"))
+
+
+def test_bases_from_other_filter_files_resolve_transitively(filters_dir, tmp_path):
+    registry = make_registry(filters_dir, tmp_path)
+    assert {'TintBase', 'WarmTint', 'WarmerTint'} <= set(registry)
+    assert registry.get_info('WarmTint')['category'] == 'Color'
+    assert registry.get_info('WarmTint')['bbox_safe'] is False
+    assert registry.get_info('WarmerTint')['bbox_safe'] is False
+
+
+def test_resolution_survives_a_reload_from_the_index(filters_dir, tmp_path):
+    make_registry(filters_dir, tmp_path)
+    registry = make_registry(filters_dir, tmp_path)
+    assert registry.rescan() == 0
+    assert 'WarmerTint' in registry
+
+
+def test_base_imported_from_outside_the_filters(filters_dir, tmp_path, monkeypatch):
+    write(tmp_path / "helpers" / "shared_bases.py", '''
+        from app.core.augmentation.base import AugmentationEffect, FilterCategory
+
+        class SharedBase(AugmentationEffect):
+            category = FilterCategory.NOISE
+        ''', EFFECT_BODY)
+    monkeypatch.syspath_prepend(str(tmp_path / "helpers"))
+    write(filters_dir / "grain.py", '''
+        from shared_bases import SharedBase
+
+        class GrainEffect(SharedBase):
+            pass
+
+        class NotAnEffect(dict):
+            pass
+        ''')
+    registry = make_registry(filters_dir, tmp_path)
+    assert 'GrainEffect' in registry
+    assert 'NotAnEffect' not in registry
+    assert registry.get_info('GrainEffect')['category'] == 'Noise'
+    assert registry['GrainEffect'].__name__ == 'GrainEffect'
+    sys.modules.pop('shared_bases', None)
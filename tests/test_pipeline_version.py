@@ -0,0 +1,81 @@
+import pytest
+
+from app.core.augmentation_engine import AugmentationPipeline, create_effect_from_dict
+
+
+@pytest.fixture
+def pipeline():
+    pipeline = AugmentationPipeline()
+    for effect_type in ('BrightnessEffect', 'HorizontalFlipEffect', 'RotateEffect'):
+        pipeline.add_effect(create_effect_from_dict({'type': effect_type, 'probability': 0.5}))
+    return pipeline
+
+
+def assert_bumps(pipeline, change):
+    before = pipeline.version
+    change()
+    assert pipeline.version != before
+
+
+def test_add_remove_and_reorder_bump_version(pipeline):
+    assert_bumps(pipeline, lambda: pipeline.add_effect(create_effect_from_dict({'type': 'BlurEffect'})))
+    assert_bumps(pipeline, lambda: pipeline.move_effect(0, 2))
+    assert_bumps(pipeline, lambda: pipeline.remove_effect(1))
+
+
+def test_enable_toggles_bump_version(pipeline):
+    assert_bumps(pipeline, lambda: setattr(pipeline.effects[0], 'enabled', False))
+    assert_bumps(pipeline, lambda: setattr(pipeline.effects[0], 'enabled', True))
+    assert_bumps(pipeline, lambda: setattr(pipeline, 'enabled', False))
+    assert_bumps(pipeline, lambda: setattr(pipeline, 'enabled', True))
+
+
+def test_global_settings_bump_version(pipeline):
+    assert_bumps(pipeline, lambda: setattr(pipeline, 'seed', 7))
+    assert_bumps(pipeline, lambda: setattr(pipeline, 'augmentations_per_image', 3))
+    assert_bumps(pipeline, lambda: pipeline.from_dict(pipeline.to_dict()))
+
+
+def test_removed_effect_no_longer_bumps_version(pipeline):
+    effect = pipeline.effects[0]
+    pipeline.remove_effect(0)
+    before = pipeline.version
+    effect.probability = 0.9
+    assert pipeline.version == before
+
+
+def test_stages_rebuilt_after_toggle(pipeline):
+    kinds = [kind for kind, _ in pipeline.get_stages()]
+    pipeline.effects[0].enabled = False
+    assert [kind for kind, _ in pipeline.get_stages()] != kinds
+
+
+def test_in_place_list_changes_bump_version(pipeline):
+    blur = create_effect_from_dict({'type': 'BlurEffect'})
+    assert_bumps(pipeline, lambda: pipeline.effects.append(blur))
+    assert_bumps(pipeline, lambda: pipeline.effects.reverse())
+    assert_bumps(pipeline, lambda: pipeline.effects.__setitem__(0, create_effect_from_dict({'type': 'BlurEffect'})))
+    assert_bumps(pipeline, lambda: pipeline.effects.__delitem__(0))
+    assert_bumps(pipeline, lambda: pipeline.effects.extend([create_effect_from_dict({'type': 'BlurEffect'})]))
+    assert_bumps(pipeline, lambda: pipeline.effects.clear())
+
+
+def test_effects_added_in_place_report_their_changes(pipeline):
+    blur = create_effect_from_dict({'type': 'BlurEffect'})
+    pipeline.effects.insert(0, blur)
+    assert_bumps(pipeline, lambda: setattr(blur, 'probability', 0.9))
+
+    replaced = pipeline.effects[1]
+    pipeline.effects[1] = create_effect_from_dict({'type': 'BlurEffect'})
+    before = pipeline.version
+    replaced.probability = 0.1
+    assert pipeline.version == before
+
+
+def test_assigning_effects_keeps_tracking(pipeline):
+    old = pipeline.effects[0]
+    pipeline.effects = [create_effect_from_dict({'type': 'BlurEffect'})]
+    before = pipeline.version
+    old.probability = 0.1
+    assert pipeline.version == before
+    assert_bumps(pipeline, lambda: pipeline.effects.append(create_effect_from_dict({'type': 'BlurEffect'})))
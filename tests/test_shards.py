@@ -0,0 +1,49 @@
+import os
+
+import cv2
+import numpy as np
+
+from app.core.augmentation.shards import ShardReader, ShardWriter
+
+
+def encoded_image(value):
+    image = np.full((8, 12, 3), value, dtype=np.uint8)
+    return cv2.imencode('.png', image)[1].tobytes()
+
+
+def write_samples(shard_dir, keys):
+    with ShardWriter(str(shard_dir), max_samples=2) as writer:
+        for i, key in enumerate(keys):
+            writer.add(key, encoded_image(i), '.png', f"0 0.5 0.5 0.{i + 1} 0.2\n", (12, 8))
+    return writer
+
+
+def test_long_keys_round_trip(tmp_path):
+    # Video-frame stems easily exceed the 100-character limit of USTAR tar headers
+    keys = [f"aug_{i:04d}_s42_" + 'camera_front_left_2024_06_01_highway_session' * 2 + f"_frame_{i:06d}"
+            for i in range(5)]
+    assert all(len(key) > 100 for key in keys)
+    writer = write_samples(tmp_path, keys)
+    assert writer.samples_written == len(keys)
+
+    reader = ShardReader(str(tmp_path))
+    assert sorted(reader.keys()) == sorted(keys)
+    for i, key in enumerate(keys):
+        position = reader.index_of(key)
+        image, labels = reader[position]
+        assert image.shape == (8, 12, 3) and image[0, 0, 0] == i
+        assert labels[0, 3] == np.float32(f"0.{i + 1}")
+    reader.close()
+
+
+def test_long_keys_without_index(tmp_path):
+    keys = ['x' * 150 + f"_{i}" for i in range(3)]
+    write_samples(tmp_path, keys)
+    for name in os.listdir(tmp_path):
+        if name.endswith('.json'):
+            os.remove(os.path.join(tmp_path, name))
+
+    reader = ShardReader(str(tmp_path))
+    assert sorted(reader.keys()) == sorted(keys)
+    assert reader.read_image(reader.index_of(keys[2]))[0, 0, 0] == 2
+    reader.close()
@@ -0,0 +1,40 @@
+import queue
+import time
+
+from app.core.training_runner import _EventWriter
+
+
+def texts(events):
+    drained = []
+    while True:
+        try:
+            drained.append(events.get_nowait()['text'])
+        except queue.Empty:
+            return drained
+
+
+def test_writes_are_batched_and_flushed():
+    events = queue.Queue()
+    writer = _EventWriter(events, interval=60.0)
+    writer.write("first\n")  # the first write is sent right away
+    writer.write("second\n")
+    writer.write("third\n")
+    assert texts(events) == ["first\n"]
+    writer.flush()
+    assert texts(events) == ["second\nthird\n"]
+
+
+def test_full_queue_drops_without_blocking_and_reports():
+    events = queue.Queue(maxsize=1)
+    writer = _EventWriter(events, interval=0.0)
+    writer.write("kept\n")
+    start = time.perf_counter()
+    writer.write("lost 1\nlost 2\n")
+    writer.write("lost 3\n")
+    assert time.perf_counter() - start < 0.5
+    assert writer.dropped_lines == 3
+
+    assert texts(events) == ["kept\n"]
+    writer.write("next\n")
+    assert texts(events) == ["[Training] 3 log lines dropped, the console could not keep up\nnext\n"]
+    assert writer.dropped_lines == 0